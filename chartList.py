@@ -5,13 +5,20 @@ Sort, filter and chart lists of price time series data
 
 import os
 import sys
+import multiprocessing
 import numpy as np
 import pandas as pd
 import module.utility as utility
 import module.arguments as arguments
 import module.candlestick as candlestick
 from module.time_series_plus import TimeSeriesPlus
-from module.attribute_table import AttributeTable
+from module.attribute_table import AttributeTable, SymbolCache
+import module.similarity as similarity
+import module.sampling as sampling
+import module.snapshot as snapshot
+import module.result_cache as result_cache
+
+LAST_REMOVED_ROWS = 0
 
 
 def make_image_file(file_name, securities, count, panel_row, panel_col,
@@ -50,18 +57,23 @@ def make_image_file(file_name, securities, count, panel_row, panel_col,
     return to_be_recycled.extend(recycle)
 
 
-def attributes_to_securities(tickers, use_volume=False):
+def attributes_to_securities(tickers, use_volume=False, scale="", weather="", profile_bins=0):
     """Get dictionary of securities from AttributeTable object
 
     Args:
         tickers (AttributeTable object): contains a list of securities and their attributes
         use_volume (boolean): add trading volume data or not
+        scale (str): attach cached weekly ('w') or monthly ('m') price data for dual-scale plot
+        weather (str): benchmark symbol (eg, SPY) or 'breadth', whose daily change is added for chart overlay
+        profile_bins (int): number of price bins to plot volume-by-price profile (0 for no profile)
 
     Returns:
         dict: key (security symbol and head info) -> value (a Security object)
     """
     security_table = tickers.get_attribute_table()
     timeseries_dict = tickers.get_dict_timeseries()
+    # last-bar RSI of all securities for figure heads
+    rsi_values = snapshot.column(tickers.get_plot_universe(), 'rsi14')
 
     # Loop through security table and populate a dictionary of securities
     securities = {}
@@ -81,6 +93,10 @@ def attributes_to_securities(tickers, use_volume=False):
                     daily_price = daily_price.head(row_num - LAST_REMOVED_ROWS)
             # Add volume data
             if use_volume: daily_price = TimeSeriesPlus(daily_price).get_volume().df
+            # Add daily change of benchmark (market weather)
+            if weather:
+                daily_price = daily_price.copy()
+                daily_price["weather"] = tickers.get_weather(sticker, weather)
 
             # Create security object and add features
             my_security = candlestick.Security(daily_price)
@@ -99,9 +115,17 @@ def attributes_to_securities(tickers, use_volume=False):
                 my_security.set_industry(row["Industry"])
             if "Sort" in row:
                 my_security.set_sortvalue(row["Sort"])
+            if profile_bins:
+                my_security.set_profile_bins(profile_bins)
+            # Attach weekly/monthly data resampled once for the whole list
+            if scale == "w" and not LAST_REMOVED_ROWS:
+                weekly = tickers.get_scaled_price(sticker, "week")
+                my_security.set_scaled_price(scale, TimeSeriesPlus(weekly).df)
+            elif scale == "m" and not LAST_REMOVED_ROWS:
+                my_security.set_scaled_price(scale, tickers.get_scaled_price(sticker, "month"))
 
             # Make figure head (as key in dict)
-            rsi = str(sts.get_rsi(14))[0:4]
+            rsi = str(rsi_values[sticker])[0:4]
             my_key = f"{sticker}: {row['header']} RSI-{rsi}"
             if 'PL' in row:
                 r = float(row['PL'])
@@ -117,11 +141,193 @@ def attributes_to_securities(tickers, use_volume=False):
     return securities
 
 
-def chart_securities(file, **kwargs):
+def chart_batches(file_name, securities, panel_row, panel_col, to_be_recycled, day_span, gradient, fig_wid, fig_dep):
+    """Make one image file for every panel_row x panel_col securities (see make_image_file)
+
+    Args:
+        file_name (str): output file name (without extension)
+        securities (dict): key (figure head) -> value (a Security object), in plotting order
+        panel_row (int): number of rows in each output image
+        panel_col (int): number of columns in each output image
+        to_be_recycled (list): a list (of security objects) to be extended
+        day_span (int): number of days' data to be plotted
+        gradient (int): the expansion of candlestick width from the first day to the last day plotted
+        fig_wid (float): width of the output image
+        fig_dep (float): depth of the output image
+    """
+    security_batch = {}
+    c = 10000
+    for key, security in securities.items():
+        c += 1
+        security_batch[key] = security
+        if len(security_batch) % (panel_row * panel_col) == 0:
+            make_image_file(file_name, security_batch, c, panel_row, panel_col, to_be_recycled,
+                            day_span, gradient, fig_wid, fig_dep)
+            security_batch = {}
+
+    # Make one image for remaining securities
+    if len(security_batch) > 0:
+        make_image_file(file_name, security_batch, c, panel_row, panel_col, to_be_recycled,
+                        day_span, gradient, fig_wid, fig_dep)
+
+
+def similar_to_securities(tickers, matches, after=0):
+    """Get dictionary of securities showing price data of windows found by similarity search
+
+    Args:
+        tickers (AttributeTable object): contains loaded price data
+        matches (dataframe): 'Symbol', 'Start', 'End' and 'Distance' of similar windows
+        after (int): number of bars to show after the end of each window
+
+    Returns:
+        dict: key (security symbol and window) -> value (a Security object)
+    """
+    universe = tickers.get_universe("day", plot=True)
+    securities = {}
+    for symbol, start, end, distance in matches.itertuples(index=False):
+        daily_price = universe.get_frame(symbol)
+        last = daily_price.index.get_loc(end) + after + 1
+        daily_price = TimeSeriesPlus(daily_price.iloc[:last]).df
+        my_security = candlestick.Security(daily_price)
+        my_security.set_date_added(str(start.date()))
+        my_security.set_date_sold(str(end.date()))
+        my_security.set_sortvalue(round(distance, 3))
+        my_security.set_profit_loss(daily_price.loc[end, "4. close"] / daily_price.loc[start, "4. close"] - 1)
+        securities[f"{symbol}: {start.date()}~{end.date()} distance-{distance:.2f}"] = my_security
+    return securities
+
+
+def chart_similar(tickers, file_name, panel_row, panel_col, fig_wid, fig_dep, **kwargs):
+    """Search price history of a list for windows similar in shape to a query window, and chart them
+
+    Args:
+        tickers (AttributeTable object): contains loaded price data
+        file_name (str): output file name (without extension)
+        panel_row (int): number of rows in each output image
+        panel_col (int): number of columns in each output image
+        fig_wid (float): width of the output image
+        fig_dep (float): depth of the output image
+        kwargs (dict): command line key word arguments ('similar': symbol,start,end[,top])
+    """
+    args = kwargs["similar"].split(',')
+    if len(args) < 3:
+        print(f"Invalid similar argument: {kwargs['similar']} (eg, AAPL,2018-03-01,2018-04-10,20)")
+        exit(1)
+    symbol, start, end = args[0:3]
+    day_span = kwargs["days"]
+    gradient = kwargs["gradient"]
+    top = int(args[3]) if len(args) > 3 else 20
+
+    universe = tickers.get_universe("day", plot=True)
+    if symbol not in universe.position:
+        print(f"No price data of {symbol} in the list")
+        exit(1)
+    window = universe.get_frame(symbol).loc[start:end]
+    query = pd.DataFrame([[symbol, window.index[0], window.index[-1], 0.0]],
+                         columns=['Symbol', 'Start', 'End', 'Distance'])
+    matches = similarity.search(universe, symbol, start, end, top)
+    print(f"# {len(matches):>5} windows similar to {symbol} {start}~{end}")
+
+    if kwargs["filterOnly"]:
+        matches.to_csv(file_name + ".tsv", sep="\t", index=False)
+        return
+
+    # query window comes first; each window is followed by as many bars as its length
+    securities = similar_to_securities(tickers, pd.concat([query, matches]), after=len(window))
+    chart_batches(file_name, securities, panel_row, panel_col, [], day_span, gradient, fig_wid, fig_dep)
+
+
+def samples_to_securities(universe, samples, after=0):
+    """Get dictionary of securities showing price data up to historical samples
+
+    Args:
+        universe (Universe object): aligned price data
+        samples (dataframe): 'Symbol', 'Date' and 'Return' of samples (see sampling.samples)
+        after (int): number of bars to show after each sample
+
+    Returns:
+        dict: key (security symbol and date) -> value (a Security object)
+    """
+    securities = {}
+    for symbol, date, change in samples[['Symbol', 'Date', 'Return']].itertuples(index=False):
+        daily_price = universe.get_frame(symbol)
+        last = daily_price.index.get_loc(date) + after + 1
+        daily_price = TimeSeriesPlus(daily_price.iloc[:last]).df
+        my_security = candlestick.Security(daily_price)
+        my_security.set_date_added(str(date.date()))
+        my_key = f"{symbol}: {date.date()}"
+        if not np.isnan(change):
+            my_security.set_profit_loss(change)
+            my_key = my_key + f" return-{change:.3f}"
+        securities[my_key] = my_security
+    return securities
+
+
+def chart_samples(tickers, file_name, panel_row, panel_col, fig_wid, fig_dep, **kwargs):
+    """Scan price history of a list for dates meeting a sampling condition, and chart or export the samples
+
+    Args:
+        tickers (AttributeTable object): contains loaded price data
+        file_name (str): output file name (without extension)
+        panel_row (int): number of rows in each output image
+        panel_col (int): number of columns in each output image
+        fig_wid (float): width of the output image
+        fig_dep (float): depth of the output image
+        kwargs (dict): command line key word arguments ('sample': condition[,bars after sample])
+    """
+    args = kwargs["sample"].split(',')
+    try:
+        horizon = int(args[1]) if len(args) > 1 else 20
+    except ValueError:
+        horizon = 0
+    if args[0] not in sampling.conditions or horizon < 1:
+        print(f"Invalid sample argument: {kwargs['sample']} (eg, below_bb,20; "
+              f"conditions: {', '.join(sampling.conditions)})")
+        exit(1)
+    day_span = kwargs["days"]
+    gradient = kwargs["gradient"]
+
+    universe = tickers.get_universe()
+    samples = sampling.samples(universe, args[0], horizon)
+    print(f"# {len(samples):>5} samples of {args[0]} in {len(universe.symbols)} symbols")
+    sampling.summarize(samples, horizon)
+
+    if kwargs["filterOnly"]:
+        samples.to_csv(file_name + ".tsv", sep="\t", index=False)
+        return
+
+    securities = samples_to_securities(universe, samples, after=horizon)
+    chart_batches(file_name, securities, panel_row, panel_col, [], day_span, gradient, fig_wid, fig_dep)
+
+
+def cached_result(file, df, kwargs):
+    """Get the cached table of a list if the list, screening arguments and price data are unchanged
+
+    Args:
+        file (str): path to list file
+        df (dataframe): content of the list file
+        kwargs (dict): command line key word arguments
+
+    Returns:
+        cache_key (str): key of the table in the result cache ('' for no caching)
+        versions (dict): symbol -> data version
+        table (dataframe): filtered and sorted table (None if not cached)
+    """
+    if not kwargs["cache"] or kwargs["similar"] or kwargs["sample"]:
+        return "", {}, None
+    symbols = list(df.get("Symbol", df.get("Ticker", []))) + result_cache.referenced_symbols(kwargs["dir"], kwargs)
+    versions = result_cache.data_versions(kwargs["dir"], symbols)
+    cache_key = result_cache.screen_key(file, kwargs)
+    return cache_key, versions, result_cache.load_result(kwargs["cache"], cache_key, versions)
+
+
+def chart_securities(file, tickers=None, symbol_cache=None, **kwargs):
     """Chart a list of securities included in input file
 
     Args:
         file (str): path to a text input file with rows representing securities and columns representing attributes
+        tickers (AttributeTable object): securities of the file with loaded price data (loaded if not given)
+        symbol_cache (SymbolCache object): price data and time series shared with other lists of the run
         kwargs (dict): command line key word arguments
     """
 
@@ -151,12 +357,11 @@ def chart_securities(file, **kwargs):
     # the total number of input securities and charting related argument
     if "," in day_span:
         default_row_num = 4
-    panel_row = candlestick.set_row_num(num_stickers)
+    panel_row = candlestick.set_row_num(min(num_stickers, kwargs["top"]) if kwargs["top"] else num_stickers)
     panel_row = default_row_num if panel_row > default_row_num else panel_row
     panel_col = panel_row
     if ',' in day_span:
         panel_col = int((panel_col + 1) / 2)
-    num_pic_per_file = panel_col * panel_row
 
     if default_row_num == 1:
         fig_wid = 10
@@ -165,10 +370,33 @@ def chart_securities(file, **kwargs):
     # Securities to be re-charted in different scale (not implemented yet)
     to_be_recycled = []
 
-    # Filter and sort securities
-    tickers = AttributeTable(df, directory, kwargs)
-    tickers.work()
-    df = tickers.get_attribute_table()
+    # Reuse cached table when the list, screening arguments and price data are unchanged
+    cache_key, versions, cached = cached_result(file, df, kwargs)
+    if cached is not None:
+        print(f"# {len(cached):>5} symbols in cached result")
+        # load price data of cached survivors only (breadth overlay needs the whole list)
+        if tickers is None and kwargs["weather"] != "breadth":
+            df = df[df.get("Symbol", df.get("Ticker")).isin(cached.index)]
+
+    # Filter and sort securities (no price data needed for a cached table without charts)
+    if cached is not None and (kwargs["filterOnly"] or cached.empty):
+        df = cached
+    else:
+        if tickers is None:
+            tickers = AttributeTable(df, kwargs["dir"], kwargs, symbol_cache)
+        if kwargs["similar"]:
+            chart_similar(tickers, file_name, panel_row, panel_col, fig_wid, fig_dep, **kwargs)
+            return
+        if kwargs["sample"]:
+            chart_samples(tickers, file_name, panel_row, panel_col, fig_wid, fig_dep, **kwargs)
+            return
+        if cached is not None:
+            tickers.set_attribute_table(cached)
+        else:
+            tickers.work()
+            if cache_key:
+                result_cache.save_result(kwargs["cache"], cache_key, versions, tickers.get_attribute_table())
+        df = tickers.get_attribute_table()
     # If not sorted, then sort by symbol
     if "Sort" in df:
         unique_sort_value = len(df["Sort"].unique())
@@ -185,28 +413,55 @@ def chart_securities(file, **kwargs):
         df.to_csv(file_name + ".tsv", sep="\t")
     else:
         # Plot multi-panel figure while going through a dictionary of security objects
-        securities = attributes_to_securities(tickers, use_volume=kwargs["plot_volumne"])
+        second_span = day_span.split(",")[1] if "," in day_span else ""
+        securities = {}
+        if tickers is not None:
+            securities = attributes_to_securities(tickers, use_volume=kwargs["plot_volumne"], scale=second_span,
+                                                  weather=kwargs["weather"], profile_bins=kwargs["plot_volume_profile"])
         print(f"# {len(securities):>5} data to plot")
         num_to_plot = len(securities) if len(securities) > 0 else 0
 
         if num_to_plot:
-            security_batch = {}
-            c = 10000
+            chart_batches(file_name, securities, panel_row, panel_col, to_be_recycled,
+                          day_span, gradient, fig_wid, fig_dep)
 
-            # Make one image for every certain number of securities
-            for key, security in securities.items():
-                c += 1
-                security_batch[key] = security
-                if len(security_batch) % num_pic_per_file == 0:
-                    # Create one output file for every 'num_to_plot' securities
-                    make_image_file(file_name, security_batch, c, panel_row, panel_col, to_be_recycled,
-                                    day_span, gradient, fig_wid, fig_dep)
-                    security_batch = {}
 
-            # Make one image for remaining securities
-            if len(security_batch) > 0:
-                make_image_file(file_name, security_batch, c, panel_row, panel_col, to_be_recycled,
-                                day_span, gradient, fig_wid, fig_dep)
+# lists loaded by the parent process, charted by forked worker processes
+_loaded = []
+
+
+def chart_loaded(position):
+    """Filter, sort and chart a list loaded before forking (in a worker process)
+    """
+    file, tickers, kwargs = _loaded[position]
+    chart_securities(file, tickers, **kwargs)
+
+
+def chart_lists(files, list_processes=1, **kwargs):
+    """Chart lists of securities, reading and processing each security once for all lists
+
+    Args:
+        files (list): paths to list files
+        list_processes (int): number of processes filtering and charting lists at the same time
+        kwargs (dict): command line key word arguments
+    """
+    global _loaded
+    symbol_cache = SymbolCache()
+    if list_processes > 1 and len(files) > 1 and "fork" in multiprocessing.get_all_start_methods():
+        # load every list here, so shared securities are read once and forked processes share them
+        # (lists with a cached table load their cached securities in the worker process)
+        _loaded = []
+        for file in files:
+            df = pd.read_csv(file, sep="\t")
+            cached = cached_result(file, df, kwargs)[2] is not None
+            _loaded.append((file, None if cached else AttributeTable(df, kwargs["dir"], dict(kwargs), symbol_cache),
+                            kwargs))
+        with multiprocessing.get_context("fork").Pool(min(list_processes, len(files))) as pool:
+            pool.map(chart_loaded, range(len(_loaded)))
+        _loaded = []
+    else:
+        for file in files:
+            chart_securities(file, symbol_cache=symbol_cache, **kwargs)
 
 
 def summarize_profit_loss(series):
@@ -230,8 +485,6 @@ def summarize_profit_loss(series):
 
 if __name__ == "__main__":
 
-    LAST_REMOVED_ROWS = 0
-
     # argument parser
     parser = arguments.get_parser()
     if len(sys.argv) == 1:
@@ -241,5 +494,4 @@ if __name__ == "__main__":
 
     # main code
     directory = args.dir
-    for file in args.list:
-        chart_securities(file, **vars(args))
+    chart_lists(args.list, **vars(args))
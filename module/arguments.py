@@ -4,7 +4,8 @@ import argparse
 def get_parser():
     #print('get_parsed 1')
     # parser
-    text= "Given a symbol list, draw candlesticks for each of item"
+    text= "Given a symbol list, draw candlesticks for each of item. Values of filter and sort options " \
+          "can be prefixed with d:, w: or m: to use daily, weekly or monthly data (eg, -upw w:30,0.8)"
     parser = argparse.ArgumentParser(description = text)
     
     parser.add_argument("list", 
@@ -43,6 +44,8 @@ def get_parser():
                         default=False,
                         help=": plot volumne data",
                         action='store_true')
+    parser.add_argument("-pvp", "--plot_volume_profile", type=int, default=0,
+                        help=": plot volume-by-price profile with defined number of price bins (eg, 40)")
     parser.add_argument("-rms", "--remove_sector",
                         type=str, default='',
                         help=": sectors to be removed, e.g., Medical,Oil",
@@ -93,6 +96,21 @@ def get_parser():
     parser.add_argument("-fema3", "--filter_ema_3layers", type=str, default="",
                         help=": filter for query EMA sandwiched between two defined EMAs (eg, 2,20,100) "
                              "for a recent period (eg, 2,20,100,20,0.8)")
+    parser.add_argument("-fbr", "--filter_breadth", type=str, default="",
+                        help=": keep securities only if market breadth of all securities at the last date is in range, "
+                             "eg, above50,60 or net_new_highs,0,100 (above20, above50, above200, advances, declines, "
+                             "net_advance, ad_line, new_highs, new_lows, net_new_highs)")
+    parser.add_argument("-fvp", "--filter_volume_profile", type=str, default="",
+                        help=": filter for last close within a distance above the heaviest volume-by-price level "
+                             "below (support) in recent period, eg, 120,0.03; add ,r for the level above (resistance)")
+    parser.add_argument("-fcdl", "--filter_candle_pattern", type=str, default="",
+                        help=": filter for candlestick pattern(s) in recent period, eg, hammer,3 or engulfing+gap_up,2 "
+                             "(engulfing, bear_engulfing, hammer, shooting_star, doji, inside_bar, outside_bar, "
+                             "gap_up, gap_down)")
+    parser.add_argument("-fx", "--filter_expression", type=str, default="",
+                        help=": filter by screen expression at the last bar, eg, \"rsi14 < 30 and close > ema200 and "
+                             "vol10 > 2 * vol30\" (open, high, low, close, volume, emaN, smaN, rsiN, volN, highN, "
+                             "lowN, chgN)")
 
 
     # SORT
@@ -111,7 +129,25 @@ def get_parser():
     parser.add_argument("-scr", "--sort_change_to_ref", type=str, default="",
                         help=": sort by price change given reference date(s), eg 2019-10-01,2019-10-010")
     parser.add_argument("-spfm", "--sort_performance", type=str, default=0,
-                        help=": sort by relative price change in defined recent period, eg, 20 or 20,SPY")
+                        help=": sort by price change in defined recent period, eg, 20 or 20,SPY (relative to SPY) "
+                             "or 20,0.1,SPY (with cutoff)")
+    parser.add_argument("-bm", "--benchmark", type=str, default="",
+                        help=": add columns of price change relative to benchmark(s) in recent period, eg, 20,SPY,QQQ")
+    parser.add_argument("-wth", "--weather", type=str, default="",
+                        help=": plot daily change of a benchmark (eg, SPY) or net advances of all securities "
+                             "(breadth) beneath candlesticks")
+    parser.add_argument("-srst", "--sort_relative_strength", type=str, default="",
+                        help=": sort by relative strength percentile (weighted 3/6/9/12-month return ranked against "
+                             "all securities) and keep those ranked at or above cutoff, eg, 80 (0 to sort only)")
+    parser.add_argument("-sgm", "--sort_group_momentum", type=str, default="",
+                        help=": sort by rank (percentile) of industry/sector group performance in recent period and "
+                             "keep those at or above cutoff, eg, Industry,60,80 or Sector,20")
+    parser.add_argument("-srk", "--sort_risk", type=str, default="",
+                        help=": sort by risk in recent period (low first) and keep those at or below cutoff, eg, "
+                             "volatility,60,0.4 or beta,120,1.5,SPY (volatility, max_drawdown, ulcer, beta)")
+    parser.add_argument("-scor", "--sort_correlation", type=str, default="",
+                        help=": group by clusters of correlated daily returns in recent period, eg, 120,0.7 "
+                             "(days,minimal average correlation); add ,1 to keep one security per cluster")
     parser.add_argument("-smd", "--sort_ema_distance", type=int, default=0,
                         help=": sort by last close to SMA distance")
     parser.add_argument("-sbd", "--filter_bbdistance", type=str, default="",
@@ -129,10 +165,16 @@ def get_parser():
                         
                         
 
+    # SIMILARITY SEARCH
+    parser.add_argument("-sim", "--similar", type=str, default="",
+                        help=": chart windows in price history of all securities most similar in shape to a query "
+                             "window, eg, AAPL,2018-03-01,2018-04-10,20 (symbol,start,end,number of windows)")
+
     #SAMPLING
     parser.add_argument("-smpl", "--sample",
                         type=str, default="",
-                        help=": strategical sampling of historical data point: stks_bb, below_bb, plunge_macd")
+                        help=": every date in price history meeting a condition, with the change in following bars "
+                             "(default 20): stks_bb, below_bb, plunge_macd (eg, below_bb,20)")
 
     parser.add_argument("-bdat", "--backtest_date",
                         type=str, default="",
@@ -140,6 +182,24 @@ def get_parser():
 
 
 
+    # SCREENING PLAN
+    parser.add_argument("-xpl", "--explain", default=False, action='store_true',
+                        help=": print order of filters (by measured cost and selectivity) with survivors and "
+                             "time of each")
+    parser.add_argument("-np", "--processes", type=int, default=1,
+                        help=": number of processes evaluating filters security by security (eg, -np 8)")
+    parser.add_argument("-kt", "--top", type=int, default=0,
+                        help=": keep and chart only the first securities in sorted order, taken without sorting "
+                             "the others (eg, -kt 25)")
+    parser.add_argument("-lp", "--list_processes", type=int, default=1,
+                        help=": number of processes filtering and charting list files at the same time, after "
+                             "loading every security of all lists once (eg, -lp 4)")
+
+    # RESULT CACHE
+    parser.add_argument("-cch", "--cache", type=str, default="",
+                        help=": directory of on-disk cache of screening results, reused while list, arguments and "
+                             "price data are unchanged (eg, .pytas_cache)")
+
     # SKIP CHARTING
     parser.add_argument("-f", "--filterOnly", default=False,
                         help=": filter names only", action='store_true')
@@ -3,6 +3,8 @@ AttributeTable class and methods
 """
 
 import os
+import re
+import copy
 import sys
 import math
 import numpy as np
@@ -10,9 +12,158 @@ import pandas as pd
 import threading
 import multiprocessing
 import module.utility as utility
+import module.signal_matrix as signal_matrix
+import module.candle_pattern as candle_pattern
+import module.window_stats as window_stats
+import module.cross_section as cross_section
+import module.correlation as correlation
+import module.group_momentum as group_momentum
+import module.benchmark as benchmark
+import module.volume_profile as volume_profile
+import module.breadth as breadth
+import module.risk as risk
+import module.filter_plan as filter_plan
+import module.screen_expression as screen_expression
+import module.snapshot as snapshot
+import module.result_cache as result_cache
 from module.time_series_plus import TimeSeriesPlus
+from module.universe import Universe, resample_frame
 from module.candlestick import date_to_index
 
+timeframe_scales = {'d': 'day', 'w': 'week', 'm': 'month'}
+
+# keyword arguments changing which price data are loaded (other arguments can reuse loaded data)
+loading_arguments = ["dir", "time_scale", "backtest_date", "remove_sector", "sort_dateAdded"]
+
+# filter and sort arguments handled by screening stages (method 'stage_' + name), in option order
+screen_options = [
+    "filter_breadth", "filter_price", "sort_trange", "filter_macd_sgl", "filter_ema_sgl", "filter_rsi",
+    "filter_surging_volume", "filter_exploding_volume", "filter_consolidation_p", "filter_stochastic_sgl",
+    "filter_candle_pattern", "filter_expression", "filter_parallel_ema", "filter_ema_3layers", "filter_hit_ema_support",
+    "filter_bbdistance", "sort_rsi_std", "sort_ema_attraction", "sort_ema_entanglement", "filter_upward",
+    "filter_horizon_slice", "filter_volume_profile", "filter_ema_slice", "filter_hit_horizontal_support",
+    "filter_hit_horizontal_resistance", "sort_ema_distance", "sort_change_to_ref", "sort_performance",
+    "sort_relative_strength", "sort_group_momentum", "sort_risk", "sort_correlation",
+]
+
+
+def rename_columns(df):
+    """Change column heads in yahoo finance-downloaded tiemseries data into alpha-advantage format
+    """
+    if 'Date' in df.columns:
+        df.rename(columns={'Date': 'date'}, inplace=True)
+    if 'Open' in df.columns:
+        df.rename(columns={'Open': '1. open'}, inplace=True)
+    if 'High' in df.columns:
+        df.rename(columns={'High': '2. high'}, inplace=True)
+    if 'Low' in df.columns:
+        df.rename(columns={'Low': '3. low'}, inplace=True)
+    if 'Close' in df.columns:
+        df.rename(columns={'Close': '4. close'}, inplace=True)
+    if 'Volume' in df.columns:
+        df.rename(columns={'Volume': '5. volume'}, inplace=True)
+    return df
+
+
+def read_price(data_dir, symbol):
+    """Read price data of a security from data directory
+
+    Args:
+        data_dir (str): path to the directory containing price data
+        symbol (str): security symbol (data file name without '.txt')
+
+    Returns:
+        dataframe: price data indexed by date (None if not available)
+    """
+    file = data_dir + "/" + symbol + ".txt"
+    if not os.path.exists(file):
+        return None
+    try:
+        price = pd.read_csv(file, sep="\t", parse_dates=['date'], index_col=['date'])
+    except ValueError:
+        price = pd.read_csv(file, sep="\t", parse_dates=['Date'], index_col=['Date'])
+        price = rename_columns(price)
+    except:
+        e = sys.exc_info()[0]
+        print("x-> Error while reading historical data for {}\t error: {}".format(symbol, e))
+        return None
+    return price
+
+
+class ScaledTimeSeries(dict):
+    """A dictionary of time series objects created on first access from a (resampled) universe
+    """
+
+    def __init__(self, universe):
+        super().__init__()
+        self.universe = universe
+
+    def __missing__(self, symbol):
+        self[symbol] = TimeSeriesPlus(self.universe.get_frame(symbol))
+        return self[symbol]
+
+
+class SymbolCache:
+    """A class holding price data and time series objects of securities, shared by all lists loaded in one run
+
+        Lists sharing securities read and process each security once. Entries are
+        keyed by the data directory and the loading arguments they depend on.
+
+    Attributes:
+        prices (dict): (data directory, symbol) -> price data without rows with NA (None if not available)
+        fates (dict): (data directory, symbol, backtest date, extension, strategy) -> outcome of backtest trade
+        timeseries (dict): (loading arguments, time scale, use, symbol) -> TimeSeriesPlus object
+    Methods:
+        get_price():
+            Get price data of a security, read on first use
+        get_fate():
+            Get outcome of a backtest trade, computed on first use
+        get_timeseries():
+            Get time series object of a security, created on first use
+    """
+
+    def __init__(self):
+        self.prices = {}
+        self.fates = {}
+        self.timeseries = {}
+
+    def get_price(self, data_dir, symbol):
+        """Get price data of a security, read on first use
+
+        Returns:
+            dataframe: price data without rows with NA (None if not available)
+        """
+        key = (data_dir, symbol)
+        if key not in self.prices:
+            price = read_price(data_dir, symbol)
+            if price is not None:
+                price = price.replace('', np.nan).dropna(axis='index')
+            self.prices[key] = price
+        return self.prices[key]
+
+    def get_fate(self, data_dir, symbol, price, backtest_date, extension, strategy):
+        """Get outcome of a trade entered after backtest date (see TimeSeriesPlus.get_fate), computed on first use
+        """
+        key = (data_dir, symbol, backtest_date, extension, strategy)
+        if key not in self.fates:
+            self.fates[key] = TimeSeriesPlus(price).get_fate(backtest_date, extension, 'next', 5, strategy)
+        return self.fates[key]
+
+    def get_timeseries(self, key, symbol, price):
+        """Get time series object of a security, created on first use
+
+        Args:
+            key (tuple): loading arguments, time scale and use (test or plot) of the price data
+            symbol (str): security symbol
+            price (dataframe): price data (used on first use only)
+
+        Returns:
+            TimeSeriesPlus object
+        """
+        if (key, symbol) not in self.timeseries:
+            self.timeseries[(key, symbol)] = TimeSeriesPlus(price)
+        return self.timeseries[(key, symbol)]
+
 
 class AttributeTable():
     """A class representing a list of securities and their attributes
@@ -26,27 +177,73 @@ class AttributeTable():
         backtest_strategy (str): how exit is made after entering into a trade (options: 2R, 2.5R, )
         sts_daily_test (dict): dictionary holding timeseries data for each security used for sorting and filtering
         sts_daily_plot (dict): dictionary holding timeseries data for each security used for plotting only
+        price_daily (dict): dictionary holding daily price data for each security used for sorting and filtering
+        price_plot (dict): dictionary holding daily price data for each security used for plotting only
+        universes (dict): Universe objects (aligned daily price data with cached weekly/monthly data)
+        sts_scaled (dict): time scale -> dictionary holding timeseries data in that scale, created on demand
+        timeframes (dict): keyword argument -> time scale given by qualifier (eg, 'w:' in 'w:160,0.8')
+        universe_table (dataframe): attributes of all securities with price data, before filtering
+        symbol_cache (SymbolCache object): price data and time series shared with other lists (None for no sharing)
+        benchmarks (dict): benchmark symbol -> price data (eg, SPY), loaded on demand
         attribute_table_bythread (list): a list of attribute_table
-        sts_daily_test_bythread (list): a list of sts_daily_test
-        sts_daily_plot_bythread (list): a list of sts_daily_plot
+        price_daily_bythread (list): a list of price_daily
+        price_plot_bythread (list): a list of price_plot
     Methods:
         combine_thread_output():
             Combine security attributes and time series data from mulitple thread
+        with_arguments():
+            Get a copy sharing loaded data for other keyword arguments
         get_attribute_table():
             Get table containing securities and their attributes
         get_dict_timeseries():
             Get a dictionary containing time series price data for each security
+        get_time_scale():
+            Get time scale and mode defined by keyword argument
+        get_universe():
+            Get daily, weekly or monthly price data aligned across securities
+        get_plot_universe():
+            Get aligned price data of the time series for plotting
+        get_scaled_price():
+            Get weekly or monthly price data of one security for plotting
+        get_test_scale():
+            Get time scale of data used for sorting and filtering
+        split_timeframes():
+            Separate timeframe qualifiers from filter and sort arguments
+        timeframe():
+            Get time scale for a filter or sort argument
+        get_timeseries():
+            Get time series data in a given time scale for sorting and filtering
+        read_price():
+            Read price data of one security from data directory
+        get_benchmark():
+            Get price data of a benchmark (loaded once)
+        get_relative_return():
+            Get price change relative to a benchmark for all securities
+        get_benchmark_change():
+            Get daily benchmark change on the dates of one security (chart overlay)
+        get_weather():
+            Get market change (benchmark or breadth) on the dates of one security (chart overlay)
+        add_benchmark_columns():
+            Add columns of returns relative to benchmarks
         basic_processing():
             default data cleaning and sorting
         make_header():
             create columns for header and annotation information
         read_timeseries():
             read in price data of securities
+        build_timeseries():
+            create time series objects (with indicators) from price data
         work():
             keyword argument-based filtering and sorting
+        screen_stages():
+            Get screening stages (filter_plan.Stage) of filter and sort arguments
+        stage_context():
+            Get settings that values of a screening stage depend on (for result cache)
+        stage_<argument>():
+            Get the screening stage of one filter or sort argument (eg, stage_filter_rsi)
     """
 
-    def __init__(self, attribute_table, data_dir, kwargs):
+    def __init__(self, attribute_table, data_dir, kwargs, symbol_cache=None):
         self._attribute_table = attribute_table.copy(deep=True)
         self.data_dir = data_dir
         self.kwargs = kwargs
@@ -56,9 +253,17 @@ class AttributeTable():
         self.check_date = ''
         self.sts_daily_test = {}
         self.sts_daily_plot = {}
+        self.price_daily = {}
+        self.price_plot = {}
+        self.universes = {}
+        self.sts_scaled = {}
+        self.timeframes = {}
+        self.universe_table = pd.DataFrame()
+        self.benchmarks = {}
+        self.symbol_cache = symbol_cache
         self.attribute_table_bythread = []
-        self.sts_daily_test_bythread = []
-        self.sts_daily_plot_bythread = []
+        self.price_daily_bythread = []
+        self.price_plot_bythread = []
         # warming up steps
         self.basic_processing()
         self.backtest()
@@ -68,27 +273,43 @@ class AttributeTable():
     def combine_thread_output(self):
         """Combine security attributes and time series data from mulitple thread
         """
-        attribute_table = pd.DataFrame()
-        sts_daily_test = {}
-        sts_daily_plot = {}
-        
-        # if len(self.attribute_table_bythread) > 1:
-        #     print("# {:>5} run with {} threads to read input data".format('', len(self.attribute_table_bythread)))
-        
-        for table in self.attribute_table_bythread:
-#             print('subset', table.shape[0])
-            if attribute_table.shape[0] < 1:
-                attribute_table = table
-            else:
-                attribute_table = attribute_table.append(table)
-        for i in self.sts_daily_test_bythread:
-            sts_daily_test = {**sts_daily_test, **i}
-        for i in self.sts_daily_plot_bythread:
-            sts_daily_plot = {**sts_daily_plot, **i}
+        price_daily = {}
+        price_plot = {}
+
+        # concatenate once (appending table by table copies the growing table every time)
+        tables = [table for table in self.attribute_table_bythread if table.shape[0] > 0]
+        if tables:
+            attribute_table = pd.concat(tables)
+        elif self.attribute_table_bythread:
+            attribute_table = self.attribute_table_bythread[-1]
+        else:
+            attribute_table = pd.DataFrame()
+        for i in self.price_daily_bythread:
+            price_daily.update(i)
+        for i in self.price_plot_bythread:
+            price_plot.update(i)
 
         self._attribute_table = attribute_table
-        self.sts_daily_test = sts_daily_test
-        self.sts_daily_plot = sts_daily_plot
+        self.price_daily = price_daily
+        self.price_plot = price_plot
+
+    def with_arguments(self, kwargs):
+        """Get a copy for other keyword arguments, sharing loaded price data, time series and
+            cached indicators
+
+            Arguments in 'loading_arguments' must be the same as those of this object.
+
+        Args:
+            kwargs (dict): keyword arguments
+
+        Returns:
+            AttributeTable object
+        """
+        tickers = copy.copy(self)
+        tickers._attribute_table = self._attribute_table.copy()
+        tickers.kwargs = dict(kwargs)
+        tickers.timeframes = {}
+        return tickers
 
     def get_attribute_table(self):
         """Get securities table associated with this object
@@ -101,6 +322,11 @@ class AttributeTable():
         # print('get_attribute_table', self._attribute_table.shape)
         return self._attribute_table
 
+    def set_attribute_table(self, table):
+        """Use a filtered and sorted securities table (eg, from the result cache) instead of work()
+        """
+        self._attribute_table = table
+
     def get_dict_timeseries(self):
         """Get a dictionary containing time series price data for each security
             if no time series data for plot purpose is available, return data used for sorting and filtering
@@ -110,6 +336,117 @@ class AttributeTable():
         else:
             return self.sts_daily_test
 
+    def get_time_scale(self):
+        """Get time scale and mode defined by keyword argument 'time_scale' (eg, week,c)
+
+        Returns:
+            scale (str): 'week', 'month' or '' (daily)
+            mode (str): 'c' to transform data for charting only, '' otherwise
+        """
+        scale = ""
+        mode = ""
+        arg = self.kwargs["time_scale"]
+        if ',' in arg:
+            scale, mode = arg.split(",")
+        else:
+            scale = arg
+        if scale not in ("week", "month"):
+            scale = ""
+        return scale, mode
+
+    def get_universe(self, scale='', plot=False):
+        """Get price data aligned across all loaded securities
+
+            The daily universe is built once from the loaded daily price data. Weekly
+            and monthly data are resampled from it once and cached.
+
+        Args:
+            scale (str): 'day', 'week' or 'month'. If not given, use the time scale of data for sorting
+                and filtering
+            plot (boolean): use price data for plotting (if available) instead of data for sorting and filtering
+
+        Returns:
+            Universe object
+        """
+        if not scale:
+            scale = self.get_test_scale()
+        source = 'plot' if plot and self.price_plot else 'test'
+        if source not in self.universes:
+            frames = self.price_plot if source == 'plot' else self.price_daily
+            self.universes[source] = Universe(frames)
+        return self.universes[source].resample(scale)
+
+    def get_plot_universe(self):
+        """Get aligned price data of the time series given by get_dict_timeseries
+        """
+        scale, mode = self.get_time_scale()
+        if scale and mode == "c":
+            return self.get_universe(scale)
+        if self.price_plot:
+            return self.get_universe("day", plot=True)
+        return self.get_universe()
+
+    def get_test_scale(self):
+        """Get time scale of data used for sorting and filtering ('day', 'week' or 'month')
+        """
+        scale, mode = self.get_time_scale()
+        if not scale or mode == "c":
+            scale = "day"
+        return scale
+
+    def split_timeframes(self):
+        """Separate timeframe qualifiers from filter and sort arguments
+
+            A filter or sort argument prefixed with 'd:', 'w:' or 'm:' (eg, -upw w:30,0.8)
+            is evaluated on daily, weekly or monthly data, independent of the time scale of
+            other arguments.
+        """
+        for key, value in self.kwargs.items():
+            if not (key.startswith("filter_") or key.startswith("sort_")) or not isinstance(value, str):
+                continue
+            mymatch = re.match(r'^([dwm]):(.+)$', value)
+            if mymatch:
+                self.timeframes[key] = timeframe_scales[mymatch.group(1)]
+                self.kwargs[key] = mymatch.group(2)
+
+    def timeframe(self, key):
+        """Get time scale for a filter or sort argument ('' for the default time scale)
+
+        Args:
+            key (str): keyword argument name (eg, filter_upward)
+        """
+        return self.timeframes.get(key, "")
+
+    def get_timeseries(self, scale=''):
+        """Get time series data for sorting and filtering in defined time scale
+
+            Data in a time scale other than the default one are resampled once from the
+            cached universe; time series objects are created when first used.
+
+        Args:
+            scale (str): 'day', 'week' or 'month' ('' for the default time scale)
+
+        Returns:
+            dict: symbol -> TimeSeriesPlus object
+        """
+        if not scale or scale == self.get_test_scale():
+            return self.sts_daily_test
+        if scale not in self.sts_scaled:
+            self.sts_scaled[scale] = ScaledTimeSeries(self.get_universe(scale))
+        return self.sts_scaled[scale]
+
+    def get_scaled_price(self, symbol, scale):
+        """Get weekly or monthly price data of a security for plotting
+
+        Args:
+            symbol (str): security symbol
+            scale (str): 'week' or 'month'
+
+        Returns:
+            dataframe: resampled price data
+        """
+        return self.get_universe(scale, plot=True).get_frame(symbol)
+
     def basic_processing(self):
         """Basic attribute data processing (update self.description)
         
@@ -152,11 +489,9 @@ class AttributeTable():
            PE, PEG and next earning report date. 
         """
         df = self._attribute_table
-        df["header"] = ""
-        df["annotation"] = ""
+        headers = []
+        annotations = []
         for sticker, row in df.iterrows():
-            row_copy = row.copy(deep=True)
-
             # prepare figure header
             header = ""
             annot = ""
@@ -171,32 +506,109 @@ class AttributeTable():
                                                    int(row["# of Brokers in Rating"]))
             if "Long-Term Growth Consensus Est." in row:
                 header = header + "ltg{}".format(row["Long-Term Growth Consensus Est."])
-            df.loc[sticker, "header"] = header
+            headers.append(header)
             if "P/E (Trailing 12 Months)" in row:
                 annot = annot + "pe" + str(row["P/E (Trailing 12 Months)"])
             if "PEG Ratio" in row:
                 annot = annot + "peg" + str(row["PEG Ratio"])
             if "Next EPS Report Date " in row:
                 annot = annot + "eday" + str(row["Next EPS Report Date "])
-            df.loc[sticker, "annotation"] = annot
+            annotations.append(annot)
+        # set columns once (setting cell by cell is slow on long lists)
+        df["header"] = pd.Series(headers, index=df.index, dtype=object)
+        df["annotation"] = pd.Series(annotations, index=df.index, dtype=object)
         self._attribute_table = df
 
+    def read_price(self, symbol):
+        """Read price data of a security from data directory
+
+        Args:
+            symbol (str): security symbol (data file name without '.txt')
+
+        Returns:
+            dataframe: price data indexed by date (None if not available)
+        """
+        return read_price(self.data_dir, symbol)
+
+    def get_benchmark(self, symbol, scale="day"):
+        """Get price data of a benchmark security (eg, SPY), read once from data directory
+
+        Args:
+            symbol (str): benchmark symbol
+            scale (str): 'day', 'week' or 'month'
+
+        Returns:
+            dataframe: price data
+        """
+        if symbol not in self.benchmarks:
+            price = self.read_price(symbol)
+            if price is None:
+                raise ValueError("No price data for benchmark {} in {}".format(symbol, self.data_dir))
+            price.replace('', np.nan, inplace=True)
+            self.benchmarks[symbol] = price.dropna(axis='index')
+        if scale in ("week", "month"):
+            return resample_frame(self.benchmarks[symbol], scale)
+        return self.benchmarks[symbol]
+
+    def get_relative_return(self, symbol, bars, scale=''):
+        """Get price change relative to a benchmark over recent bars for all securities
+
+        Args:
+            symbol (str): benchmark symbol
+            bars (int): number of bars to look back
+            scale (str): time scale ('' for the time scale of sorting and filtering)
+
+        Returns:
+            pandas series: relative change at the last bar of each security, indexed by symbol
+        """
+        universe = self.get_universe(scale)
+        price = self.get_benchmark(symbol, universe.scale)
+        return universe.last_row(benchmark.relative_return(universe, symbol, price, bars))
+
+    def get_benchmark_change(self, symbol, benchmark_symbol):
+        """Get daily price change of a benchmark on the dates of a security (for chart overlay)
+
+        Args:
+            symbol (str): security symbol
+            benchmark_symbol (str): benchmark symbol
+
+        Returns:
+            pandas series: benchmark change since the previous bar of the security, indexed by date
+        """
+        universe = self.get_universe("day", plot=True)
+        change = benchmark.benchmark_return(universe, benchmark_symbol, self.get_benchmark(benchmark_symbol), 1)
+        return change[symbol][universe.valid()[symbol]]
+
+    def get_weather(self, symbol, source):
+        """Get daily market change on the dates of a security (for chart overlay)
+
+        Args:
+            symbol (str): security symbol
+            source (str): benchmark symbol (eg, SPY), or 'breadth' for net advances of all loaded securities
+
+        Returns:
+            pandas series: market change indexed by date (net advance is scaled so that all
+                securities advancing equals a 2% benchmark change)
+        """
+        if source != "breadth":
+            return self.get_benchmark_change(symbol, source)
+        universe = self.get_universe("day", plot=True)
+        net_advance = breadth.market_breadth(universe)["net_advance"] * 0.02
+        return net_advance[universe.valid()[symbol]]
+
+    def add_benchmark_columns(self):
+        """Add columns of price change relative to benchmarks (keyword argument 'benchmark', eg, 20,SPY,QQQ)
+        """
+        args = self.kwargs["benchmark"].split(',')
+        bars = int(args[0])
+        for symbol in args[1:]:
+            relative = self.get_relative_return(symbol, bars)
+            self._attribute_table["vs {} {}".format(symbol, bars)] = relative[self._attribute_table.index]
+
     def df_rename_columns(self, df):
         """Change column heads in yahoo finance-downloaded tiemseries data into alpha-advantage format
         """
-        if 'Date' in df.columns:
-            df.rename(columns={'Date': 'date'}, inplace=True)
-        if 'Open' in df.columns:
-            df.rename(columns={'Open': '1. open'}, inplace=True)
-        if 'High' in df.columns:
-            df.rename(columns={'High': '2. high'}, inplace=True)
-        if 'Low' in df.columns:
-            df.rename(columns={'Low': '3. low'}, inplace=True)
-        if 'Close' in df.columns:
-            df.rename(columns={'Close': '4. close'}, inplace=True)
-        if 'Volume' in df.columns:
-            df.rename(columns={'Volume': '5. volume'}, inplace=True)
-        return df
+        return rename_columns(df)
 
     def backtest(self):
         """Set up backtest parameters if keyword argument is given
@@ -257,6 +669,7 @@ class AttributeTable():
 
         # Merge data across threads and print report
         self.combine_thread_output()
+        self.build_timeseries()
         if self.kwargs["remove_sector"]:
             print("# {:>5} symbols have valid time series data "
                   "(length>{}, volume>{} and not associated with sector(s) {}".format(
@@ -273,11 +686,15 @@ class AttributeTable():
             minimal_rows (int): minimal number of rows for a security to be loaded
             minimal_volume (int): minimal volume in the last trading day for a security to be loaded
         """
-        dict_sts = {}
-        dict_sts_plot = {}
+        dict_price = {}
+        dict_price_plot = {}
         backtest_date_invalid = 0
         df_symbols = df.copy(deep=True)
-        
+        # rejected symbols and attributes found while reading, applied to the table after the loop
+        # (dropping rows one at a time copies the table every time)
+        rejected = set()
+        assigned = {'Date Added': {}, 'PL': {}, 'exit Price': {}, 'Date Sold': {}}
+
         for symbol, row in df_symbols.iterrows():
             # remove symbol associated with defined sectors
             removed_sector = ""
@@ -293,31 +710,24 @@ class AttributeTable():
                             remove = True
                             break
                 if remove:
-                    df_symbols = df_symbols.drop(symbol)
+                    rejected.add(symbol)
                     continue
 
             # read in data files
-            file = self.data_dir + "/" + symbol + ".txt"
-            if not os.path.exists(file):
-                df_symbols = df_symbols.drop(symbol)            
+            if self.symbol_cache is not None:
+                price = self.symbol_cache.get_price(self.data_dir, symbol)
+            else:
+                price = self.read_price(symbol)
+            if price is None:
+                rejected.add(symbol)
             else:
-                # read in data into dataframe
-                try:
-                    price = pd.read_csv(file, sep="\t", parse_dates=['date'], index_col=['date'])
-                except ValueError:
-                    price = pd.read_csv(file, sep="\t", parse_dates=['Date'], index_col=['Date'])
-                    price = self.df_rename_columns(price)
-                except:
-                    e = sys.exc_info()[0]
-                    print("x-> Error while reading historical data for {}\t error: {}".format(symbol, e))
-                    df_symbols = df_symbols.drop(symbol)
-
                 # remove rows with NA, remove df with insufficient rows or with low trading volume
-                price.replace('', np.nan, inplace=True)
-                price = price.dropna(axis='index')
-                if symbol in df_symbols.index:
+                if self.symbol_cache is None:
+                    price.replace('', np.nan, inplace=True)
+                    price = price.dropna(axis='index')
+                if symbol not in rejected:
                     if price.shape[0] < minimal_rows or price["5. volume"][-1] < minimal_volume:
-                        df_symbols = df_symbols.drop(symbol, axis=0)
+                        rejected.add(symbol)
                         continue
 
                 price_for_test = price
@@ -337,7 +747,7 @@ class AttributeTable():
 
                     if backtest_date not in price.index:
                         backtest_date_invalid += 1
-                        df_symbols = df_symbols.drop(symbol, axis=0)
+                        rejected.add(symbol)
                         continue
                     else:
                         backtest_date_invalid = 0
@@ -345,7 +755,7 @@ class AttributeTable():
                     # Given valid backtest date, do trade
                     if backtest_date in price.index:
                         # assign back test dates
-                        df_symbols.loc[symbol, 'Date Added'] = backtest_date
+                        assigned['Date Added'][symbol] = backtest_date
                         loci = price.index.get_loc(backtest_date) + 1
                         price_for_test = price[0:loci]
 
@@ -356,69 +766,72 @@ class AttributeTable():
                             length = price.shape[0]
                             if loci_check > length-1:
                                 loci_check = -1
-                            price_plot = price[0:loci_check]
-                            dict_sts_plot[symbol] = TimeSeriesPlus(price_plot).sma_multiple()
+                            dict_price_plot[symbol] = price[0:loci_check]
 
 #                             r, key_prices, date = TimeSeriesPlus.get_fate(
 #                                 'xxx', price, backtest_date, extension, 'next', 5, self.backtest_strategy)
 
-                            r, key_prices, date = TimeSeriesPlus(price).get_fate(
-                                backtest_date, extension, 'next', 5, self.backtest_strategy)
+                            if self.symbol_cache is not None:
+                                r, key_prices, date = self.symbol_cache.get_fate(
+                                    self.data_dir, symbol, price, backtest_date, extension, self.backtest_strategy)
+                            else:
+                                r, key_prices, date = TimeSeriesPlus(price).get_fate(
+                                    backtest_date, extension, 'next', 5, self.backtest_strategy)
                                 
 #                             print(r, key_prices, date) #xxx
                  
                             if r == 'missing':
-                                df_symbols = df_symbols.drop(symbol)
+                                rejected.add(symbol)
                             else:
-                                df_symbols.loc[symbol, 'PL'] = r
-                                df_symbols.loc[symbol, 'exit Price'] = key_prices
-                                df_symbols.loc[symbol, 'Date Sold'] = date
-
-                if self.kwargs["time_scale"]:
-                    arg = self.kwargs["time_scale"]
-                    scale = ""
-                    mode = ""
-                    if ',' in arg:
-                        scale, mode = arg.split(",")
-                    else:
-                        scale = arg
-
-                    if mode == "c": # =chartOnly
-                        if scale == "week":
-                            price_scaled = TimeSeriesPlus(price_for_test).get_weekly()
-                            dict_sts_plot[symbol] = TimeSeriesPlus(price_scaled)
-                        if scale == "month":
-                            price_scaled = TimeSeriesPlus(price_for_test).get_monthly()
-                            dict_sts_plot[symbol] = TimeSeriesPlus(price_scaled)
-                    else:
-                        if scale == "week":
-                            price_for_test = TimeSeriesPlus(price_for_test).get_weekly()
-                        if scale == "month":
-                            price_for_test = TimeSeriesPlus(price_for_test).get_monthly()
-
-                dict_sts[symbol] = TimeSeriesPlus(price_for_test)
-
-        # # read SPY as benchmark
-        # ref = self.data_dir + "/" + 'SPY' + ".txt"
-        # if os.path.exists(ref):
-        #     try:
-        #         price = pd.read_csv(ref, sep="\t", parse_dates=['date'], index_col=['date'])
-        #     except ValueError:
-        #         price = pd.read_csv(ref, sep="\t", parse_dates=['Date'], index_col=['Date'])
-        #         price = self.df_rename_columns(price)
-        #     except:
-        #         e = sys.exc_info()[0]
-        #         print("x-> Error while reading historical data for {}\t error: {}".format(ref, e))
-        #
-        #     dict_sts['SPY'] = TimeSeriesPlus(price)
+                                assigned['PL'][symbol] = r
+                                assigned['exit Price'][symbol] = key_prices
+                                assigned['Date Sold'][symbol] = date
 
+                dict_price[symbol] = price_for_test
+
+        df_symbols = df_symbols[~df_symbols.index.isin(rejected)].copy()
+        for column, values in assigned.items():
+            for symbol, value in values.items():
+                if symbol not in rejected:
+                    df_symbols.at[symbol, column] = value
         self.attribute_table_bythread.append(df_symbols)
-        self.sts_daily_test_bythread.append(dict_sts)
-        self.sts_daily_plot_bythread.append(dict_sts_plot)
+        self.price_daily_bythread.append(dict_price)
+        self.price_plot_bythread.append(dict_price_plot)
+
+    def build_timeseries(self):
+        """Create time series objects (with moving averages etc.) from loaded price data
+
+            Weekly or monthly transformation (keyword argument 'time_scale') is done
+            for all securities at once on the cached universe.
+        """
+        price_test = self.price_daily
+        price_plot = self.price_plot
+        scale, mode = self.get_time_scale()
+        if scale:
+            price_scaled = self.get_universe(scale).to_frames()
+            if mode == "c":  # =chartOnly
+                price_plot = price_scaled
+            else:
+                price_test = price_scaled
+
+        if self.symbol_cache is not None:
+            key = tuple(str(self.kwargs.get(name)) for name in loading_arguments) + (scale, mode)
+            cache = self.symbol_cache
+            self.sts_daily_test = {symbol: cache.get_timeseries(key + ('test',), symbol, df)
+                                   for symbol, df in price_test.items()}
+            self.sts_daily_plot = {symbol: cache.get_timeseries(key + ('plot',), symbol, df)
+                                   for symbol, df in price_plot.items()}
+            return
+        self.sts_daily_test = {symbol: TimeSeriesPlus(df) for symbol, df in price_test.items()}
+        self.sts_daily_plot = {symbol: TimeSeriesPlus(df) for symbol, df in price_plot.items()}
 
     def work(self):
         """Filter and sort securities based on keyword arguments
         """
+        self.split_timeframes()
+        self.universe_table = self._attribute_table.copy()
+        if self.kwargs["benchmark"]:
+            self.add_benchmark_columns()
 
         # sort securities by attributes
         if self.kwargs["sort_brokerrecomm"] and "# Rating Strong Buy or Buy" in self._attribute_table:
@@ -468,507 +881,567 @@ class AttributeTable():
             del self.kwargs["sort_zacks"]
 
         if len(self.kwargs) > 0:
+            stages = self.screen_stages()
+            cache_dir = self.kwargs.get("cache")
+            if cache_dir:
+                # values of per-security stages are reused for securities with unchanged price data
+                versions = result_cache.data_versions(self.data_dir, self._attribute_table.index)
+                cached_stages = [stage for stage in stages if stage.value is not None and stage.apply is None]
+                for stage in cached_stages:
+                    result_cache.restore_stage(cache_dir, stage, self.stage_context(stage), versions)
+
+            self._attribute_table = filter_plan.run(self._attribute_table, stages,
+                                                    verbose=self.kwargs.get("explain", False),
+                                                    processes=self.kwargs.get("processes", 1),
+                                                    top=self.kwargs.get("top", 0))
+            if cache_dir:
+                for stage in cached_stages:
+                    result_cache.store_stage(cache_dir, stage, self.stage_context(stage), versions)
+
+    def stage_context(self, stage):
+        """Get settings other than its argument that values of a screening stage depend on
+
+        Returns:
+            list: time scale of the stage and arguments changing loaded price data
+        """
+        return [self.timeframe(stage.name), self.get_test_scale()] + \
+            [str(self.kwargs.get(name)) for name in loading_arguments]
 
-            if self.kwargs["filter_price"]:
-                arg = self.kwargs["filter_price"]
-                args = arg.split(',')
-                pmin = 0
-                pmax = 10000
-                if len(args) == 2:
-                    (pmin, pmax) = list(map(float, args))
-                else:
-                    print(f"last closing price argument cannot be recognized: {arg}")
-                    exit(1)
-                self._attribute_table["Sort"] = 0
-                for symbol in self._attribute_table.index:
-                    self._attribute_table.loc[symbol, "Sort"] = self.sts_daily_test[symbol].df['4. close'][-1]
-                self._attribute_table = self._attribute_table.loc[self._attribute_table["Sort"] > pmin]
-                self._attribute_table = self._attribute_table.loc[self._attribute_table["Sort"] < pmax]
-                print("# {:>5} symbols meet price criteria".format(len(self._attribute_table)))
-
-            # method sort_trange
-            if self.kwargs["sort_trange"]:
-                """
-                Sort a list of securities based on their filter_upward trading range for a defined recent 
-                period
-                
-                Outcome: update instance variable 'description'
-                """
-                argument = self.kwargs["sort_trange"]
-                days, cutoff = argument.split(',')
-                trange_days = int(days)
-                trange_cutoff = float(cutoff)
-                self._attribute_table["Sort"] = 0
-                if trange_days > 0:
-                    for symbol, row in self._attribute_table.iterrows():
-                        self._attribute_table.loc[symbol, "Sort"] = self.sts_daily_test[symbol].get_trading_uprange(
-                            trange_days)
-                if trange_cutoff >= 0:
-                    self._attribute_table = self._attribute_table.loc[self._attribute_table["Sort"] >= trange_cutoff]
-                self._attribute_table = self._attribute_table.sort_values(["Sort"], ascending=False)
-                print("# {:>5} symbols meet sort_trange".format(len(self._attribute_table)))
-
-            # method filter_macd_sgl
-            if self.kwargs["filter_macd_sgl"]:
-                # Filter securities based on MACD cross above signal line
-                # Outcome: shorten instance variable 'description'
-                # example: input variable "14,20"
-                #     K line with 14-day EMA and D line with 20-day EMA
-
-                filter_macd_sgl = self.kwargs["filter_macd_sgl"]
-                args = filter_macd_sgl.split(',')
-                if len(args) == 2:
-                    (sspan, lspan) = list(map(int, args))
-                    days = 1
-                elif len(args) == 3:
-                    (sspan, lspan, days) = list(map(int, args))
-                else:
-                    print(f"macd argument cannot be recognized: {filter_macd_sgl}")
-                    exit(1)
-
-                self._attribute_table["Sort"] = 0
-                for symbol in self._attribute_table.index:
-                    self._attribute_table.loc[symbol, "Sort"] = self.sts_daily_test[symbol].macd_cross_up(sspan, lspan, days)
-                self._attribute_table = self._attribute_table.loc[self._attribute_table["Sort"] > 0]
-                print("# {:>5} symbols meet macd criteria".format(len(self._attribute_table)))
-
-            if self.kwargs["filter_ema_sgl"]:
-                # Filter securities based on MACD cross above signal line
-                # Outcome: shorten instance variable 'description'
-                # example: input variable "14,20"
-                #     K line with 14-day EMA and D line with 20-day EMA
-
-                arg = self.kwargs["filter_ema_sgl"]
-                args = arg.split(',')
-                if len(args) == 2:
-                    (fast, slow) = list(map(int, args))
-                    days = 1
-                elif len(args) == 3:
-                    (fast, slow, days) = list(map(int, args))
-                else:
-                    print(f"macd argument cannot be recognized: {arg}")
-                    exit(1)
-
-                self._attribute_table["Sort"] = 0
-                for symbol in self._attribute_table.index:
-                    self._attribute_table.loc[symbol, "Sort"] = self.sts_daily_test[symbol].ema_cross_up(fast, slow, days)
-                self._attribute_table = self._attribute_table.loc[self._attribute_table["Sort"] > 0]
-                print("# {:>5} symbols meet ema crossing up criteria".format(len(self._attribute_table)))
-
-            if self.kwargs["filter_rsi"]:
-                # filter for rsi within define range, e.g., 20,50
-                args = self.kwargs["filter_rsi"].split(',')
-                try:
-                    (low, high) = list(map(int, args))
-                except ValueError:
-                    print("Invalid rsi argument: " + args)
-
-                self._attribute_table["Sort"] = 0
-                for symbol in self._attribute_table.index:
-                    self._attribute_table.loc[symbol, "Sort"] = self.sts_daily_test[symbol].get_rsi()
-                self._attribute_table = self._attribute_table.loc[low < self._attribute_table["Sort"]]
-                self._attribute_table = self._attribute_table.loc[self._attribute_table["Sort"] < high]
-                self._attribute_table = self._attribute_table.sort_values(["Sort"])
-                print("# {:>5} symbols meet rsi criteria".format(len(self._attribute_table)))
-
-            if self.kwargs["filter_surging_volume"]:
-                # filter for combination of volume increase with price going down
-                args = self.kwargs["filter_surging_volume"].split(',')
-                if len(args) <2:
-                    print ("Invalid filter_surging_volume argument: {}".format(args))
-                    exit(0)
-                length = int(args[0])
-                ratio = float(args[1])
-                hold_up = ''
-                if len(args)>2:
-                    hold_up = args[2]
-                for symbol in self._attribute_table.index:
-                    self._attribute_table.loc[symbol, "Sort"], details = \
-                        self.sts_daily_test[symbol].get_volume_index(length, hold=hold_up)
-                self._attribute_table = self._attribute_table.loc[self._attribute_table["Sort"] > ratio]
-                self._attribute_table = self._attribute_table.sort_values(["Sort"], ascending=False)
-                print("# {:>5} symbols meet filter_surging_volume".format(len(self._attribute_table)))
-
-            if self.kwargs["filter_exploding_volume"]:
-                args = self.kwargs["filter_exploding_volume"]
-                (length, cutoff) = args.split(',')
-                length = int (length)
-                cutoff = float(cutoff)
-                for symbol in self._attribute_table.index:
-                    sort_value = 0
-                    if self.sts_daily_test[symbol].two_dragon(5, 15, 5, 0.9, vol=True) > 0:
-                        sort_value = self.sts_daily_test[symbol].get_relative_volume(length)
-                    self._attribute_table.loc[symbol, "Sort"] = sort_value
-
-                    # self._attribute_table.loc[symbol, "Sort"] = self.sts_daily_test[symbol].get_relative_volume(length)
-                self._attribute_table = self._attribute_table.loc[self._attribute_table["Sort"] > cutoff]
-                self._attribute_table = self._attribute_table.sort_values(["Sort"], ascending=False)
-                print("# {:>5} symbols meet exploding_surging_volume".format(len(self._attribute_table)))
-
-            if self.kwargs['filter_consolidation_p']:
-                args = self.kwargs['filter_consolidation_p']
-                (length, cutoff) = args.split(',')
-                length = int (length)
-                cutoff = float(cutoff)
-                for symbol in self._attribute_table.index:
-                    sort_value = 0
-                    if self.sts_daily_test[symbol].get_zigzag_score(length) > 0:
-                        sort_value = self.sts_daily_test[symbol].get_zigzag_score(length)
-                    self._attribute_table.loc[symbol, "Sort"] = sort_value
-                self._attribute_table = self._attribute_table.loc[self._attribute_table["Sort"] > cutoff]
-                self._attribute_table = self._attribute_table.sort_values(["Sort"], ascending=False)
-                print("# {:>5} symbols meet filter_consolidation_p criteria".format(len(self._attribute_table)))
-                print(self._attribute_table['Sort']) #xxx
-
-            # method filter based on stochastic signal
-            if self.kwargs["filter_stochastic_sgl"]:
-                # filter for oversold (d < cutoff) tickers with stochastic K > D and
-                # bullish price action (paction < cutoff)
-                # input string: stochastic long term,
-                #               stochastic short term,
-                #               stochastic d cutoff,
-                #               k>d ('all') or k just cross d up ('crs' or any string)
-
-                arg = self.kwargs["filter_stochastic_sgl"]
-                try:
-                    (n, m, cutoff, mode) = arg.split(',')
-                    n = int(n)
-                    m = int(m)
-                    cutoff = float(cutoff)
-                except:
-                    e = sys.exc_info()[0]
-                    print("x-> invalid stochastic argument input ", e)
-                    sys.exit(1)
-
-                for symbol in self._attribute_table.index:
-                    (k, d, cross, bullish) = self.sts_daily_test[symbol].stochastic_cross(n, m)
-                    status = True
-                    if k > cutoff + 15 or d > cutoff:
-                        status = False
-                    if mode == 'all':
-                        if k < d: status = False
-                    elif cross <= 0:
-                        status = False
-                    if not status:
-                        self._attribute_table.drop(symbol, inplace=True)
-                print("# {:>5} symbols meet stochastic criteria {}".format(len(self._attribute_table)), )
-
-            if self.kwargs["filter_parallel_ema"]:
-                # Query EMA sandwiched between short and long EMAs for recent period
-                #
-                # Args:
-                #   query (int): length in days to define query EMA.
-                #   short (int): length in days to define short EMA.
-                #   long (int): length in days to define long EMA.
-                #   days (int): period to assess if middle EMA is sandwich between short/long EMAs.
-                #       if not provided, assess only the last for EMA formation
-                #   ratio (int): minimal percentage of days meeting the EMA formation
-
-                args = self.kwargs["filter_parallel_ema"]
-                array = args.split(',')
-                array2 = []
-                try:
-                    array2 = list(map(int, array[0:3]))
-                except ValueError:
-                    print(f" argument {args} is invalid")
-                    exit(1)
-                if len(array) == 4:
-                    array2.append(float(array[3]))
-
-                self._attribute_table["Sort"] = 0
-                for symbol in self._attribute_table.index:
-                    self._attribute_table.loc[symbol, "Sort"] = self.sts_daily_test[symbol].two_dragon(*array2)
-                self._attribute_table = self._attribute_table.loc[self._attribute_table["Sort"] > 0]
-
-                print("# {:>5} symbols meet filter_parallel_ema criteria {}".format(len(self._attribute_table), args))
-
-            if self.kwargs["filter_ema_3layers"]:
-                args = self.kwargs["filter_ema_3layers"]
-                array = args.split(',')
-                days = 0
-                cutoff = 0.85
-                if len(array) == 3:
-                    try:
-                        (query, short, long) = list(map(int, array))
-                    except ValueError:
-                        raise
-                elif len(array) == 5:
-                    try:
-                        (query, short, long, days) = list(map(int, array[:4]))
-                        cutoff = float(array[-1])
-                    except ValueError:
-                        raise
-                else:
-                    print("Invalid argument {args}")
-
-                self._attribute_table["Sort"] = False
-                for symbol in self._attribute_table.index:
-                    self._attribute_table.loc[symbol, "Sort"] = self.sts_daily_test[symbol].ema_3layers(query, short, long,
-                                                                                                   days, cutoff)
-                self._attribute_table = self._attribute_table.loc[self._attribute_table["Sort"]]
-                print("# {:>5} symbols meet filter_hit_ema_support {}".format(len(self._attribute_table), args))
-
-            if self.kwargs["filter_hit_ema_support"]:
-                args = self.kwargs["filter_hit_ema_support"]
-                array = args.split(',')
-                try:
-                    (ema, days) = list(map(int, array))
-                except ValueError:
-                    raise
-
-                self._attribute_table["Sort"] = False
-                for symbol in self._attribute_table.index:
-                    self._attribute_table.loc[symbol, "Sort"] = self.sts_daily_test[symbol].hit_ema_support(ema, days)
-                self._attribute_table = self._attribute_table.loc[self._attribute_table["Sort"]]
-                print("# {:>5} symbols meet filter_hit_ema_support {}".format(len(self._attribute_table), args))
-
-            # method filter and sort by last close to bollinger band bottom border distance
-            if self.kwargs["filter_bbdistance"]:
-                filter_bbdistance = self.kwargs["filter_bbdistance"]
-                list_arg = filter_bbdistance.split(',')
-                cutoff = float(list_arg[0])
-                days = 1
-                test_bband_uptrend = False
-                if len(list_arg) >= 2:
-                    days = int(list_arg[1])
-                if len(list_arg) == 3 and list_arg[2] == 'up':
-                    test_bband_uptrend = True
-
-                self._attribute_table["Sort"] = 0
-                for symbol, row in self._attribute_table.iterrows():
-                    self._attribute_table.loc[symbol, "Sort"] = self.sts_daily_test[symbol].get_BBdistance(days)
-                    df = self.sts_daily_test[symbol].df
-                    if df.shape[0] < 100:
-                        self._attribute_table.loc[symbol, "Sort"] = 1
-                        continue
+    def screen_stages(self):
+        """Get screening stages of filter and sort arguments in option order
 
-                    if test_bband_uptrend:
-                        BB20d_uptrend = True
-                        if df['BB20d'][-1] <= df['BB20d_SMA10'][-1]:
-                            BB20d_uptrend = False
-                        elif df['BB20d'][-3] <= df['BB20d_SMA10'][-3]:
-                            BB20d_uptrend = False
-                        elif df['BB20d'][-5] <= df['BB20d_SMA10'][-5]:
-                            BB20d_uptrend = False
-                        if not BB20d_uptrend:
-                            self._attribute_table.loc[symbol, "Sort"] = 1
-
-                self._attribute_table = self._attribute_table.loc[self._attribute_table["Sort"] <= cutoff]
-                self._attribute_table = self._attribute_table.sort_values(["Sort"], ascending=True)
-                print("# {:>5} symbols meet bollinger band distance criteria {}".
-                      format(len(self._attribute_table), filter_bbdistance))
-
-
-            if self.kwargs["sort_rsi_std"]:
-                arg = self.kwargs["sort_rsi_std"]
-                period = 20
-                cutoff = 10
-                if ',' in arg:
-                    alist = arg.split(',')
-                    period = int(alist[0])
-                    cutoff = float(alist[1])
-                else:
-                    period = int(arg)
-
-                self._attribute_table["Sort"] = 0
-                for symbol in self._attribute_table.index:
-                    self._attribute_table.loc[symbol, "Sort"] = self.sts_daily_test[symbol].get_consolidation(period)
-                self._attribute_table = self._attribute_table.loc[self._attribute_table["Sort"] <= cutoff]
-                self._attribute_table = self._attribute_table.sort_values(["Sort"], ascending=True)
-                print("# {:>5} symbols meet sort_rsi_std requirement: {}".format(len(self._attribute_table), arg))
-
-            if self.kwargs["sort_ema_attraction"]:
-                arg = self.kwargs["sort_ema_attraction"]
-                ema_len = 50
-                period = 10
-                if ',' in arg:
-                    alist = arg.split(',')
-                    ema_len = int(alist[0])
-                    period = int(alist[1])
-                else:
-                    print(f"Invalid sort_ema_attraction argument {arg}")
-                    exit(1)
-
-                self._attribute_table["Sort"] = 0
-                for symbol in self._attribute_table.index:
-                    self._attribute_table.loc[symbol, "Sort"] = self.sts_daily_test[symbol].ema_attraction(ema_len, period)
-                # self._attribute_table = self._attribute_table.loc[self._attribute_table["Sort"] <= cutoff]
-                self._attribute_table = self._attribute_table.sort_values(["Sort"], ascending=True)
-                print(self._attribute_table["Sort"])
-                print("# {:>5} symbols meet sort_ema_attraction requirement: {}".format(len(self._attribute_table), arg))
-                
-            if self.kwargs["sort_ema_entanglement"]:
-                arg = self.kwargs["sort_ema_entanglement"]
-                try:
-                    args = arg.split(",")
-                    ema_fast = int(args[0])
-                    ema_slow = int(args[1])
-                    span = int(args[2])
-                    cutoff = int(args[3])
-                except:                 
-                    print(f"Invalid sort_ema_entanglement argument {arg}")
-                    exit(1)
-
-                self._attribute_table["Sort"] = 0
-                for symbol in self._attribute_table.index:
-                    self._attribute_table.loc[symbol, "Sort"] = self.sts_daily_test[symbol].ema_entanglement(ema_fast, ema_slow, span)
-                self._attribute_table = self._attribute_table.loc[self._attribute_table["Sort"] >= cutoff]
-                self._attribute_table = self._attribute_table.sort_values(["Sort"], ascending=False)
-                print("# {:>5} symbols meet sort_ema_entanglement requirement: {}".format(len(self._attribute_table), arg))
-                    
-            if self.kwargs["filter_upward"]:
-                filter_upward = self.kwargs["filter_upward"]
-                args = filter_upward.split(',')
-
-                self._attribute_table["Sort"] = 0
-                for symbol in self._attribute_table.index:
-                    self._attribute_table.loc[symbol, "Sort"] = self.sts_daily_test[symbol].in_uptrend(*args)
-                self._attribute_table = self._attribute_table.loc[self._attribute_table["Sort"] > 0]
-                print("# {:>5} symbols meet filter_upward criteria {}".
-                      format(len(self._attribute_table), filter_upward))
-
-            if self.kwargs["filter_horizon_slice"]:
-                try:
-                    args = self.kwargs["filter_horizon_slice"].split(',')
-                    days, num = list(map(int, args))
-                except ValueError:
-                    print(f" argument {args} is invalid")
-                    exit(1)
-
-                self._attribute_table["Sort"] = False
-                for symbol in self._attribute_table.index:
-                    pivot_caught = self.sts_daily_test[symbol].horizon_slice(days)
-                    if pivot_caught >= num:
-                        # print (symbol, pivot_caught, num)
-                        self._attribute_table.loc[symbol, "Sort"] = True
-                self._attribute_table = self._attribute_table.loc[self._attribute_table["Sort"]]
-                print("# {:>5} symbols meet support slice criteria: {}".format(len(self._attribute_table), args))
-
-            if self.kwargs["filter_ema_slice"]:
-                # TBD: add look-back non-converge period
-                filter_ema_slice = int(self.kwargs["filter_ema_slice"])
-
-                self._attribute_table["Sort"] = False
-                for symbol in self._attribute_table.index:
-                    self._attribute_table.loc[symbol, "Sort"] = self.sts_daily_test[symbol].ema_slice(filter_ema_slice)
-
-                self._attribute_table = self._attribute_table.loc[self._attribute_table["Sort"]]
-                print("# {:>5} symbols meet EMA slice criteria: {}"
-                      .format(len(self._attribute_table), filter_ema_slice))
-
-            if self.kwargs["filter_hit_horizontal_support"]:
-                try:
-                    args = self.kwargs["filter_hit_horizontal_support"]
-                    days, length, num = list(map(int, args.split(',')))
-                except ValueError:
-                    print(f" argument {args} is invalid")
-                    exit(1)
-
-                self._attribute_table["Sort"] = False
-                for symbol in self._attribute_table.index:
-                    self._attribute_table.loc[symbol, "Sort"] \
-                        = self.sts_daily_test[symbol].hit_horizontal_support(days, length, num)
-                self._attribute_table = self._attribute_table.loc[self._attribute_table["Sort"]]
-                print("# {:>5} symbols meet support slice criteria: {}".format(len(self._attribute_table), args))
-
-            if self.kwargs["filter_hit_horizontal_resistance"]:
-                try:
-                    args = self.kwargs["filter_hit_horizontal_resistance"]
-                    days, length, num = list(map(int, args.split(',')))
-                except ValueError:
-                    print(f" argument {args} is invalid")
-                    exit(1)
-
-                self._attribute_table["Sort"] = False
-                for symbol in self._attribute_table.index:
-                    self._attribute_table.loc[symbol, "Sort"] \
-                        = self.sts_daily_test[symbol].hit_horizontal_support(days, length, num, touch_down=False)
-                self._attribute_table = self._attribute_table.loc[self._attribute_table["Sort"]]
-                print("# {:>5} symbols meet support slice criteria: {}".format(len(self._attribute_table), args))
-
-
-            if self.kwargs["sort_ema_distance"] > 0:
-                # sort symbols by last close-to-SMA distance
-
-                sort_ema_distance = self.kwargs["sort_ema_distance"]
-
-                self._attribute_table["Sort"] = 0
-                for symbol in self._attribute_table.index:
-                    self._attribute_table.loc[symbol, "Sort"] = self.sts_daily_test[symbol].get_SMAdistance(
-                        sort_ema_distance)
-                self._attribute_table = self._attribute_table.sort_values(["Sort"], ascending=True)
-
-            if self.kwargs["sort_change_to_ref"]:
-                # Sort securities by price change in a defined date or
-                #   period relative to a reference date
-                #
-                # example: input varialbe "2020-20-01,4"
-                #   set 2020-20-01 as reference date, calculate the average price of the
-                #   following 4 day, and report the change that led to this average price and from
-                #   the reference date
-                #
-                # Outcome: update instance variable 'description'
-
-                arg = self.kwargs["sort_change_to_ref"]
-                aa = arg.split(',')
-                # reference_date = aa[0]
-                # days = aa[1]
-                if len(aa) != 2:
-                    raise ValueError("Argument \'{}\' does not contains exactly one comma".format(arg))
-                else:
-                    reference, subject = arg.split(',')
-
-                self._attribute_table["Sort"] = 0
-                for symbol, row in self._attribute_table.iterrows():
-                    self._attribute_table.loc[symbol, "Sort"] = \
-                        self.sts_daily_test[symbol].get_referenced_change(reference, subject)
-
-                self._attribute_table = self._attribute_table.sort_values(["Sort"], ascending=True)
-                self._attribute_table["Date Added"] = reference
-                if subject.count('-') == 2:
-                    self._attribute_table["Date Sold"] = subject
-
-            if self.kwargs["sort_performance"]:
-                arg = self.kwargs["sort_performance"]
-                days = 0
-                ref = ''
-                ref_performance = 0
-                cut = -1
-                if ',' in arg:
-                    args = arg.split(",")
-                    days = int(args[0])
-                    cut = float(args[1])
-                    if len(args) == 3:
-                        ref = args[2]
-                else:
-                    try:
-                        days = int(arg)
-                    except:
-                        print("Invalid sort_performance argument: {}".format(arg))
-                        exit(0)
+        Returns:
+            list: Stage objects (see module filter_plan)
+        """
+        return [getattr(self, "stage_" + name)(self.kwargs[name])
+                for name in screen_options if self.kwargs.get(name)]
+
+    def stage_filter_breadth(self, arg):
+        # Market regime: keep the list only if a breadth metric of all loaded securities
+        #   at the last date is within range (eg, above50,60 for >= 60% above 50-day EMA)
+        args = arg.split(',')
+        if len(args) < 2 or args[0] not in breadth.metrics:
+            print("Invalid filter_breadth argument: {} (metrics: {})".format(arg, ', '.join(breadth.metrics)))
+            exit(1)
+        metric = args[0]
+        low = float(args[1])
+        high = float(args[2]) if len(args) > 2 else float('inf')
+
+        universe = self.get_universe(self.timeframe("filter_breadth"))
+        return filter_plan.Stage("filter_breadth", arg, column=None,
+                                 batch=lambda: breadth.market_breadth(universe)[metric].iloc[-1],
+                                 keep=lambda value: low <= value <= high)
+
+    def stage_filter_price(self, arg):
+        universe = self.get_universe(self.timeframe("filter_price"))
+        args = arg.split(',')
+        if len(args) == 2:
+            (pmin, pmax) = list(map(float, args))
+        else:
+            print(f"last closing price argument cannot be recognized: {arg}")
+            exit(1)
+        return filter_plan.Stage("filter_price", arg, batch=lambda: snapshot.column(universe, 'close'),
+                                 keep=lambda value: pmin < value < pmax)
 
-                if ref:
-                    try:
-                        ref_performance = self.sts_daily_test[ref].get_latest_performance(days)
-                        print("spy", ref_performance)
-                    except:
-                        print("Error in getting performance data for {}".format(ref))
-                        exit(0)
+    def stage_sort_trange(self, arg):
+        """
+        Sort a list of securities based on their filter_upward trading range for a defined recent
+        period
+        """
+        sts = self.get_timeseries(self.timeframe("sort_trange"))
+        days, cutoff = arg.split(',')
+        trange_days = int(days)
+        trange_cutoff = float(cutoff)
+        value = filter_plan.call(sts, "get_trading_uprange", trange_days)
+        if trange_days <= 0:
+            value = lambda symbol: 0
+        keep = None
+        if trange_cutoff >= 0:
+            keep = lambda value: value >= trange_cutoff
+        return filter_plan.Stage("sort_trange", arg, value=value, keep=keep, ascending=False)
+
+    def stage_filter_macd_sgl(self, arg):
+        # Filter securities based on MACD cross above signal line
+        # example: input variable "14,20"
+        #     K line with 14-day EMA and D line with 20-day EMA
+        args = arg.split(',')
+        if len(args) == 2:
+            (sspan, lspan) = list(map(int, args))
+            days = 1
+        elif len(args) == 3:
+            (sspan, lspan, days) = list(map(int, args))
+        else:
+            print(f"macd argument cannot be recognized: {arg}")
+            exit(1)
+
+        universe = self.get_universe(self.timeframe("filter_macd_sgl"))
+        return filter_plan.Stage(
+            "filter_macd_sgl", arg, keep=lambda value: value > 0,
+            batch=lambda: filter_plan.latest_signal(universe, signal_matrix.macd_cross_up, sspan, lspan, days))
+
+    def stage_filter_ema_sgl(self, arg):
+        # Filter securities based on fast EMA cross above slow EMA
+        # example: input variable "14,20"
+        #     14-day EMA crossing above 20-day EMA
+        args = arg.split(',')
+        if len(args) == 2:
+            (fast, slow) = list(map(int, args))
+            days = 1
+        elif len(args) == 3:
+            (fast, slow, days) = list(map(int, args))
+        else:
+            print(f"macd argument cannot be recognized: {arg}")
+            exit(1)
+
+        universe = self.get_universe(self.timeframe("filter_ema_sgl"))
+        return filter_plan.Stage(
+            "filter_ema_sgl", arg, keep=lambda value: value > 0,
+            batch=lambda: filter_plan.latest_signal(universe, signal_matrix.ema_cross_up, fast, slow, days))
+
+    def stage_filter_rsi(self, arg):
+        universe = self.get_universe(self.timeframe("filter_rsi"))
+        # filter for rsi within define range, e.g., 20,50
+        try:
+            (low, high) = list(map(int, arg.split(',')))
+        except ValueError:
+            print("Invalid rsi argument: " + arg)
+            exit(1)
+        return filter_plan.Stage("filter_rsi", arg, batch=lambda: snapshot.column(universe, 'rsi14'),
+                                 keep=lambda value: low < value < high, ascending=True)
+
+    def stage_filter_surging_volume(self, arg):
+        sts = self.get_timeseries(self.timeframe("filter_surging_volume"))
+        # filter for combination of volume increase with price going down
+        args = arg.split(',')
+        if len(args) < 2:
+            print("Invalid filter_surging_volume argument: {}".format(args))
+            exit(0)
+        length = int(args[0])
+        ratio = float(args[1])
+        hold_up = ''
+        if len(args) > 2:
+            hold_up = args[2]
+        return filter_plan.Stage("filter_surging_volume", arg,
+                                 value=lambda symbol: sts[symbol].get_volume_index(length, hold=hold_up)[0],
+                                 keep=lambda value: value > ratio, ascending=False)
+
+    def stage_filter_exploding_volume(self, arg):
+        sts = self.get_timeseries(self.timeframe("filter_exploding_volume"))
+        universe = self.get_universe(self.timeframe("filter_exploding_volume"))
+        (length, cutoff) = arg.split(',')
+        length = int(length)
+        cutoff = float(cutoff)
+
+        def relative_volume(symbol):
+            if sts[symbol].two_dragon(5, 15, 5, 0.9, vol=True) > 0:
+                return snapshot.column(universe, f"relative_volume{length}")[symbol]
+            return 0
+
+        return filter_plan.Stage("filter_exploding_volume", arg, value=relative_volume,
+                                 keep=lambda value: value > cutoff, ascending=False)
+
+    def stage_filter_consolidation_p(self, arg):
+        (length, cutoff) = arg.split(',')
+        length = int(length)
+        cutoff = float(cutoff)
+        universe = self.get_universe(self.timeframe("filter_consolidation_p"))
+
+        def score():
+            values = window_stats.zigzag_score(universe, length)
+            return values.where(values > 0, 0)
+
+        return filter_plan.Stage("filter_consolidation_p", arg, batch=score,
+                                 keep=lambda value: value > cutoff, ascending=False)
+
+    def stage_filter_stochastic_sgl(self, arg):
+        # filter for oversold (d < cutoff) tickers with stochastic K > D and
+        # bullish price action (paction < cutoff)
+        # input string: stochastic long term,
+        #               stochastic short term,
+        #               stochastic d cutoff,
+        #               k>d ('all') or k just cross d up ('crs' or any string)
+        try:
+            (n, m, cutoff, mode) = arg.split(',')
+            n = int(n)
+            m = int(m)
+            cutoff = float(cutoff)
+        except:
+            e = sys.exc_info()[0]
+            print("x-> invalid stochastic argument input ", e)
+            sys.exit(1)
+
+        universe = self.get_universe(self.timeframe("filter_stochastic_sgl"))
+        return filter_plan.Stage(
+            "filter_stochastic_sgl", arg, column=None, keep=lambda value: value > 0,
+            batch=lambda: filter_plan.latest_signal(universe, signal_matrix.stochastic_cross, n, m, cutoff, mode))
+
+    def stage_filter_candle_pattern(self, arg):
+        # filter for candlestick pattern(s) occurring in recent period, eg, hammer,3 or engulfing+gap_up
+        args = arg.split(',')
+        days = 1
+        try:
+            if len(args) == 2:
+                days = int(args[1])
+            names = args[0].split('+')
+            for name in names:
+                if name not in candle_pattern.patterns:
+                    raise ValueError(f"Unknown candlestick pattern '{name}' "
+                                     f"(options: {', '.join(candle_pattern.patterns)})")
+        except ValueError as e:
+            print(f"x-> invalid candlestick pattern argument {arg}: {e}")
+            exit(1)
+
+        universe = self.get_universe(self.timeframe("filter_candle_pattern"))
+        return filter_plan.Stage(
+            "filter_candle_pattern", arg, column=None, keep=lambda value: value > 0,
+            batch=lambda: filter_plan.latest_signal(universe, candle_pattern.recent_patterns, names, days))
+
+    def stage_filter_expression(self, arg):
+        # filter by a screen expression evaluated at the last bar of all securities at once,
+        #   eg, "rsi14 < 30 and close > ema200 and vol10 > 2 * vol30"
+        try:
+            screen_expression.parse(arg)
+        except ValueError as e:
+            print(f"x-> {e}")
+            exit(1)
+
+        universe = self.get_universe(self.timeframe("filter_expression"))
+        return filter_plan.Stage("filter_expression", arg, column=None, keep=bool,
+                                 batch=lambda: screen_expression.evaluate(universe, arg))
 
-                self._attribute_table["Sort"] = 0
-                for symbol in self._attribute_table.index:
-                    self._attribute_table.loc[symbol, "Sort"] = \
-                        self.sts_daily_test[symbol].get_latest_performance(days, ref_performance)
+    def stage_filter_parallel_ema(self, arg):
+        sts = self.get_timeseries(self.timeframe("filter_parallel_ema"))
+        # Query EMA sandwiched between short and long EMAs for recent period
+        #
+        # Args:
+        #   query (int): length in days to define query EMA.
+        #   short (int): length in days to define short EMA.
+        #   long (int): length in days to define long EMA.
+        #   days (int): period to assess if middle EMA is sandwich between short/long EMAs.
+        #       if not provided, assess only the last for EMA formation
+        #   ratio (int): minimal percentage of days meeting the EMA formation
+        array = arg.split(',')
+        array2 = []
+        try:
+            array2 = list(map(int, array[0:3]))
+        except ValueError:
+            print(f" argument {arg} is invalid")
+            exit(1)
+        if len(array) == 4:
+            array2.append(float(array[3]))
+        return filter_plan.Stage("filter_parallel_ema", arg, value=filter_plan.call(sts, "two_dragon", *array2),
+                                 keep=lambda value: value > 0)
+
+    def stage_filter_ema_3layers(self, arg):
+        sts = self.get_timeseries(self.timeframe("filter_ema_3layers"))
+        array = arg.split(',')
+        days = 0
+        cutoff = 0.85
+        if len(array) == 3:
+            (query, short, long) = list(map(int, array))
+        elif len(array) == 5:
+            (query, short, long, days) = list(map(int, array[:4]))
+            cutoff = float(array[-1])
+        else:
+            print(f"Invalid argument {arg}")
+            exit(1)
+        return filter_plan.Stage("filter_ema_3layers", arg,
+                                 value=filter_plan.call(sts, "ema_3layers", query, short, long, days, cutoff),
+                                 keep=bool)
+
+    def stage_filter_hit_ema_support(self, arg):
+        sts = self.get_timeseries(self.timeframe("filter_hit_ema_support"))
+        (ema, days) = list(map(int, arg.split(',')))
+        return filter_plan.Stage("filter_hit_ema_support", arg,
+                                 value=filter_plan.call(sts, "hit_ema_support", ema, days), keep=bool)
+
+    def stage_filter_bbdistance(self, arg):
+        # filter and sort by last close to bollinger band bottom border distance
+        universe = self.get_universe(self.timeframe("filter_bbdistance"))
+        list_arg = arg.split(',')
+        cutoff = float(list_arg[0])
+        days = 1
+        test_bband_uptrend = False
+        if len(list_arg) >= 2:
+            days = int(list_arg[1])
+        if len(list_arg) == 3 and list_arg[2] == 'up':
+            test_bband_uptrend = True
+
+        def distance():
+            # 1 (filtered out) for short history or lower border not rising
+            ratio = snapshot.column(universe, f"bb_distance{days}")
+            qualified = snapshot.column(universe, 'bars') >= 100
+            if test_bband_uptrend:
+                qualified &= snapshot.bb_uptrend(universe)
+            return ratio.where(qualified, 1)
+
+        return filter_plan.Stage("filter_bbdistance", arg, batch=distance,
+                                 keep=lambda value: value <= cutoff, ascending=True)
+
+    def stage_sort_rsi_std(self, arg):
+        period = 20
+        cutoff = 10
+        if ',' in arg:
+            alist = arg.split(',')
+            period = int(alist[0])
+            cutoff = float(alist[1])
+        else:
+            period = int(arg)
 
-                self._attribute_table = self._attribute_table.sort_values(["Sort"], ascending=False)
-                if -1 < cut < 10:
-                    self._attribute_table = self._attribute_table.loc[self._attribute_table["Sort"] >= cut]
-                # get symbols with top sort scores ???
-                elif cut > 100:
-                    cut = int (cut/100)
-                    self._attribute_table = self._attribute_table.head(cut)
+        universe = self.get_universe(self.timeframe("sort_rsi_std"))
+        return filter_plan.Stage("sort_rsi_std", arg, batch=lambda: window_stats.consolidation(universe, period),
+                                 keep=lambda value: value <= cutoff, ascending=True)
+
+    def stage_sort_ema_attraction(self, arg):
+        if ',' in arg:
+            alist = arg.split(',')
+            ema_len = int(alist[0])
+            period = int(alist[1])
+        else:
+            print(f"Invalid sort_ema_attraction argument {arg}")
+            exit(1)
+
+        universe = self.get_universe(self.timeframe("sort_ema_attraction"))
+        return filter_plan.Stage("sort_ema_attraction", arg, ascending=True,
+                                 batch=lambda: window_stats.ema_attraction(universe, ema_len, period))
+
+    def stage_sort_ema_entanglement(self, arg):
+        try:
+            args = arg.split(",")
+            ema_fast = int(args[0])
+            ema_slow = int(args[1])
+            span = int(args[2])
+            cutoff = int(args[3])
+        except:
+            print(f"Invalid sort_ema_entanglement argument {arg}")
+            exit(1)
 
-                print("# {:>5} symbols meet sort_performance criteria {}".
-                      format(len(self._attribute_table), arg))
+        universe = self.get_universe(self.timeframe("sort_ema_entanglement"))
+        return filter_plan.Stage(
+            "sort_ema_entanglement", arg, keep=lambda value: value >= cutoff, ascending=False,
+            batch=lambda: window_stats.ema_entanglement(universe, ema_fast, ema_slow, span))
+
+    def stage_filter_upward(self, arg):
+        sts = self.get_timeseries(self.timeframe("filter_upward"))
+        return filter_plan.Stage("filter_upward", arg, value=filter_plan.call(sts, "in_uptrend", *arg.split(',')),
+                                 keep=lambda value: value > 0)
+
+    def stage_filter_horizon_slice(self, arg):
+        sts = self.get_timeseries(self.timeframe("filter_horizon_slice"))
+        try:
+            days, num = list(map(int, arg.split(',')))
+        except ValueError:
+            print(f" argument {arg} is invalid")
+            exit(1)
+        return filter_plan.Stage("filter_horizon_slice", arg,
+                                 value=lambda symbol: sts[symbol].horizon_slice(days) >= num, keep=bool)
+
+    def stage_filter_volume_profile(self, arg):
+        # Keep securities closing within a distance above the heaviest volume-by-price bin
+        #   below (support, default) or beneath the heaviest bin above (resistance)
+        args = arg.split(',')
+        try:
+            days = int(args[0])
+            distance = float(args[1])
+            side = args[2] if len(args) > 2 else 's'
+        except (ValueError, IndexError):
+            print(f" argument {arg} is invalid")
+            exit(1)
 
-                # print( self._attribute_table["Sort"] )
+        universe = self.get_universe(self.timeframe("filter_volume_profile"))
+        return filter_plan.Stage("filter_volume_profile", arg,
+                                 batch=lambda: volume_profile.node_distance(universe, days, side=side),
+                                 keep=lambda value: 0 <= value <= distance, ascending=True)
+
+    def stage_filter_ema_slice(self, arg):
+        sts = self.get_timeseries(self.timeframe("filter_ema_slice"))
+        # TBD: add look-back non-converge period
+        return filter_plan.Stage("filter_ema_slice", arg, value=filter_plan.call(sts, "ema_slice", int(arg)),
+                                 keep=bool)
+
+    def stage_filter_hit_horizontal_support(self, arg):
+        sts = self.get_timeseries(self.timeframe("filter_hit_horizontal_support"))
+        try:
+            days, length, num = list(map(int, arg.split(',')))
+        except ValueError:
+            print(f" argument {arg} is invalid")
+            exit(1)
+        return filter_plan.Stage("filter_hit_horizontal_support", arg, keep=bool,
+                                 value=filter_plan.call(sts, "hit_horizontal_support", days, length, num))
+
+    def stage_filter_hit_horizontal_resistance(self, arg):
+        sts = self.get_timeseries(self.timeframe("filter_hit_horizontal_resistance"))
+        try:
+            days, length, num = list(map(int, arg.split(',')))
+        except ValueError:
+            print(f" argument {arg} is invalid")
+            exit(1)
+        return filter_plan.Stage("filter_hit_horizontal_resistance", arg, keep=bool,
+                                 value=filter_plan.call(sts, "hit_horizontal_support", days, length, num,
+                                                        touch_down=False))
+
+    def stage_sort_ema_distance(self, arg):
+        # sort symbols by last close-to-SMA distance
+        universe = self.get_universe(self.timeframe("sort_ema_distance"))
+        return filter_plan.Stage("sort_ema_distance", arg, ascending=True,
+                                 batch=lambda: snapshot.column(universe, f"sma_distance{arg}"))
+
+    def stage_sort_change_to_ref(self, arg):
+        # Sort securities by price change in a defined date or
+        #   period relative to a reference date
+        #
+        # example: input varialbe "2020-20-01,4"
+        #   set 2020-20-01 as reference date, calculate the average price of the
+        #   following 4 day, and report the change that led to this average price and from
+        #   the reference date
+        sts = self.get_timeseries(self.timeframe("sort_change_to_ref"))
+        if arg.count(',') != 1:
+            raise ValueError("Argument \'{}\' does not contains exactly one comma".format(arg))
+        reference, subject = arg.split(',')
+
+        def apply(table):
+            table["Sort"] = [sts[symbol].get_referenced_change(reference, subject) for symbol in table.index]
+            table = table.sort_values(["Sort"], ascending=True)
+            table["Date Added"] = reference
+            if subject.count('-') == 2:
+                table["Date Sold"] = subject
+            return table
+
+        return filter_plan.Stage("sort_change_to_ref", arg, apply=apply)
+
+    def stage_sort_performance(self, arg):
+        sts = self.get_timeseries(self.timeframe("sort_performance"))
+        days = 0
+        ref = ''
+        cut = -1
+        if ',' in arg:
+            args = arg.split(",")
+            days = int(args[0])
+            try:
+                cut = float(args[1])
+            except ValueError:
+                # no cutoff (eg, 20,SPY)
+                args.insert(1, -1)
+            if len(args) == 3:
+                ref = args[2]
+        else:
+            try:
+                days = int(arg)
+            except:
+                print("Invalid sort_performance argument: {}".format(arg))
+                exit(0)
+
+        def apply(table):
+            if ref:
+                # benchmark change is measured between the same bars as each security
+                try:
+                    relative = self.get_relative_return(ref, days - 1, self.timeframe("sort_performance"))
+                except ValueError as e:
+                    print("Error in getting performance data for {}: {}".format(ref, e))
+                    exit(0)
+                table["Sort"] = relative[table.index]
+            else:
+                table["Sort"] = [sts[symbol].get_latest_performance(days) for symbol in table.index]
+
+            table = table.sort_values(["Sort"], ascending=False)
+            if -1 < cut < 10:
+                table = table.loc[table["Sort"] >= cut]
+            # get symbols with top sort scores
+            elif cut > 100:
+                table = table.head(int(cut / 100))
+
+            print("# {:>5} symbols meet sort_performance criteria {}".format(len(table), arg))
+            return table
+
+        return filter_plan.Stage("sort_performance", arg, apply=apply)
+
+    def stage_sort_relative_strength(self, arg):
+        # Rank weighted 3/6/9/12-month return against all loaded securities (percentile),
+        #   then keep securities ranked at or above cutoff (0 keeps all, securities too short
+        #   to be ranked last)
+        try:
+            cutoff = float(arg)
+        except ValueError:
+            print("Invalid sort_relative_strength argument: {}".format(arg))
+            exit(0)
+
+        universe = self.get_universe(self.timeframe("sort_relative_strength"))
+        return filter_plan.Stage("sort_relative_strength", arg,
+                                 batch=lambda: cross_section.relative_strength(universe),
+                                 keep=lambda value: cutoff <= 0 or value >= cutoff, ascending=False)
+
+    def stage_sort_group_momentum(self, arg):
+        # Rank industry (or sector) groups by mean price change of all loaded members in
+        #   recent period, then sort securities by the rank (percentile) of their group
+        args = arg.split(',')
+        if len(args) < 2 or args[0] not in self.universe_table:
+            raise ValueError("Argument \'{}\' should be column,days[,cutoff] (eg, Industry,60,80)".format(arg))
+        column = args[0]
+        days = int(args[1])
+        cutoff = float(args[2]) if len(args) > 2 else 0
+
+        def apply(table):
+            universe = self.get_universe(self.timeframe("sort_group_momentum"))
+            labels = self.universe_table[column]
+            rank = group_momentum.security_group_metric(universe, labels, days, 'rank', column)
+            group_breadth = group_momentum.security_group_metric(universe, labels, days, 'breadth', column)
+            table["Sort"] = rank[table.index]
+            table["Group Breadth"] = group_breadth[table.index]
+            table = table.loc[table["Sort"] >= cutoff]
+            table = table.sort_values(["Sort"], ascending=False, kind='mergesort')
+            print("# {:>5} symbols meet sort_group_momentum criteria {}".format(len(table), arg))
+            return table
+
+        return filter_plan.Stage("sort_group_momentum", arg, apply=apply)
+
+    def stage_sort_risk(self, arg):
+        # Sort by a risk metric in recent period (low risk first), and keep securities at or
+        #   below cutoff (eg, volatility,60,0.4 or beta,120,1.5,SPY)
+        args = arg.split(',')
+        if len(args) < 2 or args[0] not in risk.metrics:
+            print("Invalid sort_risk argument: {} (metrics: {})".format(arg, ', '.join(risk.metrics)))
+            exit(1)
+        metric = args[0]
+        days = int(args[1])
+        cutoff = float('inf')
+        ref = 'SPY'
+        for a in args[2:]:
+            try:
+                cutoff = float(a)
+            except ValueError:
+                ref = a
+
+        universe = self.get_universe(self.timeframe("sort_risk"))
+
+        def values():
+            if metric == 'beta':
+                return risk.beta(universe, days, ref, self.get_benchmark(ref, universe.scale))
+            return risk.metrics[metric](universe, days)
+
+        return filter_plan.Stage("sort_risk", arg, batch=values,
+                                 keep=lambda value: value <= cutoff, ascending=True)
+
+    def stage_sort_correlation(self, arg):
+        # Group securities into clusters of correlated daily returns, keeping the current
+        #   order within and across clusters (by first member); optionally keep only the
+        #   first security of each cluster
+        args = arg.split(',')
+        if len(args) < 2:
+            raise ValueError("Argument \'{}\' should be days,threshold[,1]".format(arg))
+        days = int(args[0])
+        threshold = float(args[1])
+        dedupe = len(args) > 2 and args[2] == '1'
+
+        def apply(table):
+            universe = self.get_universe(self.timeframe("sort_correlation"))
+            symbols = list(table.index)
+            corr = correlation.correlation_matrix(universe, days, symbols)
+            table["Cluster"] = correlation.correlation_clusters(corr, threshold)
+            first_seen = pd.Series(range(len(symbols)), index=symbols).groupby(table["Cluster"]).transform('min')
+            table = table.iloc[np.lexsort((np.arange(len(symbols)), first_seen.to_numpy()))]
+            if dedupe:
+                table = table.drop_duplicates("Cluster")
+            print("# {:>5} symbols meet sort_correlation criteria {}".format(len(table), arg))
+            return table
+
+        return filter_plan.Stage("sort_correlation", arg, apply=apply)
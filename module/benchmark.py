@@ -0,0 +1,66 @@
+"""
+Benchmark (eg, SPY, QQQ, sector ETF) price data aligned to a Universe
+
+A benchmark is joined once onto the universe date index; its returns are then
+measured between the same bars as each security, so relative returns are
+plain array differences for all securities and dates.
+"""
+
+import numpy as np
+import pandas as pd
+import module.cross_section as cross_section
+
+
+def aligned_close(universe, name, price):
+    """Closing price of a benchmark on the universe dates (last known price on missing days)
+
+    Args:
+        universe (Universe object): aligned price data
+        name (str): benchmark symbol (cache key)
+        price (dataframe): benchmark price data with '4. close' column and date index
+
+    Returns:
+        pandas series: closing price indexed by universe dates
+    """
+    def compute():
+        close = price['4. close'].sort_index()
+        close = close[~close.index.duplicated(keep='last')]
+        return close.reindex(close.index.union(universe.dates)).ffill().reindex(universe.dates)
+    return universe.memo(('benchmark', name), compute)
+
+
+def benchmark_return(universe, name, price, bars):
+    """Benchmark price change between the bars of each security
+
+    Args:
+        universe (Universe object): aligned price data
+        name (str): benchmark symbol
+        price (dataframe): benchmark price data
+        bars (int): number of bars (of each security) to look back
+
+    Returns:
+        dataframe: dates x symbols
+    """
+    def compute():
+        close = aligned_close(universe, name, price).to_numpy()
+        close = np.repeat(close[:, None], len(universe.symbols), axis=1)
+        with np.errstate(all='ignore'):
+            change = close / universe.shift_bars(close, bars) - 1
+        return pd.DataFrame(change, index=universe.dates, columns=universe.symbols)
+    return universe.memo(('benchmark_return', name, bars), compute)
+
+
+def relative_return(universe, name, price, bars):
+    """Price change of every security minus the benchmark change over the same bars
+
+    Args:
+        universe (Universe object): aligned price data
+        name (str): benchmark symbol
+        price (dataframe): benchmark price data
+        bars (int): number of bars to look back
+
+    Returns:
+        dataframe: dates x symbols
+    """
+    return universe.memo(('relative_return', name, bars),
+                         lambda: cross_section.bar_return(universe, bars) - benchmark_return(universe, name, price, bars))
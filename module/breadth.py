@@ -0,0 +1,58 @@
+"""
+Market breadth of a Universe computed for every date in one pass over history
+
+Breadth describes the market (all loaded securities) rather than one security:
+the share of securities above moving averages, advancing versus declining
+securities and securities making new 52-week highs or lows.
+"""
+
+import numpy as np
+import pandas as pd
+
+metrics = ['above20', 'above50', 'above200', 'advances', 'declines', 'net_advance', 'ad_line',
+           'new_highs', 'new_lows', 'net_new_highs']
+
+
+def market_breadth(universe, year=252, min_bars=20):
+    """Breadth statistics at every date
+
+    Args:
+        universe (Universe object): aligned price data
+        year (int): number of bars to define 52-week high/low
+        min_bars (int): minimal number of bars of a security to count its new highs/lows
+
+    Returns:
+        dataframe: dates x metrics
+            above20/above50/above200: percentage of securities closing above 20/50/200-day EMA
+            advances/declines: number of securities closing up/down from their previous bar
+            net_advance: (advances - declines) / securities with a bar
+            ad_line: cumulative sum of advances - declines
+            new_highs/new_lows: number of securities at 52-week high/low
+            net_new_highs: new_highs - new_lows
+    """
+    def compute():
+        valid = universe.valid().to_numpy()
+        counts = valid.sum(axis=1)
+        close = universe.panel['4. close']
+        with np.errstate(all='ignore'):
+            stats = {}
+            for days in (20, 50, 200):
+                above = close > universe.ema(days).to_numpy()
+                stats['above' + str(days)] = above.sum(axis=1) / counts * 100
+
+            change = close - universe.shift_bars(close, 1)
+            stats['advances'] = (change > 0).sum(axis=1)
+            stats['declines'] = (change < 0).sum(axis=1)
+            stats['net_advance'] = (stats['advances'] - stats['declines']) / counts
+            stats['ad_line'] = np.cumsum(stats['advances'] - stats['declines'])
+
+            seasoned = np.cumsum(valid, axis=0) >= min_bars
+            high = universe.field('2. high')
+            low = universe.field('3. low')
+            at_high = high.to_numpy() >= high.rolling(year, min_periods=1).max().to_numpy()
+            at_low = low.to_numpy() <= low.rolling(year, min_periods=1).min().to_numpy()
+            stats['new_highs'] = (at_high & seasoned).sum(axis=1)
+            stats['new_lows'] = (at_low & seasoned).sum(axis=1)
+            stats['net_new_highs'] = stats['new_highs'] - stats['new_lows']
+        return pd.DataFrame(stats, index=universe.dates, columns=metrics)
+    return universe.memo(('breadth', year, min_bars), compute)
@@ -0,0 +1,169 @@
+"""
+Candlestick patterns evaluated for every date and every security of a Universe
+
+Each pattern function takes a Universe object and returns a boolean dataframe
+(dates x symbols) computed with array expressions on the aligned OHLC data.
+The previous bar and recent periods count only bars of each security
+(Universe.shift_bars, Universe.to_bars), as on the price data of one security.
+"""
+
+import numpy as np
+import pandas as pd
+
+
+def _ohlc(universe):
+    """Get open, high, low and close arrays (dates x symbols) of a universe
+    """
+    panel = universe.panel
+    return panel['1. open'], panel['2. high'], panel['3. low'], panel['4. close']
+
+
+def _previous(universe, values):
+    """Get values (dates x symbols) at the previous bar of each security
+    """
+    return universe.shift_bars(np.asarray(values), 1)
+
+
+def _frame(universe, array):
+    """Wrap a boolean array into a dataframe with universe dates and symbols
+    """
+    return pd.DataFrame(array, index=universe.dates, columns=universe.symbols)
+
+
+def _shadows(universe):
+    """Get body size, upper shadow, lower shadow and trading range of every bar
+    """
+    o, h, l, c = _ohlc(universe)
+    body = np.abs(c - o)
+    upper = h - np.fmax(o, c)
+    lower = np.fmin(o, c) - l
+    return body, upper, lower, h - l
+
+
+def bullish_engulfing(universe):
+    """Green bar whose body covers the body of the previous red bar
+    """
+    o, h, l, c = _ohlc(universe)
+    o1, c1 = _previous(universe, o), _previous(universe, c)
+    return _frame(universe, (c1 < o1) & (c > o) & (o <= c1) & (c >= o1))
+
+
+def bearish_engulfing(universe):
+    """Red bar whose body covers the body of the previous green bar
+    """
+    o, h, l, c = _ohlc(universe)
+    o1, c1 = _previous(universe, o), _previous(universe, c)
+    return _frame(universe, (c1 > o1) & (c < o) & (o >= c1) & (c <= o1))
+
+
+def hammer(universe):
+    """Small body at the top of the range with a lower shadow at least twice the body
+    """
+    body, upper, lower, span = _shadows(universe)
+    return _frame(universe, (span > 0) & (lower >= 2 * body) & (upper <= np.fmax(body, 0.1 * span)))
+
+
+def shooting_star(universe):
+    """Small body at the bottom of the range with an upper shadow at least twice the body
+    """
+    body, upper, lower, span = _shadows(universe)
+    return _frame(universe, (span > 0) & (upper >= 2 * body) & (lower <= np.fmax(body, 0.1 * span)))
+
+
+def doji(universe):
+    """Open and close almost equal (body no more than 10% of trading range)
+    """
+    body, upper, lower, span = _shadows(universe)
+    return _frame(universe, (span > 0) & (body <= 0.1 * span))
+
+
+def inside_bar(universe):
+    """Trading range within the range of the previous bar
+    """
+    o, h, l, c = _ohlc(universe)
+    return _frame(universe, (h < _previous(universe, h)) & (l > _previous(universe, l)))
+
+
+def outside_bar(universe):
+    """Trading range covering the range of the previous bar
+    """
+    o, h, l, c = _ohlc(universe)
+    return _frame(universe, (h > _previous(universe, h)) & (l < _previous(universe, l)))
+
+
+def gap_up(universe):
+    """Low above the high of the previous bar
+    """
+    o, h, l, c = _ohlc(universe)
+    return _frame(universe, l > _previous(universe, h))
+
+
+def gap_down(universe):
+    """High below the low of the previous bar
+    """
+    o, h, l, c = _ohlc(universe)
+    return _frame(universe, h < _previous(universe, l))
+
+
+patterns = {
+    'engulfing': bullish_engulfing,
+    'bear_engulfing': bearish_engulfing,
+    'hammer': hammer,
+    'shooting_star': shooting_star,
+    'doji': doji,
+    'inside_bar': inside_bar,
+    'outside_bar': outside_bar,
+    'gap_up': gap_up,
+    'gap_down': gap_down,
+}
+
+
+def get_pattern(universe, name):
+    """Get the matrix of a named pattern (cached on the universe)
+
+    Args:
+        universe (Universe object): aligned price data
+        name (str): pattern name (key of 'patterns')
+
+    Returns:
+        dataframe: boolean, dates x symbols
+    """
+    if name not in patterns:
+        raise ValueError(f"Unknown candlestick pattern '{name}' (options: {', '.join(patterns)})")
+    return universe.memo(('pattern', name), lambda: patterns[name](universe))
+
+
+def recent_pattern(universe, name, days=1):
+    """Test if a pattern occurred within recent period ending at every bar
+
+    Args:
+        universe (Universe object): aligned price data
+        name (str): pattern name
+        days (int): number of recent bars
+
+    Returns:
+        dataframe: boolean, dates x symbols
+    """
+    matrix = get_pattern(universe, name)
+    if days <= 1:
+        return matrix
+    bars = pd.DataFrame(universe.to_bars(matrix.to_numpy(dtype=float)))
+    recent = universe.from_bars(bars.rolling(days, min_periods=1).max().to_numpy())
+    return _frame(universe, recent > 0)
+
+
+def recent_patterns(universe, names, days=1):
+    """Test if all of several patterns occurred within recent period ending at every bar
+
+    Args:
+        universe (Universe object): aligned price data
+        names (list): pattern names
+        days (int): number of recent bars
+
+    Returns:
+        dataframe: boolean, dates x symbols
+    """
+    status = recent_pattern(universe, names[0], days)
+    for name in names[1:]:
+        status = status & recent_pattern(universe, name, days)
+    return status
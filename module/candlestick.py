@@ -7,6 +7,7 @@ import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
 from module.time_series_plus import TimeSeriesPlus
+import module.volume_profile as volume_profile
 
 moving_average_parameters = [2, 10, 20, 50, 100, 200]
 
@@ -29,6 +30,8 @@ class Security:
         self.sortvalue = ""
         self.exit_price = ""
         self.profit_loss = ""
+        self.scaled_price = {}
+        self.profile_bins = 0
 
     def set_date_added(self, date):
         self.date_added = date
@@ -54,6 +57,9 @@ class Security:
     def set_profit_loss(self, profit_loss):
         self.profit_loss = profit_loss
 
+    def set_scaled_price(self, scale, df):
+        self.scaled_price[scale] = df
+
     def get_price(self):
         return self.df.copy(deep=True)
 
@@ -78,6 +84,18 @@ class Security:
     def get_exit_price(self):
         return self.exit_price
 
+    def set_profile_bins(self, bins):
+        """Set number of price bins to plot volume-by-price profile (0 for no profile)
+        """
+        self.profile_bins = bins
+
+    def get_scaled_price(self, scale):
+        """Get pre-computed weekly ('w') or monthly ('m') price data if available
+        """
+        if scale in self.scaled_price:
+            return self.scaled_price[scale].copy(deep=True)
+        return None
+
 
 def candlestick_gradient_width(df, ratio=10):
     """Set width gradient and update coordination for candlesticks
@@ -205,7 +223,7 @@ def date_to_xy(date, df):
 
 def draw_a_candlestick(ax, df, sticker="", fold_change_cutoff=3,
                        date_added="", date_sold="", exit_price='',
-                       industry="", annotation="", sort="", pl=0):
+                       industry="", annotation="", sort="", pl=0, profile_bins=0):
     """Draw a plot for a security
 
     Args:
@@ -220,6 +238,7 @@ def draw_a_candlestick(ax, df, sticker="", fold_change_cutoff=3,
         annotation (str): addition info about the security (to be added beneath figure head)
         sort (float): the parameter used to sort multiple security (this value is added beneath annotation)
         pl (float): profit or loss
+        profile_bins (int): number of price bins of volume-by-price profile to plot (0 for no profile)
 
     Returns
         redraw (int): If meet draw requirement, return 1. Otherwise, return 0.
@@ -258,6 +277,14 @@ def draw_a_candlestick(ax, df, sticker="", fold_change_cutoff=3,
 
         plt.axhspan(lw_lim, up_lim, color="gray", alpha=0.3)
 
+    # Plot volume-by-price profile from the left edge (the heaviest bin spans 1/4 of the width)
+    if profile_bins > 0 and "5. volume" in df.columns:
+        volumes, edges = volume_profile.frame_profile(df, profile_bins)
+        if volumes.max() > 0:
+            lengths = volumes / volumes.max() * (fig_xmax - fig_xmin) * 0.25
+            plt.barh(edges[:-1], lengths, height=np.diff(edges), left=fig_xmin, align='edge',
+                     color='#1f77b4', alpha=0.15)
+
     # Plot year by year vertical lines
     # if sample_size > 480:
     #     plt.axvspan(df.index[-480],df.index[-241],color="grey", alpha=0.1)
@@ -418,18 +445,18 @@ def draw_a_candlestick(ax, df, sticker="", fold_change_cutoff=3,
                 plt.bar(data["xcord"], price_range, data["width"]/5, bottom=price_low, color=data["color"])
                 
 
-            # # plot market benchmark data S&P500
-            # if sample_size < 200 and "weather" in df.columns:
-            #     mchange = data["weather"]
-            #     mycolor = "yellow"
-            #     if mchange > 0:
-            #         mycolor = "green"
-            #         height = (fig_ymax - fig_ymin) * mchange * 50  # 50X change percentage, 2% hit ceiling
-            #         plt.bar(data["xcord"], height, data["width"], bottom=fig_ymin, color=mycolor, alpha=0.2)
-            #     elif mchange < 0:
-            #         mycolor = "red"
-            #         height = (fig_ymax - fig_ymin) * (0 - mchange) * 50  # 50X change percentage, -2% touch ground
-            #         plt.bar(data["xcord"], height, data["width"], bottom=fig_ymax - height, color=mycolor, alpha=0.2)
+            # plot market benchmark data (eg, S&P500)
+            if sample_size < 200 and "weather" in df.columns:
+                mchange = data["weather"]
+                mycolor = "yellow"
+                if mchange > 0:
+                    mycolor = "green"
+                    height = (fig_ymax - fig_ymin) * mchange * 50  # 50X change percentage, 2% hit ceiling
+                    plt.bar(data["xcord"], height, data["width"], bottom=fig_ymin, color=mycolor, alpha=0.2)
+                elif mchange < 0:
+                    mycolor = "red"
+                    height = (fig_ymax - fig_ymin) * (0 - mchange) * 50  # 50X change percentage, -2% touch ground
+                    plt.bar(data["xcord"], height, data["width"], bottom=fig_ymax - height, color=mycolor, alpha=0.2)
                 # plt.bar(data["xcord"], (fig_ymax-fig_ymin)*0.05, data["width"], bottom=fig_ymin+(fig_ymax-fig_ymin)*0.95, color=mycolor )
                 # plt.bar(data["xcord"], (fig_ymax-fig_ymin), data["width"], bottom=fig_ymin, color=mycolor, alpha=0.2 )
 
@@ -624,7 +651,8 @@ def draw_many_candlesticks(securities,
                                     mysecurity.get_industry(),
                                     mysecurity.get_annotation(),
                                     mysecurity.get_sortvalue(),
-                                    mysecurity.profit_loss
+                                    mysecurity.profit_loss,
+                                    mysecurity.profile_bins
                                     )
 
         if (redraw):
@@ -641,12 +669,16 @@ def draw_many_candlesticks(securities,
                 df = candlestick_gradient_width(df.tail(dayspan2), widthgradient)
             # Weekly scale
             elif dayspan2 == "w":
-                df = df_copy.copy(deep=True)
-                df = candlestick_gradient_width(TimeSeriesPlus(df).get_weekly().tail(dayspan), widthgradient)
+                df = mysecurity.get_scaled_price("w")
+                if df is None:
+                    df = TimeSeriesPlus(df_copy).get_weekly()
+                df = candlestick_gradient_width(df.tail(dayspan), widthgradient)
             # Monthly scale
             elif dayspan2 == "m":
-                df = df_copy.copy(deep=True)
-                df = candlestick_gradient_width(TimeSeriesPlus(df).get_monthly().tail(dayspan), widthgradient)
+                df = mysecurity.get_scaled_price("m")
+                if df is None:
+                    df = TimeSeriesPlus(df_copy).get_monthly()
+                df = candlestick_gradient_width(df.tail(dayspan), widthgradient)
 
             redraw = draw_a_candlestick(ax, df, ticker, 3,
                                         mysecurity.get_date_added(),
@@ -655,7 +687,8 @@ def draw_many_candlesticks(securities,
                                         mysecurity.get_industry(),
                                         mysecurity.get_annotation(),
                                         mysecurity.get_sortvalue(),
-                                        mysecurity.profit_loss
+                                        mysecurity.profit_loss,
+                                        mysecurity.profile_bins
                                         )
 
     # !!! another way to reduce margin:
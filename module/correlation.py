@@ -0,0 +1,93 @@
+"""
+Return correlation between securities of a Universe and clustering by correlation
+"""
+
+import warnings
+import numpy as np
+import pandas as pd
+from scipy.cluster.hierarchy import linkage, fcluster
+from scipy.spatial.distance import squareform
+import module.cross_section as cross_section
+
+
+def standardized_returns(universe, days, symbols=None):
+    """Daily returns of recent period scaled to zero mean and unit length per security
+
+        Missing returns are set to zero after scaling so that they add nothing to
+        the products of a correlation matrix.
+
+    Args:
+        universe (Universe object): aligned price data
+        days (int): number of recent dates
+        symbols (list): securities to include (all if not given)
+
+    Returns:
+        z (numpy array): dates x symbols
+        mask (numpy array): 1 where a return is available, dates x symbols
+    """
+    returns = cross_section.bar_return(universe, 1)
+    if symbols is not None:
+        returns = returns[symbols]
+    values = returns.to_numpy()[-days:]
+    mask = (~np.isnan(values)).astype(float)
+    with np.errstate(all='ignore'), warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        centered = values - np.nanmean(values, axis=0)
+        norm = np.sqrt(np.nansum(centered ** 2, axis=0) / mask.sum(axis=0))
+        z = np.nan_to_num(centered / norm)
+    return z, mask
+
+
+def correlation_matrix(universe, days, symbols=None, min_overlap=0.5, block=1000):
+    """Pearson correlation of daily returns between all pairs of securities
+
+        The matrix is filled in row blocks of matrix products, so memory beyond
+        the result stays within (block x symbols). Each pair is averaged over the
+        dates both securities traded (mean and scale of each security are taken
+        over all its returns in the period); pairs sharing less than 'min_overlap'
+        of the period are set to 0.
+
+    Args:
+        universe (Universe object): aligned price data
+        days (int): number of recent dates
+        symbols (list): securities to include (all if not given)
+        min_overlap (float): minimal fraction of dates with returns of both securities
+        block (int): number of rows per block
+
+    Returns:
+        dataframe: symbols x symbols
+    """
+    if symbols is None:
+        symbols = universe.symbols
+    z, mask = standardized_returns(universe, days, symbols)
+    num = len(symbols)
+    corr = np.zeros((num, num))
+    for start in range(0, num, block):
+        stop = min(start + block, num)
+        overlap = mask[:, start:stop].T @ mask
+        with np.errstate(all='ignore'):
+            values = (z[:, start:stop].T @ z) / overlap
+        values[overlap < max(2, min_overlap * z.shape[0])] = 0
+        corr[start:stop] = values
+    np.clip(corr, -1, 1, out=corr)
+    np.fill_diagonal(corr, 1)
+    return pd.DataFrame(corr, index=symbols, columns=symbols)
+
+
+def correlation_clusters(corr, threshold):
+    """Group securities by average-linkage hierarchical clustering on correlation
+
+    Args:
+        corr (dataframe): correlation matrix, symbols x symbols
+        threshold (float): minimal average correlation within a cluster
+
+    Returns:
+        pandas series: cluster number indexed by symbol
+    """
+    if len(corr) < 2:
+        return pd.Series(1, index=corr.index)
+    distance = 1 - corr.to_numpy()
+    distance = (distance + distance.T) / 2
+    np.fill_diagonal(distance, 0)
+    tree = linkage(squareform(distance, checks=False), method='average')
+    return pd.Series(fcluster(tree, t=1 - threshold, criterion='distance'), index=corr.index)
@@ -0,0 +1,78 @@
+"""
+Cross-sectional measures ranking every security against all others in a Universe
+
+Measures are computed for all dates at once (dates x symbols) so the ranking
+at any historical date is available for backtests at no extra cost.
+"""
+
+import numpy as np
+import pandas as pd
+
+# IBD-style relative strength: 3-, 6-, 9- and 12-month returns, the latest quarter double weighted
+rs_horizons = (63, 126, 189, 252)
+rs_weights = (0.4, 0.2, 0.2, 0.2)
+
+
+def bar_return(universe, bars):
+    """Price change over a number of bars for all securities
+
+    Args:
+        universe (Universe object): aligned price data
+        bars (int): number of bars to look back
+
+    Returns:
+        dataframe: relative change of closing price, dates x symbols
+    """
+    def compute():
+        close = universe.panel['4. close']
+        with np.errstate(all='ignore'):
+            change = close / universe.shift_bars(close, bars) - 1
+        return pd.DataFrame(change, index=universe.dates, columns=universe.symbols)
+    return universe.memo(('return', bars), compute)
+
+
+def weighted_return(universe, horizons=rs_horizons, weights=rs_weights):
+    """Weighted sum of price changes over several horizons
+
+        A security with history shorter than a long horizon is scored on the
+        available horizons (weights rescaled); it needs at least the shortest one.
+
+    Args:
+        universe (Universe object): aligned price data
+        horizons (tuple): numbers of bars to look back
+        weights (tuple): weight of each horizon
+
+    Returns:
+        dataframe: dates x symbols
+    """
+    def compute():
+        total = np.zeros((len(universe.dates), len(universe.symbols)))
+        weight = np.zeros(total.shape)
+        for bars, w in zip(horizons, weights):
+            change = bar_return(universe, bars).to_numpy()
+            available = ~np.isnan(change)
+            total += np.where(available, change * w, 0)
+            weight += np.where(available, w, 0)
+        with np.errstate(all='ignore'):
+            score = np.where(weight > 0, total / weight, np.nan)
+        score[np.isnan(bar_return(universe, min(horizons)).to_numpy())] = np.nan
+        return pd.DataFrame(score, index=universe.dates, columns=universe.symbols)
+    return universe.memo(('weighted_return', tuple(horizons), tuple(weights)), compute)
+
+
+def relative_strength(universe, horizons=rs_horizons, weights=rs_weights, history=False):
+    """Percentile rank (0-100) of weighted return against all securities in the universe
+
+    Args:
+        universe (Universe object): aligned price data
+        horizons (tuple): numbers of bars to look back
+        weights (tuple): weight of each horizon
+        history (boolean): rank at every date instead of the last bar of each security
+
+    Returns:
+        pandas series (by symbol) or dataframe (dates x symbols): NaN for securities with too short history
+    """
+    score = weighted_return(universe, horizons, weights)
+    if history:
+        return score.rank(axis=1, pct=True) * 100
+    return universe.last_row(score).rank(pct=True) * 100
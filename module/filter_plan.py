@@ -0,0 +1,360 @@
+"""
+Screening plan: filter and sort steps ordered by measured cost and selectivity
+
+Every filter/sort option of AttributeTable.work becomes a Stage. Stages keeping
+securities by a test on a per-security value commute with each other, so they
+are evaluated cheapest-and-most-selective first, each security leaving the
+pipeline at its first failing test. Sorting and the 'Sort' column are then
+replayed in the option order, so the outcome does not depend on the plan.
+Stages working on the whole table (eg, top N) keep their position and split
+the options into segments planned separately. When only the first N securities
+are wanted, the last sorting takes them by partial selection (numpy.partition)
+instead of ordering every survivor.
+
+Per-security evaluation can be spread over worker processes. Workers are
+forked, so price data and time series objects of the parent are shared
+(copy-on-write) instead of being pickled; only symbols and computed values
+travel between processes.
+"""
+
+import time
+import multiprocessing
+import numpy as np
+import pandas as pd
+
+
+class Stage:
+    """A screening step
+
+    Attributes:
+        name (str): option name (eg, filter_rsi)
+        arg (str): option argument
+        value (function): symbol -> value, evaluated security by security
+        batch (function): function without argument giving values of all loaded securities at once
+            (pandas series by symbol, or one value shared by all securities)
+        keep (function): value -> boolean, None to keep every security
+        ascending (boolean): sort direction by value after filtering, None for no sorting
+        column (str): column storing the value, None to not store it
+        apply (function): table -> table, for steps depending on the whole table (never reordered)
+        values (dict): symbol -> evaluated value
+        seconds (float): time spent in evaluation
+        evaluated (int): number of evaluated securities
+        cost (float): estimated seconds per security
+        pass_rate (float): estimated share of securities passing the test
+        survivors (int): number of securities left after the stage
+    """
+
+    def __init__(self, name, arg, value=None, batch=None, keep=None, ascending=None, column="Sort", apply=None):
+        self.name = name
+        self.arg = arg
+        self.value = value
+        self.batch = batch
+        self.keep = keep
+        self.ascending = ascending
+        self.column = column
+        self.apply = apply
+        self.values = {}
+        self.seconds = 0.0
+        self.evaluated = 0
+        self.cost = 0.0
+        self.pass_rate = 1.0
+        self.survivors = 0
+
+    def evaluate(self, symbols):
+        """Compute values of securities not evaluated yet
+
+        Args:
+            symbols (list): security symbols
+        """
+        missing = [symbol for symbol in symbols if symbol not in self.values]
+        if not missing:
+            return
+        start = time.perf_counter()
+        if self.batch is not None:
+            result = self.batch()
+            if isinstance(result, pd.Series):
+                result = result.reindex(missing)
+            else:
+                result = pd.Series(result, index=missing)
+            self.values.update(result.to_dict())
+        else:
+            for symbol in missing:
+                self.values[symbol] = self.value(symbol)
+        self.seconds += time.perf_counter() - start
+        self.evaluated += len(missing)
+
+    def passes(self, symbol):
+        """Test if an evaluated security is kept
+        """
+        return self.keep is None or bool(self.keep(self.values[symbol]))
+
+    def rank(self):
+        """Ordering key: expected seconds spent per security removed (lowest first)
+        """
+        if self.pass_rate >= 1:
+            return (np.inf, self.cost)
+        return (self.cost / (1 - self.pass_rate), self.cost)
+
+
+def call(timeseries, method, *args, **kwargs):
+    """Get a function calling a TimeSeriesPlus method for a symbol
+
+    Args:
+        timeseries (dict): symbol -> TimeSeriesPlus object
+        method (str): method name (eg, get_rsi)
+
+    Returns:
+        function: symbol -> method output
+    """
+    return lambda symbol: getattr(timeseries[symbol], method)(*args, **kwargs)
+
+
+def latest_signal(universe, signal, *args):
+    """Get a signal matrix function output at the last bar of each security (1 or 0)
+
+    Args:
+        universe (Universe object): aligned price data
+        signal (function): universe and arguments -> boolean dataframe (dates x symbols)
+
+    Returns:
+        pandas series: by symbol
+    """
+    return universe.last_row(signal(universe, *args)).fillna(False).astype(int)
+
+
+def estimate(stages, symbols, sample_size=20):
+    """Measure cost and pass rate of stages on a sample of securities
+
+        Vectorized (batch) stages are evaluated for all securities in one pass,
+        their cost is spread over all of them. Values computed here are reused.
+
+    Args:
+        stages (list): Stage objects
+        symbols (list): security symbols
+        sample_size (int): number of securities evaluated by per-security stages
+    """
+    if len(symbols) > sample_size:
+        sample = [symbols[i] for i in np.unique(np.linspace(0, len(symbols) - 1, sample_size).astype(int))]
+    else:
+        sample = list(symbols)
+    for stage in stages:
+        tested = symbols if stage.batch is not None else sample
+        stage.evaluate(tested)
+        stage.cost = stage.seconds / max(1, stage.evaluated)
+        if len(tested) > 0:
+            stage.pass_rate = sum(stage.passes(symbol) for symbol in tested) / len(tested)
+
+
+# stages evaluated by forked worker processes (set by the parent before forking)
+_pipeline = []
+
+
+def screen(plan, symbols):
+    """Run securities through stages in order, each security stopping at its first failing test
+
+        Batch stages are evaluated once for all securities first, so that a
+        batch function is never called security by security.
+
+    Args:
+        plan (list): Stage objects in evaluation order
+        symbols (list): security symbols
+
+    Returns:
+        list: symbols passing all stages
+    """
+    for stage in plan:
+        if stage.batch is not None:
+            stage.evaluate(symbols)
+    survivors = []
+    for symbol in symbols:
+        for stage in plan:
+            stage.evaluate([symbol])
+            if not stage.passes(symbol):
+                break
+            stage.survivors += 1
+        else:
+            survivors.append(symbol)
+    return survivors
+
+
+def screen_chunk(symbols):
+    """Screen a chunk of securities in a worker process
+
+    Returns:
+        survivors (list): symbols passing all stages
+        outcome (list): (values, survivors, seconds, evaluated) of each stage for this chunk
+    """
+    for stage in _pipeline:
+        stage.survivors = 0
+        stage.seconds = 0.0
+        stage.evaluated = 0
+    survivors = screen(_pipeline, symbols)
+    outcome = [({symbol: stage.values[symbol] for symbol in symbols if symbol in stage.values} if stage.batch is None
+                else {}, stage.survivors, stage.seconds, stage.evaluated) for stage in _pipeline]
+    return survivors, outcome
+
+
+def screen_parallel(plan, symbols, processes):
+    """Screen securities in chunks across forked worker processes
+
+        Batch stages are evaluated once in the parent before forking. Values,
+        survivor counts and evaluation time of workers are merged into the stages.
+
+    Args:
+        plan (list): Stage objects in evaluation order
+        symbols (list): security symbols
+        processes (int): number of worker processes
+
+    Returns:
+        list: symbols passing all stages (input order)
+    """
+    global _pipeline
+    for stage in plan:
+        if stage.batch is not None:
+            stage.evaluate(symbols)
+    _pipeline = plan
+    size = max(1, -(-len(symbols) // (processes * 4)))
+    chunks = [symbols[i:i + size] for i in range(0, len(symbols), size)]
+    with multiprocessing.get_context("fork").Pool(processes) as pool:
+        results = pool.map(screen_chunk, chunks)
+    _pipeline = []
+
+    survivors = []
+    for chunk_survivors, outcome in results:
+        survivors += chunk_survivors
+        for stage, (values, count, seconds, evaluated) in zip(plan, outcome):
+            stage.values.update(values)
+            stage.survivors += count
+            stage.seconds += seconds
+            stage.evaluated += evaluated
+    return survivors
+
+
+def top_rows(table, column, ascending, count):
+    """Get the first rows of a table sorted by a column, without sorting the other rows
+
+        Same rows and order as table.sort_values(column, kind='mergesort').head(count):
+        NaN last, ties in table order.
+
+    Args:
+        table (dataframe): table to select from
+        column (str): column to sort by (numeric)
+        ascending (boolean): sort direction
+        count (int): number of rows
+
+    Returns:
+        dataframe: at most 'count' rows
+    """
+    key = table[column].to_numpy(dtype=float)
+    if not ascending:
+        key = -key
+    missing = np.isnan(key)
+    rows = np.flatnonzero(~missing)
+    if count < len(rows):
+        # rows before the count-th key, then rows tied with it in table order
+        kth = np.partition(key[rows], count - 1)[count - 1]
+        before = rows[key[rows] < kth]
+        rows = np.concatenate((before, rows[key[rows] == kth][:count - len(before)]))
+    rows = rows[np.argsort(key[rows], kind='stable')]
+    rows = np.concatenate((rows, np.flatnonzero(missing)))[:count]
+    return table.iloc[rows]
+
+
+def run_segment(table, stages, sample_size=20, processes=1, top=0):
+    """Filter a table with stages in planned order, then replay sorting in option order
+
+    Args:
+        table (dataframe): securities (index) and attributes
+        stages (list): Stage objects without 'apply', in option order
+        sample_size (int): number of securities to estimate per-security stages
+        processes (int): number of worker processes for per-security evaluation
+        top (int): number of securities to keep after the last sorting (0 for all)
+
+    Returns:
+        table (dataframe): filtered and sorted
+        plan (list): stages in evaluation order
+    """
+    symbols = list(table.index)
+    plan = list(stages)
+    if len(plan) > 1:
+        estimate(plan, symbols, sample_size)
+        plan.sort(key=Stage.rank)
+
+    for stage in plan:
+        stage.survivors = 0
+    if processes > 1 and len(symbols) > processes and any(stage.batch is None for stage in plan) \
+            and "fork" in multiprocessing.get_all_start_methods():
+        survivors = screen_parallel(plan, symbols, processes)
+    else:
+        survivors = screen(plan, symbols)
+
+    table = table.loc[survivors]
+    last_sorting = [stage for stage in stages if stage.ascending is not None][-1:]
+    for stage in stages:
+        if stage.column:
+            table[stage.column] = pd.Series([stage.values[symbol] for symbol in table.index],
+                                            index=table.index, dtype=object).infer_objects()
+        if top and stage in last_sorting and pd.api.types.is_numeric_dtype(table[stage.column]):
+            table = top_rows(table, stage.column, stage.ascending, top)
+        elif stage.ascending is not None:
+            table = table.sort_values([stage.column], ascending=stage.ascending, kind='mergesort')
+    return table, plan
+
+
+def explain(plan):
+    """Print evaluation order, estimates, survivors and time of each stage
+    """
+    print("# {:>4}  {:<45} {:>10} {:>6} {:>9} {:>9}".format(
+        "step", "stage", "ms/symbol", "pass", "survivors", "seconds"))
+    for step, stage in enumerate(plan, 1):
+        label = "{} {}".format(stage.name, stage.arg)
+        if stage.apply is not None:
+            print("# {:>4}  {:<45} {:>10} {:>6} {:>9} {:>9.3f}".format(
+                step, label, "-", "-", stage.survivors, stage.seconds))
+        else:
+            print("# {:>4}  {:<45} {:>10.3f} {:>6.2f} {:>9} {:>9.3f}".format(
+                step, label, stage.cost * 1000, stage.pass_rate, stage.survivors, stage.seconds))
+
+
+def run(table, stages, sample_size=20, verbose=False, processes=1, top=0):
+    """Run screening stages on a table
+
+    Args:
+        table (dataframe): securities (index) and attributes
+        stages (list): Stage objects in option order
+        sample_size (int): number of securities to estimate per-security stages
+        verbose (boolean): print the plan with survivors and time per stage
+        processes (int): number of worker processes for per-security evaluation
+        top (int): number of securities to keep, first in sorted order (0 for all)
+
+    Returns:
+        dataframe: filtered and sorted table
+    """
+    executed = []
+    segment = []
+    for stage in stages + [None]:
+        if stage is not None and stage.apply is None:
+            segment.append(stage)
+            continue
+        if segment:
+            # partial selection only when no later stage reorders the table
+            table, plan = run_segment(table, segment, sample_size, processes, top if stage is None else 0)
+            for done in plan:
+                print("# {:>5} symbols meet {} criteria {}".format(done.survivors, done.name, done.arg))
+            executed += plan
+            segment = []
+        if stage is not None:
+            start = time.perf_counter()
+            table = stage.apply(table)
+            stage.seconds = time.perf_counter() - start
+            stage.survivors = len(table)
+            executed.append(stage)
+
+    if top and len(table) > top:
+        table = table.head(top)
+    if top:
+        print("# {:>5} symbols kept as top {}".format(len(table), top))
+
+    if verbose:
+        explain(executed)
+    return table
@@ -0,0 +1,85 @@
+"""
+Industry/sector group momentum computed for every date across a Universe
+
+Securities are mapped to integer group codes (pandas Categorical) and group
+sums are matrix products with a one-hot membership matrix, so all groups and
+all dates are aggregated at once.
+"""
+
+import numpy as np
+import pandas as pd
+import module.cross_section as cross_section
+
+
+def group_codes(universe, labels):
+    """Map every security of a universe to an integer group code
+
+    Args:
+        universe (Universe object): aligned price data
+        labels (pandas series): group name (eg, industry) indexed by symbol
+
+    Returns:
+        codes (numpy array): group code per security (-1 for missing label)
+        groups (pandas Index): group names, position = code
+    """
+    categories = pd.Categorical(labels.reindex(universe.symbols).replace('', np.nan))
+    return categories.codes, categories.categories
+
+
+def group_metrics(universe, labels, days, key=''):
+    """Performance, breadth and rank of every group at every date
+
+    Args:
+        universe (Universe object): aligned price data
+        labels (pandas series): group name indexed by symbol
+        days (int): number of bars to measure price change
+        key (str): name of the grouping (eg, 'Industry'), to cache results
+
+    Returns:
+        dict: 'performance' (mean price change of members), 'breadth' (fraction of members with
+            price up) and 'rank' (percentile of performance across groups); dataframes, dates x groups
+    """
+    def compute():
+        codes, groups = group_codes(universe, labels)
+        membership = np.zeros((len(universe.symbols), len(groups)))
+        member = codes >= 0
+        membership[np.flatnonzero(member), codes[member]] = 1
+
+        change = cross_section.bar_return(universe, days).to_numpy()
+        available = ~np.isnan(change)
+        counts = available.astype(float) @ membership
+        with np.errstate(all='ignore'):
+            performance = (np.where(available, change, 0) @ membership) / counts
+            breadth = ((change > 0).astype(float) @ membership) / counts
+        performance = pd.DataFrame(performance, index=universe.dates, columns=groups)
+        return {
+            'performance': performance,
+            'breadth': pd.DataFrame(breadth, index=universe.dates, columns=groups),
+            'rank': performance.rank(axis=1, pct=True) * 100,
+        }
+    return universe.memo(('group', key, days), compute)
+
+
+def security_group_metric(universe, labels, days, metric='rank', key='', history=False):
+    """Group metric of every security's own group
+
+    Args:
+        universe (Universe object): aligned price data
+        labels (pandas series): group name indexed by symbol
+        days (int): number of bars to measure price change
+        metric (str): 'performance', 'breadth' or 'rank'
+        key (str): name of the grouping (eg, 'Industry'), to cache results
+        history (boolean): values at every date instead of the last bar of each security
+
+    Returns:
+        pandas series (by symbol) or dataframe (dates x symbols): NaN for securities without group
+    """
+    codes, groups = group_codes(universe, labels)
+    values = group_metrics(universe, labels, days, key)[metric].to_numpy()
+    expanded = np.full((len(universe.dates), len(universe.symbols)), np.nan)
+    member = codes >= 0
+    expanded[:, member] = values[:, codes[member]]
+    expanded = pd.DataFrame(expanded, index=universe.dates, columns=universe.symbols)
+    if history:
+        return expanded
+    return universe.last_row(expanded)
@@ -0,0 +1,158 @@
+"""
+On-disk cache of screening results
+
+The filtered and sorted table of a list is stored under a key made of the
+content of the list file and the screening arguments, together with the
+version (modification time and size) of every price data file it depends on.
+A rerun on unchanged data gets the table back without loading price data.
+
+Values of per-security screening stages (filter_plan.Stage with 'value') are
+also stored by security and data version, so that after a data update only
+securities with changed data are evaluated again.
+"""
+
+import os
+import json
+import pickle
+import hashlib
+
+# keyword arguments not changing the filtered and sorted table
+output_arguments = ["list", "days", "gradient", "row_number", "weekly_chart", "plot_volumne", "plot_volume_profile",
+                    "weather", "explain", "processes", "list_processes", "filterOnly", "cache"]
+
+
+def file_version(path):
+    """Get version of a file (modification time in ns and size), None if missing
+    """
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def data_versions(data_dir, symbols):
+    """Get version of price data file of each security
+
+    Args:
+        data_dir (str): path to the directory containing price data
+        symbols (iterable): security symbols
+
+    Returns:
+        dict: symbol -> version (None if no data file)
+    """
+    return {symbol: file_version(os.path.join(data_dir, f"{symbol}.txt")) for symbol in symbols}
+
+
+def referenced_symbols(data_dir, kwargs):
+    """Get symbols named in argument values that have a data file (eg, SPY in -spfm 20,SPY)
+    """
+    symbols = set()
+    for value in kwargs.values():
+        if isinstance(value, str):
+            for token in value.replace(':', ',').split(','):
+                if token and os.path.exists(os.path.join(data_dir, f"{token}.txt")):
+                    symbols.add(token)
+    return sorted(symbols)
+
+
+def digest(*parts):
+    """Get a hex digest of json-serializable parts
+    """
+    return hashlib.sha1(json.dumps(parts, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def screen_key(list_file, kwargs):
+    """Get cache key of a list file screened with keyword arguments
+
+    Args:
+        list_file (str): path to list file
+        kwargs (dict): keyword arguments
+
+    Returns:
+        str: key
+    """
+    with open(list_file, 'rb') as f:
+        content = hashlib.sha1(f.read()).hexdigest()
+    arguments = {key: value for key, value in kwargs.items() if key not in output_arguments}
+    return digest(content, arguments)
+
+
+def _read(path):
+    """Read a pickled cache file, None if missing or unreadable
+    """
+    try:
+        with open(path, 'rb') as f:
+            return pickle.load(f)
+    except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError):
+        return None
+
+
+def _write(path, data):
+    """Write a pickled cache file (through a temporary file, so readers never see a partial file)
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp = f"{path}.{os.getpid()}.tmp"
+    with open(temp, 'wb') as f:
+        pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(temp, path)
+
+
+def load_result(cache_dir, key, versions):
+    """Get a cached table if data versions are unchanged
+
+    Args:
+        cache_dir (str): cache directory
+        key (str): screen key
+        versions (dict): symbol -> data version
+
+    Returns:
+        dataframe: filtered and sorted table (None if not cached or data changed)
+    """
+    stored = _read(os.path.join(cache_dir, "results", f"{key}.pkl"))
+    if stored is None or stored["versions"] != versions:
+        return None
+    return stored["table"]
+
+
+def save_result(cache_dir, key, versions, table):
+    """Store a filtered and sorted table with data versions
+    """
+    _write(os.path.join(cache_dir, "results", f"{key}.pkl"), {"versions": versions, "table": table})
+
+
+def stage_path(cache_dir, stage, context):
+    """Path of stored values of a screening stage
+
+    Args:
+        cache_dir (str): cache directory
+        stage (Stage object): screening stage
+        context (list): other settings the values depend on (eg, time scale)
+    """
+    return os.path.join(cache_dir, "stages", digest(stage.name, stage.arg, context) + ".pkl")
+
+
+def restore_stage(cache_dir, stage, context, versions):
+    """Fill values of a per-security stage from cache for securities with unchanged data
+
+    Returns:
+        int: number of restored values
+    """
+    stored = _read(stage_path(cache_dir, stage, context)) or {}
+    restored = 0
+    for symbol, version in versions.items():
+        if symbol in stored and stored[symbol][0] == version:
+            stage.values[symbol] = stored[symbol][1]
+            restored += 1
+    return restored
+
+
+def store_stage(cache_dir, stage, context, versions):
+    """Store values of a per-security stage with data versions (merged with values stored before)
+    """
+    path = stage_path(cache_dir, stage, context)
+    stored = _read(path) or {}
+    for symbol, value in stage.values.items():
+        if symbol in versions:
+            stored[symbol] = (versions[symbol], value)
+    _write(path, stored)
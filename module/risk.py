@@ -0,0 +1,114 @@
+"""
+Risk metrics of recent period for all securities of a Universe
+
+Each metric takes the window ending at the last bar of every security
+(securities x days) and reduces it in one array pass.
+"""
+
+import numpy as np
+import module.window_stats as window_stats
+import module.cross_section as cross_section
+import module.benchmark as benchmark
+
+# bars per year by time scale, to annualize volatility
+periods_per_year = {'day': 252, 'week': 52, 'month': 12}
+
+
+def drawdown_stat(close):
+    """Drawdown from running peak at every bar of windows
+
+    Args:
+        close (numpy array): closing price windows, (..., days)
+
+    Returns:
+        numpy array: drawdown (0 at new peak, 0.2 for 20% below peak), same shape
+    """
+    peak = np.fmax.accumulate(close, axis=-1)
+    return 1 - close / peak
+
+
+def max_drawdown_stat(close):
+    """Maximal drawdown within windows
+    """
+    return np.nanmax(drawdown_stat(close), axis=-1)
+
+
+def ulcer_stat(close):
+    """Ulcer index: root mean square of percentage drawdown within windows
+    """
+    return np.sqrt(np.nanmean((drawdown_stat(close) * 100) ** 2, axis=-1))
+
+
+def volatility_stat(returns, periods=252):
+    """Annualized standard deviation of log returns within windows
+    """
+    return np.nanstd(np.log1p(returns), axis=-1, ddof=1) * np.sqrt(periods)
+
+
+def beta_stat(returns, benchmark_returns):
+    """Slope of security returns on benchmark returns within windows (bars where both are available)
+    """
+    both = ~np.isnan(returns) & ~np.isnan(benchmark_returns)
+    x = np.where(both, benchmark_returns, np.nan)
+    y = np.where(both, returns, np.nan)
+    x = x - np.nanmean(x, axis=-1)[..., None]
+    y = y - np.nanmean(y, axis=-1)[..., None]
+    return np.nansum(x * y, axis=-1) / np.nansum(x * x, axis=-1)
+
+
+def max_drawdown(universe, days):
+    """Maximal drawdown in recent period for all securities
+
+    Args:
+        universe (Universe object): aligned price data
+        days (int): lookback period
+
+    Returns:
+        pandas series: drawdown (eg, 0.2 for 20%) indexed by symbol
+    """
+    return window_stats.latest_statistic(universe, [universe.panel['4. close']], days, max_drawdown_stat)
+
+
+def ulcer_index(universe, days):
+    """Ulcer index in recent period for all securities
+
+    Returns:
+        pandas series: indexed by symbol
+    """
+    return window_stats.latest_statistic(universe, [universe.panel['4. close']], days, ulcer_stat)
+
+
+def volatility(universe, days):
+    """Annualized volatility of returns in recent period for all securities
+
+    Returns:
+        pandas series: indexed by symbol
+    """
+    periods = periods_per_year.get(universe.scale, 252)
+    returns = cross_section.bar_return(universe, 1).to_numpy()
+    return window_stats.latest_statistic(universe, [returns], days, lambda r: volatility_stat(r, periods))
+
+
+def beta(universe, days, name, price):
+    """Beta to a benchmark in recent period for all securities
+
+    Args:
+        universe (Universe object): aligned price data
+        days (int): lookback period
+        name (str): benchmark symbol
+        price (dataframe): benchmark price data
+
+    Returns:
+        pandas series: indexed by symbol
+    """
+    returns = cross_section.bar_return(universe, 1).to_numpy()
+    benchmark_returns = benchmark.benchmark_return(universe, name, price, 1).to_numpy()
+    return window_stats.latest_statistic(universe, [returns, benchmark_returns], days, beta_stat)
+
+
+metrics = {
+    'volatility': volatility,
+    'max_drawdown': max_drawdown,
+    'ulcer': ulcer_index,
+    'beta': beta,
+}
@@ -0,0 +1,137 @@
+"""
+Historical sampling: every (security, date) where a condition held in price history
+
+Conditions are computed for all securities and all bars at once. Rolling
+windows run on bar positions (Universe.to_bars), so they cover the same bars
+as on the price data of one security even when trading dates differ across
+securities. Outcomes of each sample (change over the following bars) are
+looked up from the same arrays, without a loop over samples.
+
+Conditions:
+    stks_bb: low at or below the lower 20-day bollinger band on 3 bars in a row
+    below_bb: close below the lower 20-day bollinger band
+    plunge_macd: MACD histogram (12,26,9) at its lowest in 60 bars, with MACD below zero
+"""
+
+import numpy as np
+import pandas as pd
+
+
+def bars_frame(universe, column):
+    """Get a price column in bar positions as dataframe (bars x symbols, cached)
+    """
+    return universe.memo(('bars', column), lambda: pd.DataFrame(universe.to_bars(universe.panel[column])))
+
+
+def lower_band(universe, length=20, width=2):
+    """Lower bollinger band in bar positions (bars x symbols), same as BB20d of TimeSeriesPlus
+    """
+    def compute():
+        close = bars_frame(universe, '4. close')
+        return (close.rolling(length).mean() - close.rolling(length).std() * width).to_numpy()
+    return universe.memo(('lower_band', length, width), compute)
+
+
+def sticks_to_lower_band(universe, days=3):
+    """Low at or below the lower bollinger band on 'days' bars in a row
+    """
+    touch = pd.DataFrame(bars_frame(universe, '3. low').to_numpy() <= lower_band(universe))
+    return (touch.rolling(days).sum() == days).to_numpy()
+
+
+def below_lower_band(universe):
+    """Close below the lower bollinger band
+    """
+    return bars_frame(universe, '4. close').to_numpy() < lower_band(universe)
+
+
+def macd_plunge(universe, sspan=12, lspan=26, signal=9, period=60):
+    """MACD histogram at its lowest in 'period' bars while MACD is below zero
+    """
+    macd = pd.DataFrame(universe.to_bars((universe.ema(sspan) - universe.ema(lspan)).to_numpy()))
+    histogram = macd - macd.ewm(span=signal, adjust=False).mean()
+    lowest = histogram.rolling(period).min()
+    return ((histogram <= lowest) & (histogram < 0) & (macd < 0)).to_numpy()
+
+
+# condition name -> function of universe giving a boolean array (bars x symbols)
+conditions = {
+    'stks_bb': sticks_to_lower_band,
+    'below_bb': below_lower_band,
+    'plunge_macd': macd_plunge,
+}
+
+
+def condition_bars(universe, name, onset=True):
+    """Evaluate a condition at every bar of every security
+
+    Args:
+        universe (Universe object): aligned price data
+        name (str): condition name (see 'conditions')
+        onset (boolean): keep only the first bar of each run of bars meeting the condition
+
+    Returns:
+        numpy array: boolean, bars x symbols
+    """
+    if name not in conditions:
+        raise ValueError(f"Unknown sampling condition '{name}' (options: {', '.join(conditions)})")
+    held = universe.memo(('sampling', name), lambda: conditions[name](universe))
+    if onset:
+        held = held & ~np.vstack((np.zeros((1, held.shape[1]), dtype=bool), held[:-1]))
+    return held
+
+
+def scan(universe, name, onset=True):
+    """Evaluate a condition at every date of every security
+
+    Returns:
+        dataframe: boolean, dates x symbols
+    """
+    held = universe.from_bars(condition_bars(universe, name, onset).astype(float))
+    return pd.DataFrame(held == 1, index=universe.dates, columns=universe.symbols)
+
+
+def samples(universe, name, horizon=20, onset=True):
+    """List every (security, date) meeting a condition, with the outcome over the following bars
+
+    Args:
+        universe (Universe object): aligned price data
+        name (str): condition name (see 'conditions')
+        horizon (int): number of bars after the sample to measure the outcome
+        onset (boolean): sample only the first bar of each run of bars meeting the condition
+
+    Returns:
+        dataframe: 'Symbol', 'Date', 'Close', 'Return' (close 'horizon' bars later), 'Max Gain' (highest high)
+            and 'Max Loss' (lowest low) within 'horizon' bars, relative to the close; ordered by date.
+            Outcomes are NaN when history after the sample is shorter than 'horizon'.
+    """
+    held = condition_bars(universe, name, onset)
+    bars, cols = np.nonzero(held)
+    close = bars_frame(universe, '4. close')
+    later = close.shift(-horizon).to_numpy()
+    highest = bars_frame(universe, '2. high').rolling(horizon).max().shift(-horizon).to_numpy()
+    lowest = bars_frame(universe, '3. low').rolling(horizon).min().shift(-horizon).to_numpy()
+    close = close.to_numpy()
+
+    entry = close[bars, cols]
+    table = pd.DataFrame({
+        'Symbol': np.asarray(universe.symbols, dtype=object)[cols],
+        'Date': universe.dates[universe.bar_order()[bars, cols]],
+        'Close': entry,
+        'Return': later[bars, cols] / entry - 1,
+        'Max Gain': highest[bars, cols] / entry - 1,
+        'Max Loss': lowest[bars, cols] / entry - 1,
+    })
+    return table.sort_values(['Date', 'Symbol'], kind='mergesort').reset_index(drop=True)
+
+
+def summarize(table, horizon):
+    """Print number of samples and average outcome
+    """
+    done = table.dropna(subset=['Return'])
+    if len(done) == 0:
+        return
+    print("# {:>5} samples with {} bars after: return {:.2%} (mean), {:.2%} (median), "
+          "{:.1%} positive; max gain {:.2%}, max loss {:.2%} (mean)".format(
+              len(done), horizon, done['Return'].mean(), done['Return'].median(), (done['Return'] > 0).mean(),
+              done['Max Gain'].mean(), done['Max Loss'].mean()))
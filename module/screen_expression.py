@@ -0,0 +1,221 @@
+"""
+Screen expressions evaluated on aligned price data of all securities at once
+
+A screen is written as a Python-like expression of indicator names, numbers,
+arithmetic (+ - * /), comparisons and and/or/not, eg,
+
+    rsi14 < 30 and close > ema200 and vol10 > 2 * vol30
+
+Indicator names (N is a number of bars):
+    open, high, low, close, volume: price data of the bar
+    emaN: exponential moving average of closing price
+    smaN: simple moving average of closing price
+    rsiN: relative strength index (Wilder, same as TimeSeriesPlus.get_rsi)
+    volN: average volume
+    highN, lowN: highest high and lowest low
+    chgN: price change from N bars earlier (0.1 for 10%)
+
+The expression is checked against this grammar and evaluated with array
+operations on the whole universe, either at the last bar of every security
+or at every bar in history.
+"""
+
+import ast
+import re
+import sys
+import operator
+import numpy as np
+import pandas as pd
+
+# indicator prefix -> function of universe and number of bars N giving a dataframe (dates x symbols)
+indicators = {
+    'ema': lambda universe, n: universe.ema(n),
+    'sma': lambda universe, n: rolling(universe, '4. close', n, 'mean'),
+    'rsi': lambda universe, n: rsi(universe, n),
+    'vol': lambda universe, n: rolling(universe, '5. volume', n, 'mean'),
+    'high': lambda universe, n: rolling(universe, '2. high', n, 'max'),
+    'low': lambda universe, n: rolling(universe, '3. low', n, 'min'),
+    'chg': lambda universe, n: change(universe, n),
+}
+
+# number literals (ast.Num up to Python 3.7, ast.Constant since 3.8)
+constant_nodes = (ast.Constant,) if sys.version_info >= (3, 8) else (ast.Constant, ast.Num)
+
+fields = {'open': '1. open', 'high': '2. high', 'low': '3. low', 'close': '4. close', 'volume': '5. volume'}
+
+binary_operators = {ast.Add: operator.add, ast.Sub: operator.sub, ast.Mult: operator.mul, ast.Div: operator.truediv}
+compare_operators = {ast.Lt: operator.lt, ast.LtE: operator.le, ast.Gt: operator.gt, ast.GtE: operator.ge,
+                     ast.Eq: operator.eq, ast.NotEq: operator.ne}
+
+
+def rolling(universe, column, n, stat):
+    """Rolling statistic (mean, max or min) over n bars of a price column of all securities
+
+        Windows count only bars of each security (Universe.to_bars), the same
+        bars as on the price data of one security.
+    """
+    window = pd.DataFrame(universe.to_bars(np.asarray(universe.panel[column]))).rolling(n)
+    values = getattr(window, stat)().to_numpy()
+    return pd.DataFrame(universe.from_bars(values), index=universe.dates, columns=universe.symbols)
+
+
+def rsi(universe, n=14):
+    """Relative strength index of all securities (Wilder's smoothing, span 2n-1)
+    """
+    close = universe.panel['4. close']
+    delta = pd.DataFrame(close - universe.shift_bars(close, 1), index=universe.dates, columns=universe.symbols)
+    span = n * 2 - 1
+    up = delta.where(~(delta < 0), 0).ewm(span=span, adjust=False, ignore_na=True).mean()
+    down = delta.where(~(delta > 0), 0).ewm(span=span, adjust=False, ignore_na=True).mean().abs()
+    return (100 - (100 / (1 + up / down))).where(universe.valid())
+
+
+def change(universe, n):
+    """Price change from n bars earlier of all securities
+    """
+    close = universe.panel['4. close']
+    return pd.DataFrame(close / universe.shift_bars(close, n) - 1, index=universe.dates, columns=universe.symbols)
+
+
+def _split_name(name):
+    """Split an indicator name into prefix and number of bars (eg, ema200 -> ('ema', 200))
+
+    Returns:
+        tuple: prefix and number of bars, None for an unknown indicator
+    """
+    mymatch = re.match(r'^([a-z]+)(\d+)$', name)
+    if not mymatch or mymatch.group(1) not in indicators or int(mymatch.group(2)) < 1:
+        return None
+    return mymatch.group(1), int(mymatch.group(2))
+
+
+def _constant(node):
+    """Get the value of a constant node
+    """
+    return node.value if isinstance(node, ast.Constant) else node.n
+
+
+def indicator(universe, name):
+    """Get an indicator by name for all securities (cached on the universe)
+
+    Args:
+        universe (Universe object): aligned price data
+        name (str): indicator name (eg, ema200)
+
+    Returns:
+        dataframe: dates x symbols
+    """
+    if name in fields:
+        return universe.field(fields[name])
+    split = _split_name(name)
+    if split is None:
+        raise ValueError(f"Unknown indicator '{name}' (options: {', '.join(fields)}, "
+                         f"{', '.join(key + 'N' for key in indicators)})")
+    kind, n = split
+    return universe.memo(('indicator', name), lambda: indicators[kind](universe, n))
+
+
+def parse(text):
+    """Parse and check a screen expression
+
+    Args:
+        text (str): screen expression
+
+    Returns:
+        ast node: expression tree
+
+    Raises:
+        ValueError: syntax error, unknown indicator or unsupported operation
+    """
+    try:
+        tree = ast.parse(text.strip(), mode='eval').body
+    except SyntaxError as e:
+        raise ValueError(f"invalid screen expression '{text}': {e.msg}")
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Name):
+            if node.id not in fields and _split_name(node.id) is None:
+                raise ValueError(f"unknown indicator '{node.id}' in screen expression '{text}'")
+        elif isinstance(node, constant_nodes):
+            value = _constant(node)
+            if not isinstance(value, (int, float)) or isinstance(value, bool):
+                raise ValueError(f"unsupported constant {value!r} in screen expression '{text}'")
+        elif isinstance(node, ast.BinOp):
+            if type(node.op) not in binary_operators:
+                raise ValueError(f"unsupported operator in screen expression '{text}'")
+        elif isinstance(node, ast.Compare):
+            if any(type(op) not in compare_operators for op in node.ops):
+                raise ValueError(f"unsupported comparison in screen expression '{text}'")
+        elif isinstance(node, ast.UnaryOp):
+            if not isinstance(node.op, (ast.Not, ast.USub)):
+                raise ValueError(f"unsupported operator in screen expression '{text}'")
+        elif not isinstance(node, (ast.BoolOp, ast.And, ast.Or, ast.Load, ast.expr_context, ast.operator,
+                                   ast.cmpop, ast.unaryop)):
+            raise ValueError(f"unsupported syntax '{type(node).__name__}' in screen expression '{text}'")
+    return tree
+
+
+def names(tree):
+    """Get indicator names used in an expression tree
+    """
+    return sorted({node.id for node in ast.walk(tree) if isinstance(node, ast.Name)})
+
+
+def _compute(node, values):
+    """Evaluate an expression tree on arrays
+
+    Args:
+        node (ast node): checked expression tree
+        values (dict): indicator name -> numpy array
+    """
+    if isinstance(node, ast.Name):
+        return values[node.id]
+    if isinstance(node, constant_nodes):
+        return _constant(node)
+    if isinstance(node, ast.BinOp):
+        return binary_operators[type(node.op)](_compute(node.left, values), _compute(node.right, values))
+    if isinstance(node, ast.UnaryOp):
+        operand = _compute(node.operand, values)
+        return np.logical_not(operand) if isinstance(node.op, ast.Not) else -operand
+    if isinstance(node, ast.BoolOp):
+        combine = np.logical_and if isinstance(node.op, ast.And) else np.logical_or
+        result = _compute(node.values[0], values)
+        for value in node.values[1:]:
+            result = combine(result, _compute(value, values))
+        return result
+    # chained comparison (eg, 30 < rsi14 < 70)
+    result = True
+    left = _compute(node.left, values)
+    for op, comparator in zip(node.ops, node.comparators):
+        right = _compute(comparator, values)
+        result = np.logical_and(result, compare_operators[type(op)](left, right))
+        left = right
+    return result
+
+
+def evaluate(universe, text, history=False):
+    """Evaluate a screen expression for all securities
+
+        Comparisons with missing values (eg, short history) are false.
+
+    Args:
+        universe (Universe object): aligned price data
+        text (str): screen expression
+        history (boolean): evaluate at every bar instead of the last bar of each security
+
+    Returns:
+        pandas series (by symbol) or dataframe (dates x symbols): boolean for conditions,
+            float for arithmetic expressions
+    """
+    tree = parse(text)
+    with np.errstate(all='ignore'):
+        if history:
+            values = {name: indicator(universe, name).to_numpy() for name in names(tree)}
+            result = np.array(np.broadcast_to(_compute(tree, values), (len(universe.dates), len(universe.symbols))))
+            frame = pd.DataFrame(result, index=universe.dates, columns=universe.symbols)
+            return frame & universe.valid() if frame.dtypes.eq(bool).all() else frame.where(universe.valid())
+        values = {name: universe.last_row(indicator(universe, name)).to_numpy() for name in names(tree)}
+        result = np.array(np.broadcast_to(_compute(tree, values), (len(universe.symbols),)))
+        series = pd.Series(result, index=universe.symbols)
+        if series.dtype == bool:
+            series = series & (universe.last_index >= 0)
+        return series
@@ -0,0 +1,266 @@
+"""
+On-disk index of signal occurrences: one bitmap per signal and security over the bars of the security
+
+A signal is a named signal with arguments (eg, stochastic_cross:14,3,20, see
+'signals') or a screen expression (eg, close > ema200, see screen_expression).
+Bits of all securities are packed (numpy.packbits) and concatenated, one
+compressed file per signal, with the trading dates of every security kept
+once in a separate file. Each security is stored with the version of its
+price data file; updating the index computes signals again only for
+securities whose price data changed, and new signals for all securities.
+
+A query combines signals with '&' (and), '|' (or, lower precedence) and a
+'~' prefix (not), eg, 'stochastic_cross:14,3,20 & close > ema200', and is
+answered from the bitmaps of all securities at once.
+"""
+
+import os
+import re
+import numpy as np
+import pandas as pd
+import module.signal_matrix as signal_matrix
+import module.candle_pattern as candle_pattern
+import module.screen_expression as screen_expression
+import module.sampling as sampling
+import module.result_cache as result_cache
+from module.universe import Universe
+from module.attribute_table import read_price
+
+# signal name -> function of universe and arguments (strings) giving a boolean dataframe (dates x symbols)
+signals = {
+    'macd_cross_up': lambda universe, sspan=12, lspan=26, persist=1:
+        signal_matrix.macd_cross_up(universe, int(sspan), int(lspan), int(persist)),
+    'ema_cross_up': lambda universe, fast, slow, persist=1:
+        signal_matrix.ema_cross_up(universe, int(fast), int(slow), int(persist)),
+    'stochastic_cross': lambda universe, n=14, m=3, cutoff=20, mode='crs':
+        signal_matrix.stochastic_cross(universe, int(n), int(m), float(cutoff), mode),
+    'uptrend': lambda universe, days=30, cutoff=0.8: signal_matrix.uptrend(universe, int(days), float(cutoff)) == 1,
+    'candle': lambda universe, name: candle_pattern.get_pattern(universe, name),
+    'stks_bb': lambda universe: sampling.scan(universe, 'stks_bb', onset=False),
+    'below_bb': lambda universe: sampling.scan(universe, 'below_bb', onset=False),
+    'plunge_macd': lambda universe: sampling.scan(universe, 'plunge_macd', onset=False),
+}
+
+
+def normalize(spec):
+    """Get the stored form of a signal (single spaces)
+    """
+    return ' '.join(spec.split())
+
+
+def evaluate(universe, spec):
+    """Evaluate a signal at every bar of every security
+
+    Args:
+        universe (Universe object): aligned price data
+        spec (str): named signal with arguments (eg, macd_cross_up:12,26,1) or screen expression
+
+    Returns:
+        numpy array: boolean, dates x symbols
+
+    Raises:
+        ValueError: unknown signal or screen expression not giving true/false
+    """
+    mymatch = re.match(r'^([a-z_]+)(?::(.*))?$', spec)
+    if mymatch and mymatch.group(1) in signals:
+        args = mymatch.group(2).split(',') if mymatch.group(2) else []
+        try:
+            matrix = signals[mymatch.group(1)](universe, *args)
+        except (TypeError, ValueError, KeyError) as e:
+            raise ValueError(f"invalid arguments of signal '{spec}': {e}")
+    else:
+        matrix = screen_expression.evaluate(universe, spec, history=True)
+        if not matrix.dtypes.eq(bool).all():
+            raise ValueError(f"signal '{spec}' is not a condition (signals: {', '.join(signals)}, "
+                             f"or a screen expression)")
+    return np.asarray(matrix.fillna(False), dtype=bool) & universe.valid().to_numpy(dtype=bool)
+
+
+def parse_query(query):
+    """Split a query into signals
+
+    Returns:
+        list: alternatives (or), each a list of (signal, negated) pairs (and)
+    """
+    alternatives = []
+    for alternative in query.split('|'):
+        terms = []
+        for term in alternative.split('&'):
+            term = term.strip()
+            negated = term.startswith('~')
+            term = normalize(term.lstrip('~'))
+            if not term:
+                raise ValueError(f"empty signal in query '{query}'")
+            terms.append((term, negated))
+        alternatives.append(terms)
+    return alternatives
+
+
+class SignalIndex:
+    """A class holding bitmaps of signal occurrences of securities, stored in a directory
+
+    Attributes:
+        directory (str): index directory
+        symbols (numpy array): indexed securities
+        versions (numpy array): version (modification time, size) of price data file of each security
+        counts (numpy array): number of bars of each security
+        dates (numpy array): trading dates of all securities, concatenated
+        bitmaps (dict): signal -> packed bits of all securities, concatenated (each security padded to bytes)
+    Methods:
+        load():
+            Read the index from its directory
+        save():
+            Write the index to its directory
+        update():
+            Compute signals of securities with new or changed price data, and new signals
+        occurrences():
+            Get (symbol, date) of bars meeting a query
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.symbols = np.array([], dtype=str)
+        self.versions = np.empty((0, 2), dtype=np.int64)
+        self.counts = np.array([], dtype=np.int64)
+        self.dates = np.array([], dtype='datetime64[D]')
+        self.bitmaps = {}
+        self.load()
+
+    def signal_path(self, spec):
+        """Path of the bitmap file of a signal
+        """
+        return os.path.join(self.directory, "signals", result_cache.digest(spec) + ".npz")
+
+    def load(self):
+        """Read the index from its directory (empty index if missing)
+        """
+        path = os.path.join(self.directory, "dates.npz")
+        if not os.path.exists(path):
+            return
+        with np.load(path) as data:
+            self.symbols, self.versions, self.counts, self.dates = \
+                data["symbols"], data["versions"], data["counts"], data["dates"]
+        folder = os.path.join(self.directory, "signals")
+        for name in sorted(os.listdir(folder)) if os.path.isdir(folder) else []:
+            if '.tmp' in name:
+                continue
+            with np.load(os.path.join(folder, name)) as data:
+                if np.array_equal(data["symbols"], self.symbols) and np.array_equal(data["counts"], self.counts):
+                    self.bitmaps[str(data["spec"])] = data["bits"]
+
+    def save(self):
+        """Write the index to its directory (through temporary files, so readers never see a partial file)
+        """
+        os.makedirs(os.path.join(self.directory, "signals"), exist_ok=True)
+        files = {os.path.join(self.directory, "dates.npz"): dict(
+            symbols=self.symbols, versions=self.versions, counts=self.counts, dates=self.dates)}
+        for spec, bits in self.bitmaps.items():
+            files[self.signal_path(spec)] = dict(spec=np.array(spec), symbols=self.symbols, counts=self.counts,
+                                                 bits=bits)
+        for path, arrays in files.items():
+            temp = f"{path}.{os.getpid()}.tmp.npz"
+            np.savez_compressed(temp, **arrays)
+            os.replace(temp, path)
+
+    def byte_starts(self):
+        """First byte of each security in packed bits
+        """
+        return np.concatenate(([0], np.cumsum((self.counts + 7) // 8)))
+
+    def date_starts(self):
+        """First position of each security in concatenated dates
+        """
+        return np.concatenate(([0], np.cumsum(self.counts)))
+
+    def update(self, data_dir, symbols, specs=()):
+        """Compute signals of securities with new or changed price data, and new signals for all securities
+
+        Args:
+            data_dir (str): path to the directory containing price data
+            symbols (list): securities to have in the index (indexed securities are kept)
+            specs (list): signals to have in the index (indexed signals are kept)
+
+        Returns:
+            int: number of securities whose signals were computed
+        """
+        specs = [spec for spec in dict.fromkeys(normalize(spec) for spec in specs) if spec not in self.bitmaps]
+        all_specs = list(self.bitmaps) + specs
+        known = {symbol: i for i, symbol in enumerate(self.symbols)}
+        wanted = list(dict.fromkeys(list(self.symbols) + list(symbols)))
+        versions = result_cache.data_versions(data_dir, wanted)
+        wanted = [symbol for symbol in wanted if versions[symbol] is not None]
+        stale = [symbol for symbol in wanted if symbol not in known or
+                 tuple(self.versions[known[symbol]]) != versions[symbol]]
+        compute = wanted if specs else stale
+        if not compute:
+            return 0
+
+        frames = {}
+        for symbol in compute:
+            price = read_price(data_dir, symbol)
+            if price is not None:
+                price = price.replace('', np.nan).dropna(axis='index')
+                frames[symbol] = price[~price.index.duplicated(keep='last')].sort_index()
+        universe = Universe(frames)
+        valid = universe.valid().to_numpy(dtype=bool)
+        computed = {spec: universe.to_bars(evaluate(universe, spec).astype(float)) == 1
+                    for spec in (all_specs if frames else [])}
+
+        # per-security pieces: dates and packed bits of every signal
+        byte_starts, date_starts = self.byte_starts(), self.date_starts()
+        pieces = {}
+        for symbol in wanted:
+            if symbol in universe.position:
+                j = universe.position[symbol]
+                count = int(valid[:, j].sum())
+                bits = {spec: np.packbits(computed[spec][:count, j]) for spec in all_specs}
+                pieces[symbol] = (np.asarray(universe.dates[valid[:, j]], dtype='datetime64[D]'), bits)
+            elif symbol in known and symbol not in compute:
+                i = known[symbol]
+                bits = {spec: self.bitmaps[spec][byte_starts[i]:byte_starts[i + 1]] for spec in self.bitmaps}
+                pieces[symbol] = (self.dates[date_starts[i]:date_starts[i + 1]], bits)
+
+        self.symbols = np.array(list(pieces), dtype=str)
+        self.versions = np.array([versions[symbol] for symbol in pieces], dtype=np.int64).reshape(-1, 2)
+        self.counts = np.array([len(dates) for dates, bits in pieces.values()], dtype=np.int64)
+        self.dates = np.concatenate([dates for dates, bits in pieces.values()] +
+                                    [np.array([], dtype='datetime64[D]')])
+        self.bitmaps = {spec: np.concatenate([bits[spec] for dates, bits in pieces.values()] +
+                                             [np.array([], dtype=np.uint8)]) for spec in all_specs}
+        self.save()
+        return len(frames)
+
+    def occurrences(self, query, symbols=None):
+        """Get (symbol, date) of bars meeting a query
+
+        Args:
+            query (str): signals combined with '&', '|' and '~' (eg, 'stochastic_cross:14,3,20 & close > ema200')
+            symbols (list): securities to report (None for all indexed securities)
+
+        Returns:
+            dataframe: 'Symbol' and 'Date' columns, ordered by date
+        """
+        alternatives = parse_query(query)
+        missing = [spec for terms in alternatives for spec, negated in terms if spec not in self.bitmaps]
+        if missing:
+            raise ValueError(f"signal(s) not indexed: {', '.join(missing)}")
+
+        result = np.zeros(int(self.byte_starts()[-1]) * 8, dtype=bool)
+        for terms in alternatives:
+            hits = np.ones_like(result)
+            for spec, negated in terms:
+                bits = np.unpackbits(self.bitmaps[spec]).view(bool)
+                hits &= ~bits if negated else bits
+            result |= hits
+
+        positions = np.flatnonzero(result)
+        bit_starts = self.byte_starts() * 8
+        owner = np.searchsorted(bit_starts, positions, side='right') - 1
+        bar = positions - bit_starts[owner]
+        keep = bar < self.counts[owner]
+        if symbols is not None:
+            keep &= np.isin(self.symbols[owner], list(symbols))
+        owner, bar = owner[keep], bar[keep]
+        table = pd.DataFrame({'Symbol': self.symbols[owner],
+                              'Date': pd.to_datetime(self.dates[self.date_starts()[owner] + bar])})
+        return table.sort_values(['Date', 'Symbol'], kind='mergesort').reset_index(drop=True)
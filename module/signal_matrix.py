@@ -0,0 +1,269 @@
+"""
+Cross-over signals computed for every date and every security of a Universe
+
+Each function returns a boolean dataframe (dates x symbols). The row of the
+last bar of a security gives the same answer as the corresponding
+TimeSeriesPlus method; earlier rows tell when the signal fired in history.
+Rolling windows and shifts run on bar positions (Universe.to_bars), so they
+cover the same bars as on the price data of one security even when trading
+dates differ across securities.
+"""
+
+from itertools import combinations
+import numpy as np
+import pandas as pd
+
+# standard EMA stack (same lengths as TimeSeriesPlus.ema_length)
+ema_stack = [2, 3, 5, 10, 20, 50, 100, 150, 200]
+
+
+def to_bars(universe, values):
+    """Get values (dates x symbols) in bar positions of each security as dataframe (bars x symbols)
+    """
+    return pd.DataFrame(universe.to_bars(np.asarray(values, dtype=float)))
+
+
+def from_bars(universe, bars):
+    """Get values in bar positions (see to_bars) back on dates as dataframe (dates x symbols, NaN for missing bars)
+    """
+    return pd.DataFrame(universe.from_bars(np.asarray(bars, dtype=float)), index=universe.dates,
+                        columns=universe.symbols)
+
+
+def cross_up_events(universe, above, persist=1, lookback=8):
+    """Test if a line crossed above another one within a short recent period
+
+        Mirrors the test of TimeSeriesPlus.macd_cross_up/ema_cross_up on a
+        lookback window ending at every bar: below at the first day, above at
+        the last day and no more than 'persist' days above.
+
+    Args:
+        universe (Universe object): aligned price data
+        above (dataframe): 1 where the line is above the other one, 0 below, NaN for missing bars
+        persist (int): number of days allowed to pass since crossing
+        lookback (int): number of days in the window
+
+    Returns:
+        dataframe: boolean, dates x symbols
+    """
+    above = to_bars(universe, above)
+    first = above.shift(lookback - 1)
+    landing = above.rolling(lookback).sum()
+    return from_bars(universe, (first == 0) & (above == 1) & (landing <= persist)) == 1
+
+
+def macd_cross_up(universe, sspan=12, lspan=26, persist=1):
+    """MACD crosses above signal line while the signal line is below zero
+
+    Args:
+        universe (Universe object): aligned price data
+        sspan (int): length of short span for MACD calculation
+        lspan (int): length of long span for MACD calculation
+        persist (int): days allowed after crossing above
+
+    Returns:
+        dataframe: boolean, dates x symbols
+    """
+    valid = universe.valid()
+    macd = (universe.ema(sspan) - universe.ema(lspan)).where(valid)
+    exp3 = macd.ewm(span=9, adjust=False, ignore_na=True).mean()
+    above = (macd - exp3 > 0).astype(float).where(valid)
+    return cross_up_events(universe, above, persist) & (exp3 < 0) & valid
+
+
+def ema_cross_up(universe, fast, slow, persist=1):
+    """Fast EMA crosses above slow EMA
+
+    Args:
+        universe (Universe object): aligned price data
+        fast (int): number of days to define fast ema
+        slow (int): number of days to define slow ema
+        persist (int): number of days allowed to pass since last crossing
+
+    Returns:
+        dataframe: boolean, dates x symbols
+    """
+    valid = universe.valid()
+    above = (universe.ema(fast) - universe.ema(slow) > 0).astype(float).where(valid)
+    return cross_up_events(universe, above, persist) & valid
+
+
+def stochastic(universe, n, m):
+    """Stochastic oscillator K and D lines
+
+    Args:
+        universe (Universe object): aligned price data
+        n (int): number of days to define K
+        m (int): number of days to define D
+
+    Returns:
+        stok (dataframe): K, dates x symbols
+        stod (dataframe): D, dates x symbols
+    """
+    def compute():
+        high = to_bars(universe, universe.panel['2. high'])
+        low = to_bars(universe, universe.panel['3. low'])
+        close = to_bars(universe, universe.panel['4. close'])
+        lowest = low.rolling(n).min()
+        stok = ((close - lowest) / (high.rolling(n).max() - lowest)) * 100
+        return from_bars(universe, stok), from_bars(universe, stok.rolling(m).mean())
+    return universe.memo(('stochastic', n, m), compute)
+
+
+def stochastic_cross(universe, n, m, cutoff, mode='crs'):
+    """Oversold stochastic with K above D ('all') or K just crossing above D (any other mode)
+
+    Args:
+        universe (Universe object): aligned price data
+        n (int): number of days to define K
+        m (int): number of days to define D
+        cutoff (float): D value cutoff (K is allowed up to cutoff + 15)
+        mode (str): 'all' for K >= D, otherwise K crossing above D at the bar
+
+    Returns:
+        dataframe: boolean, dates x symbols
+    """
+    stok, stod = stochastic(universe, n, m)
+    status = stok.notna() & stod.notna() & ~(stok > cutoff + 15) & ~(stod > cutoff)
+    if mode == 'all':
+        status &= ~(stok < stod)
+    else:
+        # K above D at the bar, and not at the previous bar of the security
+        signal = np.where(stok - stod > 0, 1.0, 0.0)
+        status &= (signal == 1) & (universe.shift_bars(signal, 1) == 0)
+    return status & universe.valid()
+
+
+def cross_up(universe, indicator1, indicator2, days):
+    """Test if two indicators ever cross or touch within recent period ending at every bar
+
+    Args:
+        universe (Universe object): aligned price data
+        indicator1 (dataframe): dates x symbols
+        indicator2 (dataframe): dates x symbols
+        days (int): recent period to examine crossing
+
+    Returns:
+        dataframe: boolean, dates x symbols
+    """
+    signal = to_bars(universe, np.where(indicator1 - indicator2 > 0, 1, 0))
+    if days < 2:
+        return from_bars(universe, signal) != from_bars(universe, signal)
+    return from_bars(universe, signal.diff().abs().rolling(days - 1).sum()) > 0
+
+
+def occurrences(matrix):
+    """List every (symbol, date) where a signal fired
+
+    Args:
+        matrix (dataframe): boolean, dates x symbols
+
+    Returns:
+        dataframe: with 'Symbol' and 'Date' columns, ordered by date
+    """
+    rows, cols = np.nonzero(matrix.fillna(False).to_numpy(dtype=bool))
+    return pd.DataFrame({'Symbol': matrix.columns[cols], 'Date': matrix.index[rows]})
+
+
+def ema_pair_bits(lengths=ema_stack):
+    """Bit number of every (shorter, longer) pair of an EMA stack
+
+    Args:
+        lengths (list): EMA lengths, from short to long
+
+    Returns:
+        dict: (shorter length, longer length) -> bit number
+    """
+    return {pair: bit for bit, pair in enumerate(combinations(lengths, 2))}
+
+
+def encode_ema_order(emas, lengths=ema_stack):
+    """Encode the ordering of an EMA stack at every bar as an integer bitmask
+
+        A bit is set when the shorter EMA of a pair is above (strictly) the
+        longer one. Bars with a missing EMA get code 0.
+
+    Args:
+        emas (dict): EMA length -> array of EMA values (same shape for all lengths)
+        lengths (list): EMA lengths, from short to long
+
+    Returns:
+        numpy array: int64 codes, same shape as EMA arrays
+    """
+    code = np.zeros(np.shape(emas[lengths[0]]), dtype=np.int64)
+    with np.errstate(invalid='ignore'):
+        for (fast, slow), bit in ema_pair_bits(lengths).items():
+            code |= (np.asarray(emas[fast]) > np.asarray(emas[slow])).astype(np.int64) << bit
+    return code
+
+
+def ema_bit_mask(fast, slow, lengths=ema_stack):
+    """Bitmask of a (shorter, longer) EMA pair, or None if the pair is not in the stack
+    """
+    bits = ema_pair_bits(lengths)
+    if (fast, slow) not in bits:
+        return None
+    return 1 << bits[(fast, slow)]
+
+
+def ema_code(universe, lengths=ema_stack):
+    """EMA-stack ordering code for every date and every security
+
+    Args:
+        universe (Universe object): aligned price data
+        lengths (list): EMA lengths, from short to long
+
+    Returns:
+        dataframe: int64 codes, dates x symbols (0 for missing bars)
+    """
+    def compute():
+        emas = {length: universe.ema(length).to_numpy() for length in lengths}
+        code = encode_ema_order(emas, lengths)
+        code[~universe.valid().to_numpy()] = 0
+        return pd.DataFrame(code, index=universe.dates, columns=universe.symbols)
+    return universe.memo(('ema_code', tuple(lengths)), compute)
+
+
+def ema_above_share(universe, code, fast, slow, days, lengths=ema_stack):
+    """Share of recent bars with the shorter EMA of a pair above the longer one
+
+    Args:
+        universe (Universe object): aligned price data
+        code (dataframe): EMA-stack ordering codes, dates x symbols
+        fast (int): shorter EMA length
+        slow (int): longer EMA length
+        days (int): number of recent bars
+        lengths (list): EMA lengths of the code
+
+    Returns:
+        dataframe: share (0-1) at every bar, dates x symbols
+    """
+    above = to_bars(universe, (code & ema_bit_mask(fast, slow, lengths)) > 0)
+    return from_bars(universe, above.rolling(days).sum() / days)
+
+
+def uptrend(universe, days, cutoff=0.8):
+    """EMA 20 > 50 > 100 > 150 on most recent bars while EMA 200 is above its 10-bar average
+
+        Same test as TimeSeriesPlus.in_uptrend for every bar in history
+        (1 uptrend, -1 downtrend, 0 otherwise).
+
+    Args:
+        universe (Universe object): aligned price data
+        days (int): number of recent bars to examine
+        cutoff (float): minimal share of recent bars with the EMA ordering
+
+    Returns:
+        dataframe: dates x symbols
+    """
+    code = ema_code(universe)
+    count = 0
+    for fast, slow in ((20, 50), (50, 100), (100, 150)):
+        share = ema_above_share(universe, code, fast, slow, days)
+        count = count + np.where(share >= cutoff, 1, np.where(share < 1 - cutoff, -1, 0))
+    ema200 = to_bars(universe, universe.ema(200))
+    rising = ~(from_bars(universe, ema200 < ema200.rolling(10).mean()) == 1)
+    bars = universe.valid().cumsum()
+    status = np.where(count == 3, 1, np.where(count == -3, -1, 0))
+    status = np.where(rising.to_numpy() & (bars.to_numpy() >= days + 150), status, 0)
+    return pd.DataFrame(status, index=universe.dates, columns=universe.symbols)
@@ -0,0 +1,121 @@
+"""
+Chart-shape similarity search over the history of all securities in a Universe
+
+Distances between a query window and every window of every security are
+z-normalized Euclidean distances computed with an FFT-based sliding dot
+product (MASS), for blocks of securities at once.
+"""
+
+import numpy as np
+import pandas as pd
+
+
+def sliding_stats(values, length):
+    """Mean and standard deviation of every window along the first axis
+
+    Args:
+        values (numpy array): dates x securities (no NaN)
+        length (int): window length
+
+    Returns:
+        mean, std (numpy array): (dates - length + 1) x securities
+    """
+    zero = np.zeros((1, values.shape[1]))
+    total = np.concatenate((zero, np.cumsum(values, axis=0)))
+    squares = np.concatenate((zero, np.cumsum(values ** 2, axis=0)))
+    mean = (total[length:] - total[:-length]) / length
+    variance = (squares[length:] - squares[:-length]) / length - mean ** 2
+    return mean, np.sqrt(np.clip(variance, 0, None))
+
+
+def distance_profile(values, query):
+    """Z-normalized Euclidean distance between a query and every window of many series (MASS)
+
+    Args:
+        values (numpy array): dates x securities, NaN for missing bars
+        query (numpy array): query window
+
+    Returns:
+        numpy array: (dates - len(query) + 1) x securities, inf for windows with missing bars or flat prices
+    """
+    length = len(query)
+    rows = values.shape[0]
+    if rows < length:
+        return np.empty((0, values.shape[1]))
+    missing = np.isnan(values)
+    filled = np.where(missing, 0, values)
+
+    size = 1 << int(np.ceil(np.log2(rows + length)))
+    products = np.fft.irfft(np.fft.rfft(filled, size, axis=0) *
+                            np.fft.rfft(query[::-1], size)[:, None], size, axis=0)[length - 1:rows]
+    mean, std = sliding_stats(filled, length)
+    query_mean = query.mean()
+    query_std = query.std()
+    with np.errstate(all='ignore'):
+        correlation = (products - length * query_mean * mean) / (length * query_std * std)
+        distance = np.sqrt(np.clip(2 * length * (1 - correlation), 0, None))
+
+    gaps = np.concatenate((np.zeros((1, values.shape[1])), np.cumsum(missing, axis=0)))
+    distance[(gaps[length:] - gaps[:-length] > 0) | ~(std > 0)] = np.inf
+    return distance
+
+
+def search(universe, symbol, start, end, top=10, block=500, exclusion=None):
+    """Find windows of closing price most similar in shape to a query window
+
+        Each security contributes windows at least 'exclusion' bars apart, so
+        one pattern is not reported many times with small shifts. Windows
+        overlapping the query itself are skipped.
+
+    Args:
+        universe (Universe object): aligned price data
+        symbol (str): security of the query window
+        start (str): first date of the query window (eg, 2020-01-02)
+        end (str): last date of the query window
+        top (int): number of windows to report
+        block (int): number of securities per FFT block (memory bound)
+        exclusion (int): minimal distance in bars between windows of the same security (default: half query)
+
+    Returns:
+        dataframe: 'Symbol', 'Start', 'End' and 'Distance' columns, most similar first
+    """
+    close = universe.panel['4. close']
+    column = universe.position[symbol]
+    rows = np.flatnonzero(~np.isnan(close[:, column]) &
+                          (universe.dates >= pd.Timestamp(start)) & (universe.dates <= pd.Timestamp(end)))
+    if len(rows) < 3:
+        raise ValueError(f"Query window of {symbol} from {start} to {end} has less than 3 bars")
+    query = close[rows, column]
+    length = len(query)
+    if exclusion is None:
+        exclusion = max(1, length // 2)
+
+    # Best candidates of every block
+    candidates = []
+    for first in range(0, len(universe.symbols), block):
+        distance = distance_profile(close[:, first:first + block], query)
+        if distance.size == 0:
+            continue
+        if first <= column < first + block:
+            lo = max(0, rows[0] - length + 1)
+            distance[lo:rows[-1] + 1, column - first] = np.inf
+        keep = min(distance.size, top * (length + 1))
+        best = np.argpartition(distance, keep - 1, axis=None)[:keep]
+        ends, cols = np.unravel_index(best, distance.shape)
+        candidates.append(pd.DataFrame({'row': ends, 'col': cols + first, 'Distance': distance[ends, cols]}))
+    if not candidates:
+        return pd.DataFrame(columns=['Symbol', 'Start', 'End', 'Distance'])
+    candidates = pd.concat(candidates).sort_values('Distance', kind='mergesort')
+    candidates = candidates[np.isfinite(candidates['Distance'])]
+
+    # Greedy selection with exclusion zone within each security
+    chosen = []
+    taken = {}
+    for row, col, value in candidates.itertuples(index=False):
+        if any(abs(row - r) < exclusion for r in taken.get(col, [])):
+            continue
+        taken.setdefault(col, []).append(row)
+        chosen.append((universe.symbols[col], universe.dates[row], universe.dates[row + length - 1], value))
+        if len(chosen) == top:
+            break
+    return pd.DataFrame(chosen, columns=['Symbol', 'Start', 'End', 'Distance'])
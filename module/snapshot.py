@@ -0,0 +1,164 @@
+"""
+Latest-bar snapshot: one row per security holding indicator values at its last bar
+
+Indicators are computed from the last bars of each security only (see
+Universe.last_bars), with the same windows as the TimeSeriesPlus methods they
+replace, so filters and sorts on the last bar become boolean masks and
+sort_values on one table instead of a pass over every security's data frame.
+
+Columns of the standard table:
+    open, high, low, close, volume: price data of the last bar
+    rsi14: relative strength index (same as TimeSeriesPlus.get_rsi)
+    sma20: 20-bar simple moving average of closing price
+    bb_upper, bb_lower: 20-bar bollinger band borders
+    vol10, vol30: average volume
+    bars: number of bars
+
+Other columns are added on demand by name, eg, sma_distance50, bb_distance3,
+relative_volume10 (see 'metrics').
+"""
+
+import re
+import numpy as np
+import pandas as pd
+import module.screen_expression as screen_expression
+import module.window_stats as window_stats
+
+fields = {'open': '1. open', 'high': '2. high', 'low': '3. low', 'close': '4. close', 'volume': '5. volume'}
+
+
+def last_bars(universe, field, length):
+    """Get values of a price field at the last bars of each security (symbols x length, oldest first)
+    """
+    return universe.last_bars(universe.panel[field], length)
+
+
+def rolling_windows(values, length):
+    """Get all windows of arrays of the last bars of each security (symbols x bars, oldest first)
+
+    Returns:
+        numpy array: read-only view, symbols x (bars - length + 1) x length
+    """
+    return window_stats.window_view(values.T, length).transpose(1, 0, 2)
+
+
+def sma(universe, field, length):
+    """Simple moving average of a price field at the last bar (NaN for shorter history)
+    """
+    return pd.Series(last_bars(universe, field, length).mean(axis=1), index=universe.symbols)
+
+
+def bollinger(universe, length=20, width=2, bars=1):
+    """Bollinger band borders at the last bars of each security
+
+    Args:
+        universe (Universe object): aligned price data
+        length (int): length of the moving average
+        width (float): band width in standard deviations
+        bars (int): number of last bars
+
+    Returns:
+        upper, lower (numpy arrays): symbols x bars, oldest first
+    """
+    closes = last_bars(universe, '4. close', length + bars - 1)
+    windows = rolling_windows(closes, length)
+    average = windows.mean(axis=2)
+    deviation = windows.std(axis=2, ddof=1)
+    return average + deviation * width, average - deviation * width
+
+
+def sma_distance(universe, length):
+    """Distance of last close to its simple moving average, relative to last close
+        (same as TimeSeriesPlus.get_SMAdistance, 0 without a positive average)
+    """
+    close = universe.last_row(universe.field('4. close'))
+    average = sma(universe, '4. close', length)
+    return ((close - average) / close).where(average > 0, 0)
+
+
+def bb_distance(universe, days=1):
+    """Ratio between close-to-lower-border distance and bollinger band width
+        (same as TimeSeriesPlus.get_BBdistance)
+
+    Args:
+        days (int): number of recent days to define the minimal low
+    """
+    upper, lower = bollinger(universe)
+    low = last_bars(universe, '3. low', days).min(axis=1) if days > 1 else last_bars(universe, '3. low', 1)[:, 0]
+    with np.errstate(all='ignore'):
+        ratio = (low - lower[:, -1]) / (upper[:, -1] - lower[:, -1])
+    return pd.Series(ratio, index=universe.symbols)
+
+
+def bb_uptrend(universe, bars=(1, 3, 5)):
+    """Test if lower bollinger border is above its 10-bar average at given bars back (1 is the last bar)
+
+    Returns:
+        pandas series: boolean by symbol
+    """
+    lower = bollinger(universe, bars=max(bars) + 9)[1]
+    average = rolling_windows(lower, 10).mean(axis=2)
+    # a missing value does not fail the test
+    failed = np.zeros(len(universe.symbols), dtype=bool)
+    for bar in bars:
+        failed |= lower[:, -bar] <= average[:, -bar]
+    return pd.Series(~failed, index=universe.symbols)
+
+
+def relative_volume(universe, n=10):
+    """Ratio between n-bar and 30-bar average volume (same as TimeSeriesPlus.get_relative_volume)
+    """
+    background = sma(universe, '5. volume', 30)
+    return (sma(universe, '5. volume', n) / background).where(background > 0, 0)
+
+
+# column prefix -> function of universe and number N giving values by symbol
+metrics = {
+    'rsi': lambda universe, n: universe.last_row(screen_expression.indicator(universe, f"rsi{n}")),
+    'sma': lambda universe, n: sma(universe, '4. close', n),
+    'vol': lambda universe, n: sma(universe, '5. volume', n),
+    'sma_distance': sma_distance,
+    'bb_distance': bb_distance,
+    'relative_volume': relative_volume,
+}
+
+
+def table(universe):
+    """Get the latest-bar table of a universe (cached on the universe)
+
+    Returns:
+        dataframe: securities (index) and standard columns
+    """
+    def build():
+        columns = {name: universe.last_row(universe.field(field)) for name, field in fields.items()}
+        columns['rsi14'] = metrics['rsi'](universe, 14)
+        columns['sma20'] = metrics['sma'](universe, 20)
+        upper, lower = bollinger(universe)
+        columns['bb_upper'] = pd.Series(upper[:, -1], index=universe.symbols)
+        columns['bb_lower'] = pd.Series(lower[:, -1], index=universe.symbols)
+        columns['vol10'] = metrics['vol'](universe, 10)
+        columns['vol30'] = metrics['vol'](universe, 30)
+        columns['bars'] = pd.Series(universe.valid().to_numpy().sum(axis=0), index=universe.symbols)
+        return pd.DataFrame(columns, index=universe.symbols)
+
+    return universe.memo('snapshot', build)
+
+
+def column(universe, name):
+    """Get a column of the latest-bar table by name, computing and adding it if missing
+
+    Args:
+        universe (Universe object): aligned price data
+        name (str): standard column or metric name followed by N (eg, sma_distance50)
+
+    Returns:
+        pandas series: by symbol
+    """
+    snapshot = table(universe)
+    if name not in snapshot:
+        mymatch = re.match(r'^([a-z_]+?)(\d+)$', name)
+        if not mymatch or mymatch.group(1) not in metrics:
+            raise ValueError(f"Unknown snapshot column '{name}' (options: {', '.join(snapshot.columns)}, "
+                             f"{', '.join(key + 'N' for key in metrics)})")
+        snapshot[name] = metrics[mymatch.group(1)](universe, int(mymatch.group(2)))
+    return snapshot[name]
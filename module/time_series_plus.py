@@ -7,7 +7,9 @@ import sys
 import numpy as np
 import pandas as pd
 from module.utility import date_to_index
-from scipy.stats import chisquare
+from module.universe import resample_frame
+import module.window_stats as window_stats
+import module.signal_matrix as signal_matrix
 
 
 class TimeSeriesPlus:
@@ -28,6 +30,10 @@ class TimeSeriesPlus:
                 ema_sma = ema + 'SMA'
                 df[ema_sma] = df[ema].rolling(10).mean()
 
+            # Ordering of the EMA stack as bitmask (bit set: shorter EMA of a pair above the longer one)
+            df['EMAcode'] = signal_matrix.encode_ema_order(
+                {days: df[str(days) + 'MA'].to_numpy() for days in self.ema_length}, self.ema_length)
+
             # 20-day bollinger band and simple moving average for its lower border
             df["20SMA"] = df["4. close"].rolling(20).mean()
             df['STD20'] = df["4. close"].rolling(20).std()
@@ -345,6 +351,23 @@ class TimeSeriesPlus:
         stok, stod, signal, paction = self.stochastic_cross_internal(n, m)
         return stok[-1], stod[-1], signal[-1], paction[-1]
 
+    def ema_above(self, fast, slow, dataframe=None):
+        """Test at every bar if the shorter EMA of a pair is above the longer one, using the EMA-stack code
+
+        Args:
+            fast (int): length of the shorter EMA
+            slow (int): length of the longer EMA
+            dataframe (pandas dataframe): data with 'EMAcode' column (self.df if not given)
+
+        Returns:
+            numpy array: 1 above, 0 not above (None if the pair or the code is not available)
+        """
+        df = self.df if dataframe is None else dataframe
+        mask = signal_matrix.ema_bit_mask(fast, slow, self.ema_length)
+        if mask is None or 'EMAcode' not in df.columns:
+            return None
+        return np.where(df['EMAcode'].to_numpy() & mask, 1, 0)
+
     def two_dragon_internal(self, MAdays1, MAdays2, TRNDdays, dataframe, cutoff=0.8, vol=False):
         """ Test parallel ema in defined period
         Args:
@@ -363,6 +386,18 @@ class TimeSeriesPlus:
         # sma_fast = df['4. close'].ewm(span=fast, adjust=False).mean()
         # sma_slow = df['4. close'].ewm(span=slow, adjust=False).mean()
 
+        # EMAs of the standard stack: test bits of the EMA-stack code
+        signal = None if vol else self.ema_above(MAdays1, MAdays2, dataframe)
+        if signal is not None:
+            if (TRNDdays + MAdays2) > dataframe.shape[0]:
+                return status
+            ratio = signal[-TRNDdays:].sum() / TRNDdays
+            if ratio >= cutoff:
+                status = 1
+            elif ratio < (1 - cutoff):
+                status = -1
+            return status
+
         df = dataframe.copy(deep=True)
         if vol:
             ma1_key = "v" + str(MAdays1) + "_SMA"
@@ -458,6 +493,16 @@ class TimeSeriesPlus:
         """
 
         status = False
+
+        # EMAs of the standard stack: test bits of the EMA-stack code
+        query_below_short = self.ema_above(query, short)
+        query_above_long = self.ema_above(query, long)
+        if query_below_short is not None and query_above_long is not None:
+            passed = (1 - query_below_short) * query_above_long
+            if not days:
+                return bool(passed[-1])
+            return passed[-days:].sum() / days >= cut
+
         df = self.df.copy(deep=True)
         ema_q = f"{query}MA"
         ema_s = f"{short}MA"
@@ -551,6 +596,15 @@ class TimeSeriesPlus:
         # Test uptrend onset
         if launch:
             status = 0
+            above_50 = self.ema_above(20, 50)
+            above_100 = self.ema_above(50, 100)
+            if above_50 is not None and above_100 is not None:
+                # If EMA20 > EMA50 > EMA 100, pattern emerges
+                passed = (above_50 * above_100)[-50:]
+                if passed[-1] == 1 and passed[-5:-2].sum() == 0:
+                    status = 1
+                return status
+
             df = self.df.copy(deep=True).tail(50)
             df['diff1_20-50'] = df['20MA'] - df['50MA']
             df['diff1'] = np.where(df['diff1_20-50']>0, 1 , 0)
@@ -585,26 +639,13 @@ class TimeSeriesPlus:
     def to_weekly(self):
         """Turn time series price data into weekly data
         """
-        logic = {'1. open': 'first',
-                 '2. high': 'max',
-                 '3. low': 'min',
-                 '4. close': 'last',
-                 '5. volume': 'sum'}
-        # offset = pd.offsets.timedelta(days=-6)
-        offset = None
-        self.df = self.df.resample('W', loffset=offset).apply(logic)
+        self.df = resample_frame(self.df, 'week')
         self.sma_multiple()
 
     def to_monthly(self):
         """Turn time series price data into monthly data
         """
-        logic = {'1. open': 'first',
-                 '2. high': 'max',
-                 '3. low': 'min',
-                 '4. close': 'last',
-                 '5. volume': 'sum'}
-        offset = None
-        self.df = self.df.resample('M', loffset=offset).apply(logic)
+        self.df = resample_frame(self.df, 'month')
 
     def get_weekly(self):
         """Get weekly time series price data
@@ -974,59 +1015,9 @@ class TimeSeriesPlus:
             float: p value of the test if data are evenly distributed
         """
 
-        df2 = df = self.df.copy(deep=True).tail(days)
-        std = df2['4. close'].rolling(days).std()[-1]
-        mean = df2['4. close'].rolling(days).mean()[-1]
-        df2['z_score'] = (df2['4. close'] - mean).abs() / std
-
-        df3 = df2.loc[df2['z_score'] < 2]
-
-        if df3.shape[0] < df2.shape[0] * 0.75:
-            return 1
-
-        days = df3.shape[0]
-        test = df3['4. close']
-
-        high = test.max()
-        low  = test.min()
-        mid_price = (high + low)/2
-        mid_day_index = int(days/2)
-        test1 = test[:mid_day_index]
-        test2 = test[mid_day_index:]
-        s1_high = np.where(test1 > mid_price, 1, 0).sum()
-        s1_low  = np.where(test1 < mid_price, 1, 0).sum()
-        s2_high = np.where(test2 > mid_price, 1, 0).sum()
-        s2_low  = np.where(test2 < mid_price, 1, 0).sum()
-
-        #
-        std = df2['1. open'].rolling(days).std()[-1]
-        mean = df2['1. open'].rolling(days).mean()[-1]
-        df2['z_score'] = (df2['1. open'] - mean).abs() / std
-
-        df3 = df2.loc[df2['z_score'] < 2]
-
-        if df3.shape[0] < df2.shape[0] * 0.75:
-            return 1
-
-        days = df3.shape[0]
-        test = df3['1. open']
-
-        high = test.max()
-        low  = test.min()
-        mid_price = (high + low)/2
-        mid_day_index = int(days/2)
-        test1 = test[:mid_day_index]
-        test2 = test[mid_day_index:]
-        s1_high += np.where(test1 > mid_price, 1, 0).sum()
-        s1_low  += np.where(test1 < mid_price, 1, 0).sum()
-        s2_high += np.where(test2 > mid_price, 1, 0).sum()
-        s2_low  += np.where(test2 < mid_price, 1, 0).sum()
-
-        # print(s1_high, s2_high, s1_low, s2_low)
-        p = chisquare([s1_high, s2_high], [s1_low, s2_low])
-        # print (p)
-
-        return p.pvalue
+        # closing and opening prices are tested on the last window (see window_stats.zigzag_stat)
+        df = self.df
+        return window_stats.single_statistic([df['4. close'], df['1. open']], days, window_stats.zigzag_stat)
 
     def get_trading_uprange(self, day):
         """
@@ -1168,22 +1159,10 @@ class TimeSeriesPlus:
              std (float): the ratio between price deviation and trading range
         """
 
-        df = self.df.copy(deep=True)
-        average = df['4. close'].rolling(period).mean()[-1]
-
-        # Get largest price deviation from moving average
-        sub = df.copy(deep=True).tail(period)
-        sub['std_error'] = (sub['4. close'] - average) ** 2
-        sub['diff_close'] = (sub['4. close'] - average).abs()
-        sub['diff_open'] = (sub['1. open'] - average).abs()
-        sub['diff_abs'] = np.where(sub['diff_close'] > sub['diff_open'], sub['diff_close'], sub['diff_open'])
-        # Get trading range
-        sub['trading_range'] = sub['1. open'] - sub['4. close']
-        sub['trading_range_abs'] = sub['trading_range'].abs()
-        # Get ratio of the two estimates
-        std = sub['diff_abs'].rolling(period).mean()[-1]/sub['trading_range_abs'].rolling(period).median()[-1]
-
-        return std
+        # Largest price deviation from average divided by trading range (see window_stats.consolidation_stat)
+        df = self.df
+        return window_stats.single_statistic([df['4. close'], df['1. open']], period,
+                                             window_stats.consolidation_stat)
 
     def ema_entanglement(self, ema_fast, ema_slow, period):
         """Count how many times 2 EMAs cross each in defined recent period
@@ -1197,12 +1176,24 @@ class TimeSeriesPlus:
             int (int): number of crossings between the two EMAs
         """
         
-        df = self.df.copy(deep=True)
-        df['fast'] = df["4. close"].ewm(span=ema_fast, adjust=False).mean()
-        df['slow'] = df["4. close"].ewm(span=ema_slow, adjust=False).mean()
-        df = df.tail(period)
-        df['diff'] = df['fast'] - df['slow']
-        df['signal'] = np.where(df['diff'] > 0, 1, 0)
-        
+        df = self.df
+        fast = df["4. close"].ewm(span=ema_fast, adjust=False).mean()
+        slow = df["4. close"].ewm(span=ema_slow, adjust=False).mean()
+        signal = np.where(fast - slow > 0, 1, 0)
+
         # total number of times two EMA cross each other
-        return df['signal'].diff().abs().sum()
+        return window_stats.single_statistic([signal], period, window_stats.entanglement_stat)
+
+    def ema_attraction(self, ema_len, period):
+        """Get standard deviation of closing price around EMA (relative to EMA) in defined recent period
+
+        Args:
+            ema_len (int): number of days to define EMA
+            period (int): number of days to define recent lookback period
+
+        Returns:
+            float: relative deviation (small values for prices attracted to the EMA)
+        """
+        df = self.df
+        ema = df["4. close"].ewm(span=ema_len, adjust=False).mean()
+        return window_stats.single_statistic([df["4. close"], ema], period, window_stats.attraction_stat)
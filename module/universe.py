@@ -0,0 +1,380 @@
+"""
+Universe class and methods for price data aligned across securities
+"""
+
+import numpy as np
+import pandas as pd
+
+price_columns = ['1. open', '2. high', '3. low', '4. close', '5. volume']
+scale_frequency = {'week': 'W', 'month': 'M'}
+
+
+def period_boundaries(dates, scale):
+    """Get the first row of every week or month in a sorted date index
+
+    Args:
+        dates (pandas DatetimeIndex): sorted trading dates
+        scale (str): 'week' or 'month'
+
+    Returns:
+        starts (numpy array): row number where each period starts
+        labels (pandas DatetimeIndex): period end dates (Sunday for week, last calendar day for month)
+    """
+    if scale not in scale_frequency:
+        raise ValueError(f"Unknown time scale '{scale}' (options: week, month)")
+    if len(dates) == 0:
+        return np.array([], dtype=int), pd.DatetimeIndex([])
+
+    periods = dates.to_period(scale_frequency[scale])
+    ordinals = periods.asi8
+    starts = np.concatenate(([0], np.flatnonzero(np.diff(ordinals)) + 1))
+    labels = periods[starts].to_timestamp(how='end').normalize()
+    return starts, labels
+
+
+def reduce_ohlcv(panel, starts):
+    """Reduce daily OHLCV arrays into periods starting at given rows
+
+        Reductions are done with ufunc.reduceat on the boundary rows so that
+        all securities (columns) are processed at once. Missing bars (NaN) are
+        ignored; a period without any bar for a security is left as NaN.
+
+    Args:
+        panel (dict): price column name -> 2D numpy array (dates x securities)
+        starts (numpy array): row number where each period starts
+
+    Returns:
+        dict: price column name -> 2D numpy array (periods x securities)
+    """
+    close = panel['4. close']
+    num_rows, num_cols = close.shape
+    if num_rows == 0 or len(starts) == 0:
+        return {column: np.empty((0, num_cols)) for column in price_columns}
+
+    valid = ~np.isnan(close)
+    rows = np.arange(num_rows)[:, None]
+    cols = np.arange(num_cols)[None, :]
+
+    # First and last valid row of each security within each period
+    first = np.minimum.reduceat(np.where(valid, rows, num_rows), starts, axis=0)
+    last = np.maximum.reduceat(np.where(valid, rows, -1), starts, axis=0)
+    empty = last < 0
+
+    scaled = {
+        '1. open': panel['1. open'][np.clip(first, 0, num_rows - 1), cols],
+        '2. high': np.fmax.reduceat(panel['2. high'], starts, axis=0),
+        '3. low': np.fmin.reduceat(panel['3. low'], starts, axis=0),
+        '4. close': close[np.clip(last, 0, num_rows - 1), cols],
+        '5. volume': np.add.reduceat(np.where(valid, panel['5. volume'], 0), starts, axis=0),
+    }
+    for column in price_columns:
+        scaled[column] = scaled[column].astype(float)
+        scaled[column][empty] = np.nan
+    return scaled
+
+
+class Universe:
+    """A class holding price data of many securities aligned on a shared date index
+
+    Attributes:
+        symbols (list): security symbols (columns of every panel)
+        position (dict): symbol -> column number
+        dates (pandas DatetimeIndex): union of trading dates across securities (rows of every panel)
+        panel (dict): price column name -> 2D numpy array (dates x symbols), NaN where a security has no bar
+        last_index (numpy array): row number of the last valid bar for each security
+        scale (str): time scale of the data (day, week or month)
+        _cache (dict): derived data (eg, resampled universes) computed once and reused
+    Methods:
+        from_panel():
+            Create a Universe from aligned arrays
+        field():
+            Get one price column as dataframe (dates x symbols)
+        valid():
+            Get a boolean dataframe marking dates with a bar for each security
+        ema():
+            Get exponential moving average of a price column (cached)
+        memo():
+            Compute derived data once and cache it
+        last_row():
+            Get the value at the last valid bar of each security
+        shift_bars():
+            Get values a number of bars earlier in the history of each security
+        bar_order():
+            Get row numbers of the bars of each security (cached)
+        last_bars():
+            Get values of the last bars of each security
+        to_bars(), from_bars():
+            Move values between date positions and bar positions of each security
+        resample():
+            Get the weekly or monthly universe (cached)
+        get_frame():
+            Get price dataframe of one security
+        to_frames():
+            Get a dictionary of price dataframes by security
+    """
+
+    def __init__(self, frames, scale='day'):
+        """Initializer
+
+        Args:
+            frames (dict): symbol -> dataframe with price columns and date index
+            scale (str): time scale of the input data
+        """
+        self.symbols = list(frames.keys())
+        self.position = {symbol: i for i, symbol in enumerate(self.symbols)}
+        self.scale = scale
+        self._cache = {}
+
+        columns = {}
+        for symbol in self.symbols:
+            df = frames[symbol]
+            if not df.index.is_monotonic_increasing:
+                df = df.sort_index()
+            if df.index.has_duplicates:
+                df = df[~df.index.duplicated(keep='last')]
+            columns[symbol] = df
+
+        self.panel = {}
+        if self.symbols:
+            for column in price_columns:
+                aligned = pd.concat([columns[s][column] for s in self.symbols], axis=1,
+                                    keys=self.symbols, join='outer').sort_index()
+                self.dates = aligned.index
+                self.panel[column] = aligned.to_numpy(dtype=float)
+        else:
+            self.dates = pd.DatetimeIndex([])
+            for column in price_columns:
+                self.panel[column] = np.empty((0, 0))
+        self.last_index = self._find_last_index()
+
+    @classmethod
+    def from_panel(cls, dates, symbols, panel, scale='day'):
+        """Create a Universe from aligned arrays without realignment
+
+        Args:
+            dates (pandas DatetimeIndex): row labels
+            symbols (list): column labels
+            panel (dict): price column name -> 2D numpy array (dates x symbols)
+            scale (str): time scale of the data
+
+        Returns:
+            Universe object
+        """
+        universe = cls.__new__(cls)
+        universe.symbols = list(symbols)
+        universe.position = {symbol: i for i, symbol in enumerate(universe.symbols)}
+        universe.dates = dates
+        universe.panel = panel
+        universe.scale = scale
+        universe._cache = {}
+        universe.last_index = universe._find_last_index()
+        return universe
+
+    def _find_last_index(self):
+        """Get row number of the last valid closing price for each security (-1 if none)
+        """
+        close = self.panel['4. close']
+        if close.size == 0:
+            return np.full(len(self.symbols), -1)
+        valid = ~np.isnan(close)
+        last = close.shape[0] - 1 - valid[::-1].argmax(axis=0)
+        return np.where(valid.any(axis=0), last, -1)
+
+    def field(self, column):
+        """Get one price column as dataframe
+
+        Args:
+            column (str): price column name (eg, '4. close')
+
+        Returns:
+            dataframe: dates x symbols
+        """
+        return pd.DataFrame(self.panel[column], index=self.dates, columns=self.symbols)
+
+    def valid(self):
+        """Get a boolean dataframe (dates x symbols), true where a security has a bar
+        """
+        return self.memo('valid', lambda: self.field('4. close').notna())
+
+    def ema(self, span, column='4. close'):
+        """Get exponential moving average of a price column for all securities
+
+            Missing bars are skipped (ignore_na) so that values on valid bars equal
+            those calculated from the data of each security alone.
+
+        Args:
+            span (int): number of days to define the EMA
+            column (str): price column name
+
+        Returns:
+            dataframe: dates x symbols
+        """
+        return self.memo(('ema', column, span),
+                         lambda: self.field(column).ewm(span=span, adjust=False, ignore_na=True).mean())
+
+    def memo(self, key, compute):
+        """Compute derived data once and keep it in cache
+
+        Args:
+            key (hashable): cache key
+            compute (function): function without argument producing the data
+
+        Returns:
+            cached data
+        """
+        if key not in self._cache:
+            self._cache[key] = compute()
+        return self._cache[key]
+
+    def last_row(self, frame):
+        """Get the value at the last valid bar of each security
+
+        Args:
+            frame (dataframe): dates x symbols aligned with this universe
+
+        Returns:
+            pandas series: value indexed by symbol (NaN for securities without data)
+        """
+        values = frame.to_numpy()
+        if values.shape[0] == 0:
+            return pd.Series(np.nan, index=self.symbols)
+        last = values[np.clip(self.last_index, 0, None), np.arange(len(self.symbols))]
+        series = pd.Series(last, index=self.symbols)
+        if (self.last_index < 0).any():
+            series = series.where(self.last_index >= 0)
+        return series
+
+    def shift_bars(self, values, bars):
+        """Get values a number of bars earlier, counting only bars of each security
+
+            Unlike a row shift, missing bars of a security (eg, before listing or
+            on dates only other securities traded) are skipped.
+
+        Args:
+            values (numpy array): 2D array, dates x symbols
+            bars (int): number of bars to look back
+
+        Returns:
+            numpy array: dates x symbols (NaN where history is shorter than 'bars' or no bar)
+        """
+        valid = self.valid().to_numpy()
+        order = self.bar_order()
+        previous = np.cumsum(valid, axis=0) - 1 - bars
+        rows = order[np.clip(previous, 0, None), np.arange(valid.shape[1])[None, :]]
+        shifted = values[rows, np.arange(valid.shape[1])[None, :]].astype(float)
+        shifted[(previous < 0) | ~valid] = np.nan
+        return shifted
+
+    def bar_order(self):
+        """Get row numbers of the bars of each security in date order (cached)
+
+        Returns:
+            numpy array: dates x symbols, column j starts with the rows where symbol j has a bar
+        """
+        return self.memo('bar_order', lambda: np.argsort(~self.valid().to_numpy(dtype=bool), axis=0, kind='stable'))
+
+    def last_bars(self, values, length):
+        """Get values of the last bars of each security, counting only bars of the security
+
+            Same window as the last 'length' rows of the price data of one security.
+
+        Args:
+            values (numpy array): 2D array, dates x symbols
+            length (int): number of bars
+
+        Returns:
+            numpy array: symbols x length, oldest first (NaN where history is shorter)
+        """
+        num_cols = len(self.symbols)
+        if values.shape[0] == 0:
+            return np.full((num_cols, length), np.nan)
+        counts = self.valid().to_numpy(dtype=bool).sum(axis=0)
+        position = counts[:, None] - length + np.arange(length)[None, :]
+        cols = np.arange(num_cols)[:, None]
+        rows = self.bar_order()[np.clip(position, 0, None), cols]
+        windows = values[rows, cols].astype(float)
+        windows[position < 0] = np.nan
+        return windows
+
+    def to_bars(self, values):
+        """Move the bars of each security to the top of its column, in date order
+
+            Rolling windows computed on the result count only bars of the security
+            (same as on the price data of one security). from_bars() moves them back.
+
+        Args:
+            values (numpy array): 2D array, dates x symbols
+
+        Returns:
+            numpy array: bars x symbols (row i is the i-th bar, NaN after the last bar)
+        """
+        cols = np.arange(len(self.symbols))[None, :]
+        bars = values[self.bar_order(), cols].astype(float, copy=False)
+        bars[np.arange(len(self.dates))[:, None] >= self.valid().to_numpy(dtype=bool).sum(axis=0)] = np.nan
+        return bars
+
+    def from_bars(self, bars):
+        """Move values from bar positions (see to_bars) back to their dates
+
+        Returns:
+            numpy array: dates x symbols (NaN where a security has no bar)
+        """
+        values = np.full(bars.shape, np.nan)
+        values[self.bar_order(), np.arange(len(self.symbols))[None, :]] = bars
+        values[~self.valid().to_numpy(dtype=bool)] = np.nan
+        return values
+
+    def resample(self, scale):
+        """Get weekly or monthly price data for all securities
+
+            The resampled universe is computed once and cached.
+
+        Args:
+            scale (str): 'week' or 'month' ('day' returns itself)
+
+        Returns:
+            Universe object
+        """
+        if scale in ('', 'day', self.scale):
+            return self
+        if scale not in self._cache:
+            starts, labels = period_boundaries(self.dates, scale)
+            scaled = reduce_ohlcv(self.panel, starts)
+            self._cache[scale] = Universe.from_panel(labels, self.symbols, scaled, scale)
+        return self._cache[scale]
+
+    def get_frame(self, symbol):
+        """Get price dataframe of one security
+
+        Args:
+            symbol (str): security symbol
+
+        Returns:
+            dataframe: price columns indexed by date, periods without data removed
+        """
+        i = self.position[symbol]
+        df = pd.DataFrame({column: self.panel[column][:, i] for column in price_columns}, index=self.dates)
+        df.index.name = 'date'
+        return df[~np.isnan(self.panel['4. close'][:, i])]
+
+    def to_frames(self):
+        """Get a dictionary of price dataframes
+
+        Returns:
+            dict: symbol -> dataframe
+        """
+        return {symbol: self.get_frame(symbol) for symbol in self.symbols}
+
+
+def resample_frame(df, scale):
+    """Turn daily price data of a single security into weekly or monthly data
+
+    Args:
+        df (dataframe): daily price data
+        scale (str): 'week' or 'month'
+
+    Returns:
+        dataframe: resampled price data
+    """
+    symbol = 'x'
+    return Universe({symbol: df}).resample(scale).get_frame(symbol)
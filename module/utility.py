@@ -3,6 +3,7 @@ Miscellaneous functions
 """
 
 import os
+import re
 import sys
 import time
 import pandas as pd
@@ -137,7 +138,9 @@ def get_output_filename(infile, **kwargs):
 
     file_name = infile
     if kwargs["sample"]:
-        file_name = file_name + ".hist_" + kwargs["sample"]
+        file_name = file_name + ".hist_" + kwargs["sample"].replace(",", "_")
+    if kwargs["similar"]:
+        file_name = file_name + ".sim" + kwargs["similar"].replace(',', '_')
     if kwargs["filterOnly"]:
         file_name = file_name + ".filtered"
     if kwargs["vgm"]:
@@ -160,6 +163,14 @@ def get_output_filename(infile, **kwargs):
         file_name = file_name + ".sbr"
     if kwargs["sort_performance"]:
         file_name = file_name + ".sPfm" + kwargs["sort_performance"].replace(',','_')
+    if kwargs["sort_relative_strength"]:
+        file_name = file_name + ".sRst" + kwargs["sort_relative_strength"]
+    if kwargs["sort_group_momentum"]:
+        file_name = file_name + ".sGm" + kwargs["sort_group_momentum"].replace(',', '_')
+    if kwargs["sort_risk"]:
+        file_name = file_name + ".sRsk" + kwargs["sort_risk"].replace(',', '_')
+    if kwargs["sort_correlation"]:
+        file_name = file_name + ".sCor" + kwargs["sort_correlation"].replace(',', '_')
     if kwargs["sort_industry"]:
         file_name = file_name + ".sInd"
     if ',' in kwargs["sort_sink"]:
@@ -194,6 +205,10 @@ def get_output_filename(infile, **kwargs):
         file_name = file_name + ".fSliSpt" + kwargs["filter_hit_horizontal_support"].replace(',', '-')
     if kwargs["filter_hit_horizontal_resistance"]:
         file_name = file_name + ".fSliRst" + kwargs["filter_hit_horizontal_support"].replace(',', '-')
+    if kwargs["filter_breadth"]:
+        file_name = file_name + ".fBr" + kwargs["filter_breadth"].replace(',', '-')
+    if kwargs["filter_volume_profile"]:
+        file_name = file_name + ".fVp" + kwargs["filter_volume_profile"].replace(',', '-')
     if kwargs["filter_horizon_slice"]:
         file_name = file_name + ".fSliHrz" + kwargs["filter_horizon_slice"].replace(',', '-')
     if kwargs["filter_rsi"]:
@@ -208,9 +223,16 @@ def get_output_filename(infile, **kwargs):
         file_name = file_name + ".fcsd" + kwargs["filter_consolidation_p"].replace(',', '-')
     if kwargs["filter_ema_3layers"]:
         file_name = file_name + ".fEma3_" + kwargs["filter_ema_3layers"].replace(',', '-')
+    if kwargs["filter_candle_pattern"]:
+        file_name = file_name + ".fCdl" + kwargs["filter_candle_pattern"].replace(',', '-')
+    if kwargs["filter_expression"]:
+        file_name = file_name + ".fExp" + re.sub(r'[^A-Za-z0-9.]+', '_', kwargs["filter_expression"]).strip('_')
     if kwargs["sort_ema_entanglement"]:
         file_name = file_name + ".fEmaEtg_" + kwargs["sort_ema_entanglement"].replace(',', '-')
 
+    if kwargs["top"]:
+        file_name = file_name + ".top" + str(kwargs["top"])
+
     if kwargs["weekly"]:
         file_name = file_name + ".weekly"
     if kwargs["time_scale"]:
@@ -218,6 +240,9 @@ def get_output_filename(infile, **kwargs):
     if kwargs["weekly_chart"]:
         file_name = file_name + ".wkch"
 
+    # timeframe qualifiers of filters (eg, w:160,0.8)
+    file_name = file_name.replace(':', '')
+
     return file_name
 
 
@@ -0,0 +1,126 @@
+"""
+Volume-by-price profiles for support and resistance
+
+A profile is a histogram of traded volume over price bins spanning the
+trading range of a lookback period. Profiles of all securities are filled
+with one np.bincount call on (security, bin) flat indices.
+"""
+
+import warnings
+import numpy as np
+import pandas as pd
+
+
+def profile(high, low, close, volume, bins=50):
+    """Volume-by-price histograms of many securities
+
+        The volume of each bar is counted in the bin of its typical price
+        (average of high, low and close).
+
+    Args:
+        high (numpy array): securities x days
+        low (numpy array): securities x days
+        close (numpy array): securities x days
+        volume (numpy array): securities x days
+        bins (int): number of price bins between lowest low and highest high
+
+    Returns:
+        volumes (numpy array): traded volume, securities x bins
+        bottom (numpy array): lower edge of the first bin of each security
+        top (numpy array): upper edge of the last bin of each security
+    """
+    num = high.shape[0]
+    with np.errstate(all='ignore'), warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        bottom = np.nanmin(low, axis=1)
+        top = np.nanmax(high, axis=1)
+        span = np.where(top > bottom, top - bottom, np.nan)
+        position = ((high + low + close) / 3 - bottom[:, None]) / span[:, None] * bins
+    valid = ~np.isnan(position) & ~np.isnan(volume)
+    index = np.clip(np.floor(np.where(valid, position, 0)), 0, bins - 1).astype(int)
+    flat = (np.arange(num)[:, None] * bins + index)[valid]
+    volumes = np.bincount(flat, weights=volume[valid], minlength=num * bins).reshape(num, bins)
+    return volumes, bottom, top
+
+
+def bin_centers(bottom, top, bins):
+    """Price at the center of every bin
+
+    Returns:
+        numpy array: securities x bins
+    """
+    return bottom[:, None] + (np.arange(bins) + 0.5)[None, :] * ((top - bottom) / bins)[:, None]
+
+
+def latest_profile(universe, days, bins=50):
+    """Volume-by-price profile of recent period ending at the last bar of every security
+
+        The period counts only bars of each security (Universe.last_bars), the
+        same bars as the last 'days' rows of the price data of one security.
+
+    Args:
+        universe (Universe object): aligned price data
+        days (int): lookback period
+        bins (int): number of price bins
+
+    Returns:
+        tuple: volumes (securities x bins), bottom and top (see profile)
+    """
+    def compute():
+        arrays = [universe.last_bars(np.asarray(universe.panel[column]), days)
+                  for column in ('2. high', '3. low', '4. close', '5. volume')]
+        return profile(*arrays, bins)
+    return universe.memo(('volume_profile', days, bins), compute)
+
+
+def volume_node(universe, days, bins=50, side='s'):
+    """Price of the heaviest volume bin below (support) or above (resistance) the last close
+
+    Args:
+        universe (Universe object): aligned price data
+        days (int): lookback period
+        bins (int): number of price bins
+        side (str): 's' for support, 'r' for resistance
+
+    Returns:
+        pandas series: price level indexed by symbol (NaN if no volume on that side)
+    """
+    volumes, bottom, top = latest_profile(universe, days, bins)
+    centers = bin_centers(bottom, top, bins)
+    close = universe.last_row(universe.field('4. close')).to_numpy()[:, None]
+    with np.errstate(invalid='ignore'):
+        side_mask = centers <= close if side == 's' else centers > close
+    weighted = np.where(side_mask & (volumes > 0), volumes, -1)
+    best = weighted.argmax(axis=1)
+    level = centers[np.arange(len(best)), best]
+    level[weighted.max(axis=1) < 0] = np.nan
+    return pd.Series(level, index=universe.symbols)
+
+
+def node_distance(universe, days, bins=50, side='s'):
+    """Distance from last close to the support (or resistance) volume node, relative to last close
+
+    Returns:
+        pandas series: distance indexed by symbol (positive when close is above support or below resistance)
+    """
+    close = universe.last_row(universe.field('4. close'))
+    level = volume_node(universe, days, bins, side)
+    if side == 's':
+        return (close - level) / close
+    return (level - close) / close
+
+
+def frame_profile(df, bins=50):
+    """Volume-by-price profile of one security
+
+    Args:
+        df (dataframe): price data
+        bins (int): number of price bins
+
+    Returns:
+        volumes (numpy array): traded volume per bin
+        edges (numpy array): bin edges (bins + 1)
+    """
+    arrays = [df[column].to_numpy(dtype=float)[None, :] for column in ('2. high', '3. low', '4. close', '5. volume')]
+    volumes, bottom, top = profile(*arrays, bins)
+    return volumes[0], np.linspace(bottom[0], top[0], bins + 1)
@@ -0,0 +1,283 @@
+"""
+Window statistics computed on strided views of aligned price data
+
+Statistic functions (*_stat) take window arrays shaped (..., window length)
+and reduce the last axis, so the same code scores the last window of one
+security, the last windows of all securities (securities x length) or every
+window in history (bars x securities x length).
+
+Windows of all securities are cut from bar positions (Universe.last_bars,
+Universe.to_bars), so a window holds the same bars as on the price data of
+one security even when trading dates differ across securities.
+"""
+
+import warnings
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import as_strided
+from scipy.stats import chi2
+
+
+def window_view(values, length):
+    """Get all windows of an array (dates x securities) without copying
+
+    Args:
+        values (numpy array): 2D array, dates x securities
+        length (int): window length
+
+    Returns:
+        numpy array: read-only view, (dates - length + 1) x securities x length
+    """
+    rows, cols = values.shape
+    if rows < length:
+        return np.empty((0, cols, length))
+    stride_row, stride_col = values.strides
+    return as_strided(values, shape=(rows - length + 1, cols, length),
+                      strides=(stride_row, stride_col, stride_row), writeable=False)
+
+
+def latest_statistic(universe, arrays, length, stat):
+    """Compute a window statistic at the last bar of every security
+
+    Args:
+        universe (Universe object): aligned price data
+        arrays (list): 2D arrays (dates x symbols) passed to the statistic
+        length (int): window length
+        stat (function): statistic taking one window array per input array
+
+    Returns:
+        pandas series: statistic indexed by symbol
+    """
+    windows = [universe.last_bars(np.asarray(values), length) for values in arrays]
+    with np.errstate(all='ignore'), warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        result = stat(*windows)
+    return pd.Series(result, index=universe.symbols)
+
+
+def rolling_statistic(universe, arrays, length, stat, max_elements=20000000):
+    """Compute a window statistic at every bar of every security
+
+        Windows are strided views over bar positions of each security; rows are
+        processed in blocks so that statistics needing a copy (eg, median) stay
+        within a memory bound.
+
+    Args:
+        universe (Universe object): aligned price data
+        arrays (list): 2D arrays (dates x symbols) passed to the statistic
+        length (int): window length
+        stat (function): statistic taking one window array per input array
+        max_elements (int): maximal number of window elements per block
+
+    Returns:
+        dataframe: dates x symbols (NaN for the first length - 1 bars of each security)
+    """
+    num_rows = len(universe.dates)
+    num_cols = len(universe.symbols)
+    result = np.full((num_rows, num_cols), np.nan)
+    views = [window_view(np.ascontiguousarray(universe.to_bars(np.asarray(values))), length) for values in arrays]
+    block = max(1, max_elements // max(1, num_cols * length))
+    with np.errstate(all='ignore'), warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        for start in range(0, num_rows - length + 1, block):
+            stop = min(start + block, num_rows - length + 1)
+            result[start + length - 1:stop + length - 1] = stat(*[view[start:stop] for view in views])
+    return pd.DataFrame(universe.from_bars(result), index=universe.dates, columns=universe.symbols)
+
+
+def single_statistic(arrays, length, stat):
+    """Compute a window statistic on the last window of one security
+
+    Args:
+        arrays (list): 1D arrays (dates) passed to the statistic
+        length (int): window length
+        stat (function): statistic taking one window array per input array
+
+    Returns:
+        float: statistic (history shorter than window length is padded with NaN)
+    """
+    windows = []
+    for values in arrays:
+        window = np.asarray(values, dtype=float)[-length:]
+        if len(window) < length:
+            window = np.concatenate((np.full(length - len(window), np.nan), window))
+        windows.append(window)
+    with np.errstate(all='ignore'), warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        return float(stat(*windows))
+
+
+def _half_counts(values, keep):
+    """Count values above/below mid price in the first and second half of kept values
+
+    Args:
+        values (numpy array): windows, (..., length)
+        keep (numpy array): boolean, same shape, values to be counted
+
+    Returns:
+        tuple: counts of (1st half high, 1st half low, 2nd half high, 2nd half low, kept values)
+    """
+    kept = keep.sum(axis=-1)
+    masked = np.where(keep, values, np.nan)
+    mid_price = ((np.nanmax(masked, axis=-1) + np.nanmin(masked, axis=-1)) / 2)[..., None]
+    rank = np.cumsum(keep, axis=-1) - 1
+    first_half = keep & (rank < (kept // 2)[..., None])
+    second_half = keep & ~first_half
+    high = values > mid_price
+    low = values < mid_price
+    return ((first_half & high).sum(axis=-1), (first_half & low).sum(axis=-1),
+            (second_half & high).sum(axis=-1), (second_half & low).sum(axis=-1), kept)
+
+
+def zigzag_stat(close, open_price):
+    """P value of the test if prices are distributed evenly across 4 adjacent areas
+
+        Same test as TimeSeriesPlus.get_zigzag_score. Chi-square p values are
+        computed for all windows at once.
+
+    Args:
+        close (numpy array): closing price windows, (..., days)
+        open_price (numpy array): opening price windows, (..., days)
+
+    Returns:
+        numpy array: p values (1 if more than 25% of prices are outliers)
+    """
+    days = close.shape[-1]
+
+    # closing prices within 2 standard deviation
+    mean = close.mean(axis=-1)[..., None]
+    std = close.std(axis=-1, ddof=1)[..., None]
+    keep = np.abs(close - mean) / std < 2
+    s1_high, s1_low, s2_high, s2_low, kept = _half_counts(close, keep)
+    outlier = kept < days * 0.75
+
+    # opening prices within 2 standard deviation of the last 'kept' opening prices
+    recent = np.arange(days) >= (days - kept)[..., None]
+    mean = (np.where(recent, open_price, 0).sum(axis=-1) / kept)[..., None]
+    std = np.sqrt(np.where(recent, (open_price - mean) ** 2, 0).sum(axis=-1) / (kept - 1))[..., None]
+    keep = np.abs(open_price - mean) / std < 2
+    counts = _half_counts(open_price, keep)
+    outlier |= counts[4] < days * 0.75
+    s1_high = s1_high + counts[0]
+    s1_low = s1_low + counts[1]
+    s2_high = s2_high + counts[2]
+    s2_low = s2_low + counts[3]
+
+    statistic = (s1_high - s1_low) ** 2 / s1_low + (s2_high - s2_low) ** 2 / s2_low
+    return np.where(outlier, 1, chi2.sf(statistic, 1))
+
+
+def consolidation_stat(close, open_price):
+    """Ratio between mean price deviation from average and median trading range
+
+        Same measure as TimeSeriesPlus.get_consolidation.
+
+    Args:
+        close (numpy array): closing price windows, (..., period)
+        open_price (numpy array): opening price windows, (..., period)
+
+    Returns:
+        numpy array: ratios
+    """
+    average = close.mean(axis=-1)[..., None]
+    diff_close = np.abs(close - average)
+    diff_open = np.abs(open_price - average)
+    diff_abs = np.where(diff_close > diff_open, diff_close, diff_open)
+    return diff_abs.mean(axis=-1) / np.median(np.abs(open_price - close), axis=-1)
+
+
+def entanglement_stat(signal):
+    """Number of times a 0/1 signal switches within windows
+
+    Args:
+        signal (numpy array): windows of 1 (fast EMA above slow EMA) or 0, (..., period)
+
+    Returns:
+        numpy array: number of crossings
+    """
+    return np.nansum(np.abs(np.diff(signal, axis=-1)), axis=-1)
+
+
+def attraction_stat(close, ema):
+    """Standard deviation of closing price around EMA relative to EMA
+
+    Args:
+        close (numpy array): closing price windows, (..., period)
+        ema (numpy array): EMA windows, (..., period)
+
+    Returns:
+        numpy array: relative deviation
+    """
+    return np.sqrt((((close - ema) / ema) ** 2).mean(axis=-1))
+
+
+def _evaluate(universe, arrays, length, stat, history):
+    """Evaluate a statistic at the last bar (series) or every bar (dataframe)
+    """
+    if history:
+        return rolling_statistic(universe, arrays, length, stat)
+    return latest_statistic(universe, arrays, length, stat)
+
+
+def zigzag_score(universe, days, history=False):
+    """Zigzag score (see zigzag_stat) for all securities
+
+    Args:
+        universe (Universe object): aligned price data
+        days (int): number of days to do the test
+        history (boolean): score every bar instead of the last bar
+
+    Returns:
+        pandas series (by symbol) or dataframe (dates x symbols)
+    """
+    arrays = [universe.panel['4. close'], universe.panel['1. open']]
+    return _evaluate(universe, arrays, days, zigzag_stat, history)
+
+
+def consolidation(universe, period, history=False):
+    """Consolidation ratio (see consolidation_stat) for all securities
+
+    Args:
+        universe (Universe object): aligned price data
+        period (int): number of days to define recent period
+        history (boolean): score every bar instead of the last bar
+
+    Returns:
+        pandas series (by symbol) or dataframe (dates x symbols)
+    """
+    arrays = [universe.panel['4. close'], universe.panel['1. open']]
+    return _evaluate(universe, arrays, period, consolidation_stat, history)
+
+
+def ema_entanglement(universe, ema_fast, ema_slow, period, history=False):
+    """Number of crossings between two EMAs in recent period for all securities
+
+    Args:
+        universe (Universe object): aligned price data
+        ema_fast (int): number of days to define fast moving average
+        ema_slow (int): number of days to define slow moving average
+        period (int): number of days to define recent lookback period
+        history (boolean): score every bar instead of the last bar
+
+    Returns:
+        pandas series (by symbol) or dataframe (dates x symbols)
+    """
+    signal = np.where(universe.ema(ema_fast) - universe.ema(ema_slow) > 0, 1.0, 0.0)
+    signal[~universe.valid().to_numpy()] = np.nan
+    return _evaluate(universe, [signal], period, entanglement_stat, history)
+
+
+def ema_attraction(universe, ema_len, period, history=False):
+    """Deviation of closing price around EMA in recent period for all securities
+
+    Args:
+        universe (Universe object): aligned price data
+        ema_len (int): number of days to define EMA
+        period (int): number of days to define recent lookback period
+        history (boolean): score every bar instead of the last bar
+
+    Returns:
+        pandas series (by symbol) or dataframe (dates x symbols)
+    """
+    arrays = [universe.panel['4. close'], universe.ema(ema_len).to_numpy()]
+    return _evaluate(universe, arrays, period, attraction_stat, history)
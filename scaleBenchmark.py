@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Measure how loading and screening time grows with the number of securities in a list
+
+Synthetic price data (random walks) are written once for the largest list; smaller
+lists use the first securities of it, eg,
+    scaleBenchmark.py --sizes 1000,10000,50000 --args "--filter_rsi 30,70 --sort_performance 20"
+"""
+
+import os
+import sys
+import time
+import shlex
+import argparse
+import numpy as np
+import pandas as pd
+import module.arguments as arguments
+from module.attribute_table import AttributeTable
+
+
+def write_prices(data_dir, count, bars, seed=0):
+    """Write synthetic daily price data for securities SYN00000, SYN00001, ... (existing files are kept)
+
+        One in ten securities trades below the minimal volume and another one in ten
+        has a short history, so that loading rejects a fifth of every list.
+
+    Args:
+        data_dir (str): directory to write price data files
+        count (int): number of securities
+        bars (int): number of daily bars per security
+        seed (int): seed of the random walks
+
+    Returns:
+        list: symbols
+    """
+    os.makedirs(data_dir, exist_ok=True)
+    dates = pd.bdate_range(end="2020-12-31", periods=bars).strftime("%Y-%m-%d").to_numpy()
+    rng = np.random.default_rng(seed)
+    symbols = []
+    for i in range(count):
+        symbol = f"SYN{i:05d}"
+        symbols.append(symbol)
+        file = os.path.join(data_dir, symbol + ".txt")
+        if os.path.exists(file):
+            continue
+        close = 20 * np.exp(np.cumsum(rng.normal(0, 0.02, bars))) * rng.uniform(1, 10)
+        open_ = close * (1 + rng.normal(0, 0.005, bars))
+        high = np.maximum(open_, close) * (1 + rng.uniform(0, 0.01, bars))
+        low = np.minimum(open_, close) * (1 - rng.uniform(0, 0.01, bars))
+        volume = rng.integers(200000, 5000000, bars) // (100 if i % 10 == 0 else 1)
+        first = bars - 40 if i % 10 == 5 else 0
+        rows = ["{}\t{:.2f}\t{:.2f}\t{:.2f}\t{:.2f}\t{}".format(*row)
+                for row in zip(dates, open_, high, low, close, volume)][first:]
+        with open(file, "w") as f:
+            f.write("date\t1. open\t2. high\t3. low\t4. close\t5. volume\n" + "\n".join(rows) + "\n")
+    return symbols
+
+
+def run(symbols, data_dir, text):
+    """Load a list and screen it with chartList.py options
+
+    Returns:
+        tuple: seconds to load, seconds to screen, number of securities remaining
+    """
+    kwargs = vars(arguments.get_parser().parse_args(["list", "--dir", data_dir] + shlex.split(text)))
+    df = pd.DataFrame({"Symbol": symbols, "Industry": "Ind", "Sector": "Sec"})
+    start = time.time()
+    tickers = AttributeTable(df, data_dir, kwargs)
+    loaded = time.time()
+    tickers.work()
+    return loaded - start, time.time() - loaded, tickers.get_attribute_table().shape[0]
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Scaling benchmark of loading and screening lists of securities")
+    parser.add_argument("-d", "--dir", default="scale_benchmark",
+                        help=": a directory to hold synthetic price data")
+    parser.add_argument("--sizes", default="1000,5000,10000,50000",
+                        help=": numbers of securities in benchmark lists, separated by ','")
+    parser.add_argument("--bars", type=int, default=250,
+                        help=": number of daily bars per security")
+    parser.add_argument("--args", default="--filter_rsi 30,70 --sort_performance 20",
+                        help=": chartList.py options to screen lists with")
+    args = parser.parse_args()
+
+    sizes = sorted(int(size) for size in args.sizes.split(','))
+    start = time.time()
+    symbols = write_prices(args.dir, sizes[-1], args.bars)
+    print(f"# {len(symbols):>5} securities with {args.bars} bars in {args.dir} ({time.time() - start:.1f} s)")
+
+    print("Securities\tLoad (s)\tScreen (s)\tLoad per security (ms)\tRemaining")
+    for size in sizes:
+        load, screen, remaining = run(symbols[:size], args.dir, args.args)
+        print(f"{size}\t{load:.2f}\t{screen:.2f}\t{load / size * 1000:.2f}\t{remaining}")
+        sys.stdout.flush()
@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""
+Resident screening service: keep lists of securities with loaded price data and
+indicators in memory, and answer filter/sort/chart queries over local HTTP
+
+Queries take the same options as chartList.py, eg,
+    curl 'http://127.0.0.1:8765/screen?list=sample.txt&args=--filter_rsi+30,70+--sort_performance+20'
+    curl 'http://127.0.0.1:8765/chart?list=sample.txt&args=--filter_upward+30,0.8'
+"""
+
+import os
+import sys
+import time
+import shlex
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+import pandas as pd
+import module.arguments as arguments
+from module.attribute_table import AttributeTable, loading_arguments
+import chartList
+
+
+class ScreeningService:
+    """A class keeping loaded lists of securities in memory
+
+    Attributes:
+        data_dir (str): path to the directory containing price data
+        tables (dict): list key -> AttributeTable object with loaded price data (never filtered itself)
+        kwargs (dict): list key -> keyword arguments used to load the list
+        versions (dict): list key -> modification time of the list file and of price data files
+        lock (threading.Lock): serializes queries and reloading
+    Methods:
+        parse():
+            Turn chartList.py options into keyword arguments
+        load():
+            Get loaded list (loaded on first query)
+        screen():
+            Filter and sort a list
+        chart():
+            Filter, sort and chart a list
+        refresh():
+            Reload lists whose list file or price data files changed
+        watch():
+            Refresh lists periodically
+    """
+
+    def __init__(self, data_dir):
+        self.data_dir = data_dir
+        self.tables = {}
+        self.kwargs = {}
+        self.versions = {}
+        self.lock = threading.Lock()
+
+    def parse(self, file, text):
+        """Turn chartList.py options into keyword arguments
+
+        Args:
+            file (str): path to list file
+            text (str): options (eg, '--filter_rsi 30,70 -spfm 20')
+
+        Returns:
+            dict: keyword arguments
+        """
+        parser = arguments.get_parser()
+        try:
+            args = parser.parse_args([file, "--dir", self.data_dir] + shlex.split(text))
+        except SystemExit:
+            raise ValueError(f"invalid options: {text}")
+        kwargs = vars(args)
+        del kwargs["list"]
+        return kwargs
+
+    def key(self, file, kwargs):
+        """Key of a list file loaded with given keyword arguments
+        """
+        return (os.path.abspath(file),) + tuple(str(kwargs[name]) for name in loading_arguments)
+
+    def file_versions(self, file):
+        """Get modification time of a list file and of price data files of its securities
+        """
+        versions = {os.path.abspath(file): os.path.getmtime(file)}
+        df = pd.read_csv(file, sep="\t")
+        column = "Symbol" if "Symbol" in df else "Ticker"
+        for symbol in df.get(column, []):
+            path = os.path.join(self.data_dir, f"{symbol}.txt")
+            versions[path] = os.path.getmtime(path) if os.path.exists(path) else None
+        return versions
+
+    def load(self, file, kwargs):
+        """Get loaded list (loaded on first query)
+
+        Args:
+            file (str): path to list file
+            kwargs (dict): keyword arguments
+
+        Returns:
+            AttributeTable object
+        """
+        if not os.path.exists(file):
+            raise ValueError(f"list file not found: {file}")
+        key = self.key(file, kwargs)
+        if key not in self.tables:
+            versions = self.file_versions(file)
+            self.tables[key] = AttributeTable(pd.read_csv(file, sep="\t"), self.data_dir, kwargs)
+            self.kwargs[key] = kwargs
+            self.versions[key] = versions
+        return self.tables[key]
+
+    def screen(self, file, text):
+        """Filter and sort a list
+
+        Args:
+            file (str): path to list file
+            text (str): chartList.py options
+
+        Returns:
+            str: filtered and sorted table (tsv)
+        """
+        kwargs = self.parse(file, text)
+        with self.lock:
+            tickers = self.load(file, kwargs).with_arguments(kwargs)
+            tickers.work()
+            return tickers.get_attribute_table().to_csv(sep="\t")
+
+    def chart(self, file, text):
+        """Filter, sort and chart a list (image files are written in working directory)
+
+        Args:
+            file (str): path to list file
+            text (str): chartList.py options
+        """
+        kwargs = self.parse(file, text)
+        with self.lock:
+            tickers = self.load(file, kwargs).with_arguments(kwargs)
+            chartList.chart_securities(file, tickers=tickers, **kwargs)
+
+    def refresh(self):
+        """Reload lists whose list file or price data files changed
+        """
+        with self.lock:
+            for key in list(self.tables):
+                file = key[0]
+                if not os.path.exists(file):
+                    del self.tables[key], self.kwargs[key], self.versions[key]
+                    continue
+                versions = self.file_versions(file)
+                if versions != self.versions[key]:
+                    print(f"#-> reloading {file}")
+                    self.tables[key] = AttributeTable(pd.read_csv(file, sep="\t"), self.data_dir, self.kwargs[key])
+                    self.versions[key] = versions
+
+    def watch(self, interval):
+        """Refresh lists every 'interval' seconds
+        """
+        while True:
+            time.sleep(interval)
+            self.refresh()
+
+
+def make_handler(service):
+    """Get request handler class answering queries with a screening service
+    """
+
+    class Handler(BaseHTTPRequestHandler):
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            query = parse_qs(url.query)
+            file = query.get("list", [""])[0]
+            text = query.get("args", [""])[0]
+            start = time.time()
+            try:
+                if url.path == "/screen":
+                    body = service.screen(file, text)
+                elif url.path == "/chart":
+                    service.chart(file, text)
+                    body = "charted\n"
+                elif url.path == "/lists":
+                    body = "".join(f"{key[0]}\t{' '.join(key[1:])}\n" for key in service.tables)
+                else:
+                    self.send_error(404, "use /screen, /chart or /lists")
+                    return
+            except ValueError as e:
+                self.send_error(400, str(e))
+                return
+            except Exception as e:
+                self.send_error(500, f"{type(e).__name__}: {e}")
+                raise
+            print(f"#-> {url.path} {file} {text} ({time.time() - start:.3f} s)")
+            data = body.encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/tab-separated-values")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+    return Handler
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Screening service keeping lists of securities in memory")
+    parser.add_argument("list", nargs='*',
+                        help=": list(s) of symbols in TSV to load at start")
+    parser.add_argument("-d", "--dir", default="/Users/air/watchlist/daliyPrice",
+                        help=": a directory holding price data for symbols")
+    parser.add_argument("--host", default="127.0.0.1",
+                        help=": address to listen on")
+    parser.add_argument("-p", "--port", type=int, default=8765,
+                        help=": port to listen on")
+    parser.add_argument("-i", "--interval", type=float, default=10,
+                        help=": seconds between checks for changed list and price data files")
+    args = parser.parse_args()
+
+    service = ScreeningService(args.dir)
+    for file in args.list:
+        service.load(file, service.parse(file, ""))
+    threading.Thread(target=service.watch, args=(args.interval,), daemon=True).start()
+
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(service))
+    print(f"#-> listening on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        sys.exit(0)
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Build and query an on-disk index of signal occurrences in the price history of lists of securities
+
+Signals are indexed on first use and updated for securities whose price data changed, eg,
+    signalIndex.py sample.txt --dir download -s "stochastic_cross:14,3,20" -s "close > ema200"
+    signalIndex.py sample.txt --dir download -q "stochastic_cross:14,3,20 & close > ema200" --fate 40,2R
+"""
+
+import sys
+import time
+import argparse
+import numpy as np
+import pandas as pd
+from module.signal_index import SignalIndex, parse_query, signals
+from module.time_series_plus import TimeSeriesPlus
+from module.attribute_table import read_price
+from chartList import summarize_profit_loss
+
+
+def list_symbols(files):
+    """Get symbols of list files (TSV with 'Symbol' or 'Ticker' column)
+    """
+    symbols = []
+    for file in files:
+        df = pd.read_csv(file, sep="\t")
+        symbols += list(df.get("Symbol", df.get("Ticker", [])))
+    return list(dict.fromkeys(symbols))
+
+
+def add_fate(table, data_dir, period, strategy):
+    """Add outcome of a trade entered at every occurrence (same as backtest of chartList.py --backtest_date)
+
+    Args:
+        table (dataframe): 'Symbol' and 'Date' of occurrences
+        data_dir (str): path to the directory containing price data
+        period (int): number of days to hold a trade
+        strategy (str): exit strategy (eg, 2R, sticky, investment; see TimeSeriesPlus.get_fate)
+
+    Returns:
+        dataframe: with 'PL', 'exit Price' and 'Date Sold' columns, trades missed at entry removed
+    """
+    outcome = {}
+    for symbol, dates in table.groupby('Symbol')['Date']:
+        price = read_price(data_dir, symbol).replace('', np.nan).dropna(axis='index')
+        sts = TimeSeriesPlus(price)
+        for date in dates:
+            outcome[(symbol, date)] = sts.get_fate(str(date.date()), period, 'next', 5, strategy)
+    fates = [outcome[(symbol, date)] for symbol, date in table[['Symbol', 'Date']].itertuples(index=False)]
+    table = table.assign(**{'PL': [fate[0] for fate in fates], 'exit Price': [fate[1] for fate in fates],
+                            'Date Sold': [fate[2] for fate in fates]})
+    return table[table['PL'] != 'missing']
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Index of signal occurrences in price history")
+    parser.add_argument("list", nargs='+',
+                        help=": list(s) of symbols in TSV")
+    parser.add_argument("-d", "--dir", default="/Users/air/watchlist/daliyPrice",
+                        help=": a directory holding price data for symbols")
+    parser.add_argument("-i", "--index", default="signal_index",
+                        help=": directory of the signal index")
+    parser.add_argument("-s", "--signal", action="append", default=[],
+                        help=": signal to index, a named signal ({}) with arguments after ':' (eg, "
+                             "stochastic_cross:14,3,20) or a screen expression (eg, 'close > ema200')".format(
+                                 ', '.join(signals)))
+    parser.add_argument("-q", "--query", default="",
+                        help=": signals combined with & (and), | (or) and ~ (not) "
+                             "(eg, 'stochastic_cross:14,3,20 & close > ema200')")
+    parser.add_argument("--fate", default="",
+                        help=": backtest a trade entered at every occurrence: holding days,strategy (eg, 40,2R)")
+    parser.add_argument("-o", "--output", default="",
+                        help=": write occurrences to a TSV file instead of the screen")
+    args = parser.parse_args()
+
+    symbols = list_symbols(args.list)
+    specs = list(args.signal)
+    try:
+        specs += [spec for terms in parse_query(args.query) for spec, negated in terms] if args.query else []
+        start = time.time()
+        index = SignalIndex(args.index)
+        updated = index.update(args.dir, symbols, specs)
+        print(f"# {len(index.symbols):>5} symbols and {len(index.bitmaps)} signals in index "
+              f"({updated} symbols computed, {time.time() - start:.3f} s)")
+        if not args.query:
+            sys.exit(0)
+        start = time.time()
+        table = index.occurrences(args.query, symbols)
+    except ValueError as e:
+        print(f"x-> {e}")
+        sys.exit(1)
+    print(f"# {len(table):>5} occurrences of {args.query} ({time.time() - start:.3f} s)")
+
+    if args.fate:
+        period, strategy = args.fate.split(',')
+        table = add_fate(table, args.dir, int(period), strategy)
+        summarize_profit_loss(pd.to_numeric(table['PL']))
+
+    if args.output:
+        table.to_csv(args.output, sep="\t", index=False)
+    else:
+        print(table.to_csv(sep="\t", index=False), end="")
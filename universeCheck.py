@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+Check that indicators computed for all securities at once (Universe) equal those computed
+on the price data of each security alone, when trading dates differ across securities
+
+Synthetic price data have missing days and different first dates for every security, eg,
+    universeCheck.py --count 200
+    universeCheck.py sample.txt --dir download
+"""
+
+import sys
+import argparse
+import numpy as np
+import pandas as pd
+import module.window_stats as window_stats
+import module.signal_matrix as signal_matrix
+import module.candle_pattern as candle_pattern
+import module.volume_profile as volume_profile
+import module.screen_expression as screen_expression
+from module.universe import Universe, price_columns
+from module.time_series_plus import TimeSeriesPlus
+from module.attribute_table import read_price
+
+# check name -> (function of universe giving values by symbol, function of TimeSeriesPlus giving the value)
+checks = {
+    'zigzag_score 20': (lambda universe: window_stats.zigzag_score(universe, 20),
+                        lambda sts: sts.get_zigzag_score(20)),
+    'zigzag_score 20 (history)': (lambda universe: universe.last_row(window_stats.zigzag_score(universe, 20, True)),
+                                  lambda sts: sts.get_zigzag_score(20)),
+    'consolidation 20': (lambda universe: window_stats.consolidation(universe, 20),
+                         lambda sts: sts.get_consolidation(20)),
+    'ema_entanglement 5,20,30': (lambda universe: window_stats.ema_entanglement(universe, 5, 20, 30),
+                                 lambda sts: sts.ema_entanglement(5, 20, 30)),
+    'ema_attraction 50,10': (lambda universe: window_stats.ema_attraction(universe, 50, 10),
+                             lambda sts: sts.ema_attraction(50, 10)),
+    'macd_cross_up 12,26,1': (lambda universe: universe.last_row(signal_matrix.macd_cross_up(universe, 12, 26, 1)),
+                              lambda sts: sts.macd_cross_up(12, 26, 1)),
+    'ema_cross_up 5,20,3': (lambda universe: universe.last_row(signal_matrix.ema_cross_up(universe, 5, 20, 3)),
+                            lambda sts: sts.ema_cross_up(5, 20, 3)),
+    'stochastic_cross 14,3,20,all': (
+        lambda universe: universe.last_row(signal_matrix.stochastic_cross(universe, 14, 3, 20, 'all')),
+        lambda sts: stochastic_status(sts, 14, 3, 20, 'all')),
+    'stochastic_cross 14,3,50,crs': (
+        lambda universe: universe.last_row(signal_matrix.stochastic_cross(universe, 14, 3, 50, 'crs')),
+        lambda sts: stochastic_status(sts, 14, 3, 50, 'crs')),
+    'uptrend 30': (lambda universe: universe.last_row(signal_matrix.uptrend(universe, 30)),
+                   lambda sts: sts.in_uptrend(30)),
+    'candle inside_bar 5': (lambda universe: recent_candle(universe, ['inside_bar'], 5),
+                            lambda sts: frame_candle(sts.df, ['inside_bar'], 5)),
+    'candle engulfing+outside_bar 10': (lambda universe: recent_candle(universe, ['engulfing', 'outside_bar'], 10),
+                                        lambda sts: frame_candle(sts.df, ['engulfing', 'outside_bar'], 10)),
+    'candle hammer+gap_down 20': (lambda universe: recent_candle(universe, ['hammer', 'gap_down'], 20),
+                                  lambda sts: frame_candle(sts.df, ['hammer', 'gap_down'], 20)),
+    'volume_node 60': (lambda universe: volume_profile.volume_node(universe, 60),
+                       lambda sts: support_node(sts.df.tail(60))),
+    'screen sma20': (lambda universe: universe.last_row(screen_expression.indicator(universe, 'sma20')),
+                     lambda sts: sts.df['4. close'].rolling(20).mean().iloc[-1]),
+    'screen vol10': (lambda universe: universe.last_row(screen_expression.indicator(universe, 'vol10')),
+                     lambda sts: sts.df['5. volume'].rolling(10).mean().iloc[-1]),
+    'screen high20': (lambda universe: universe.last_row(screen_expression.indicator(universe, 'high20')),
+                      lambda sts: sts.df['2. high'].rolling(20).max().iloc[-1]),
+    'screen low20': (lambda universe: universe.last_row(screen_expression.indicator(universe, 'low20')),
+                     lambda sts: sts.df['3. low'].rolling(20).min().iloc[-1]),
+}
+
+
+def support_node(df, bins=50):
+    """Price of the heaviest volume bin at or below the last close of one security (see volume_profile.volume_node)
+    """
+    volumes, edges = volume_profile.frame_profile(df, bins)
+    centers = (edges[:-1] + edges[1:]) / 2
+    weighted = np.where((centers <= df['4. close'].iloc[-1]) & (volumes > 0), volumes, -1)
+    return centers[weighted.argmax()] if weighted.max() >= 0 else np.nan
+
+
+def recent_candle(universe, names, days):
+    """Test of candle_pattern.recent_patterns at the last bar of every security
+    """
+    return universe.last_row(candle_pattern.recent_patterns(universe, names, days))
+
+
+def stochastic_status(sts, n, m, cutoff, mode):
+    """Test of signal_matrix.stochastic_cross at the last bar of a security
+
+    Returns:
+        bool: K and D are available and low, and K is above D ('all') or just crossed above D
+    """
+    stok, stod, signal, _ = sts.stochastic_cross(n, m)
+    status = not (np.isnan(stok) or np.isnan(stod) or stok > cutoff + 15 or stod > cutoff)
+    return status and (stok >= stod if mode == 'all' else signal > 0)
+
+
+def frame_patterns(df):
+    """Candlestick patterns of one security, written on its own price data (reference for candle_pattern)
+
+    Returns:
+        dict: pattern name -> boolean series by date
+    """
+    o, h, l, c = df['1. open'], df['2. high'], df['3. low'], df['4. close']
+    o1, h1, l1, c1 = o.shift(1), h.shift(1), l.shift(1), c.shift(1)
+    body = (c - o).abs()
+    upper = h - pd.concat([o, c], axis=1).max(axis=1)
+    lower = pd.concat([o, c], axis=1).min(axis=1) - l
+    span = h - l
+    return {
+        'engulfing': (c1 < o1) & (c > o) & (o <= c1) & (c >= o1),
+        'bear_engulfing': (c1 > o1) & (c < o) & (o >= c1) & (c <= o1),
+        'hammer': (span > 0) & (lower >= 2 * body) & (upper <= np.maximum(body, 0.1 * span)),
+        'shooting_star': (span > 0) & (upper >= 2 * body) & (lower <= np.maximum(body, 0.1 * span)),
+        'doji': (span > 0) & (body <= 0.1 * span),
+        'inside_bar': (h < h1) & (l > l1),
+        'outside_bar': (h > h1) & (l < l1),
+        'gap_up': l > h1,
+        'gap_down': h < l1,
+    }
+
+
+def frame_candle(df, names, days):
+    """Test if all patterns occurred in the last bars of one security (reference for recent_candle)
+    """
+    patterns = frame_patterns(df)
+    return all(patterns[name].tail(days).any() for name in names)
+
+
+def synthetic_frames(count, bars, seed=0):
+    """Get random-walk price data with missing days and different first dates for every security
+
+    Returns:
+        dict: symbol -> dataframe with price columns and date index
+    """
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range(end="2020-12-31", periods=bars, name='date')
+    frames = {}
+    for i in range(count):
+        close = 20 * np.exp(np.cumsum(rng.normal(0, 0.02, bars)))
+        open_ = close * (1 + rng.normal(0, 0.005, bars))
+        df = pd.DataFrame({'1. open': open_,
+                           '2. high': np.maximum(open_, close) * (1 + rng.uniform(0, 0.01, bars)),
+                           '3. low': np.minimum(open_, close) * (1 - rng.uniform(0, 0.01, bars)),
+                           '4. close': close,
+                           '5. volume': rng.integers(200000, 5000000, bars).astype(float)}, index=dates)
+        keep = rng.random(bars) > 0.03
+        keep[:rng.integers(0, bars // 4)] = False
+        frames[f"S{i:03d}"] = df[keep]
+    return frames
+
+
+def list_frames(files, data_dir):
+    """Get price data of securities in list files (TSV with 'Symbol' or 'Ticker' column)
+
+    Returns:
+        dict: symbol -> dataframe with price columns and date index
+    """
+    frames = {}
+    for file in files:
+        df = pd.read_csv(file, sep="\t")
+        for symbol in df.get("Symbol", df.get("Ticker", [])):
+            price = read_price(data_dir, symbol)
+            if price is not None:
+                price = price.replace('', np.nan).dropna(axis='index')
+                frames[symbol] = price[~price.index.duplicated(keep='last')].sort_index()[price_columns]
+    return frames
+
+
+def compare(universe, timeseries, check):
+    """Get symbols whose universe value differs from the value on price data of the security alone
+    """
+    batch, single = check
+    values = pd.Series(batch(universe)).reindex(universe.symbols)
+    differ = []
+    for symbol in universe.symbols:
+        expected = float(single(timeseries[symbol]))
+        if not np.isclose(float(values[symbol]), expected, rtol=1e-6, atol=1e-9, equal_nan=True):
+            differ.append(symbol)
+    return differ
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Check universe indicators against single-security indicators")
+    parser.add_argument("list", nargs='*',
+                        help=": list(s) of symbols in TSV (synthetic price data if not given)")
+    parser.add_argument("-d", "--dir", default="/Users/air/watchlist/daliyPrice",
+                        help=": a directory holding price data for symbols")
+    parser.add_argument("--count", type=int, default=100,
+                        help=": number of synthetic securities")
+    parser.add_argument("--bars", type=int, default=400,
+                        help=": number of dates of synthetic price data")
+    args = parser.parse_args()
+
+    frames = list_frames(args.list, args.dir) if args.list else synthetic_frames(args.count, args.bars)
+    universe = Universe(frames)
+    timeseries = {symbol: TimeSeriesPlus(df) for symbol, df in frames.items()}
+
+    failed = 0
+    for name, check in checks.items():
+        differ = compare(universe, timeseries, check)
+        print("# {:>5} symbols differ in {}{}".format(len(differ), name,
+                                                       (": " + " ".join(differ[:10])) if differ else ""))
+        failed += len(differ) > 0
+    sys.exit(1 if failed else 0)